@@ -0,0 +1,115 @@
+"""
+ann.py — 순수 NumPy IVF(Inverted File) 근사 최근접 이웃 인덱스
+
+정규화 임베딩을 구면 k-means로 n_lists개 군집에 나누고, 벡터를 군집 순서로 정렬해 저장합니다.
+질의는 centroid와의 내적으로 가까운 군집 nprobe개만 골라 그 안의 벡터만 채점합니다.
+
+    build_ivf(vectors)  → {"centroids", "order", "offsets"}
+        centroids  (n_lists × d) float32, 정규화
+        order      군집 순서로 정렬된 원래 행 번호
+        offsets    군집 l의 벡터 = 정렬된 행 [offsets[l], offsets[l+1])
+
+군집 수는 √n (IVF_MIN_POINTS 미만이면 1개 = 전수 검색).
+"""
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+
+IVF_MIN_POINTS = 1024    # 이보다 적으면 군집 1개 (전수 검색이 더 빠름)
+KMEANS_ITERS   = 10
+KMEANS_SAMPLE  = 65536   # k-means 학습에 쓰는 최대 표본 수
+BLOCK_ROWS     = 8192    # 배정 시 (행 × 군집) 유사도 행렬을 나눠 계산하는 단위
+
+
+def n_lists_for(n: int) -> int:
+    if n < IVF_MIN_POINTS:
+        return 1
+    return max(1, int(math.sqrt(n)))
+
+
+def assign(vectors, centroids):
+    """각 벡터가 속할 군집 (내적 최대 centroid) — BLOCK_ROWS 행씩 계산"""
+    import numpy as np
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(vectors, n_lists: int, iters: int = KMEANS_ITERS, seed: int = 0):
+    """구면 k-means (코사인 유사도). 빈 군집은 이전 centroid 유지."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = np.asarray(
+        vectors[np.sort(rng.choice(n, KMEANS_SAMPLE, replace=False))] if n > KMEANS_SAMPLE else vectors,
+        dtype=np.float32,
+    )
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(iters):
+        labels = assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids[nonempty] = sums / np.maximum(norms, 1e-12)
+    return centroids
+
+
+def build_ivf(vectors, seed: int = 0) -> Dict[str, object]:
+    """정규화 임베딩 행렬 → IVF 구조"""
+    import numpy as np
+    n = len(vectors)
+    n_lists = n_lists_for(n)
+    if n_lists == 1:
+        dim = vectors.shape[1] if n else 0
+        centroid = np.asarray(vectors, dtype=np.float32).mean(axis=0, keepdims=True) if n else np.zeros((1, dim))
+        centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+        return {
+            "centroids": centroid.astype(np.float32),
+            "order":     np.arange(n, dtype=np.int64),
+            "offsets":   np.array([0, n], dtype=np.int64),
+        }
+
+    centroids = kmeans(vectors, n_lists, seed=seed)
+    labels = assign(vectors, centroids)
+    order = np.argsort(labels, kind="stable")
+    counts = np.bincount(labels, minlength=n_lists)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return {"centroids": centroids.astype(np.float32), "order": order.astype(np.int64), "offsets": offsets}
+
+
+def probe(centroids, query_vec, nprobe: int) -> List[int]:
+    """질의와 가까운 군집 nprobe개 (유사도 내림차순)"""
+    import numpy as np
+    sims = centroids @ query_vec
+    if nprobe >= len(sims):
+        return [int(i) for i in np.argsort(-sims, kind="stable")]
+    top = np.argpartition(-sims, nprobe - 1)[:nprobe]
+    return [int(i) for i in top[np.argsort(-sims[top], kind="stable")]]
+
+
+def search_lists(
+    vectors,
+    offsets,
+    lists: Sequence[int],
+    query_vec,
+) -> Tuple[object, object]:
+    """선택한 군집들의 벡터만 채점 → (정렬된 행 번호 배열, 유사도 배열)"""
+    import numpy as np
+    rows: List[object] = []
+    scores: List[object] = []
+    for l in lists:
+        lo, hi = int(offsets[l]), int(offsets[l + 1])
+        if lo == hi:
+            continue
+        rows.append(np.arange(lo, hi, dtype=np.int64))
+        scores.append(np.asarray(vectors[lo:hi], dtype=np.float32) @ query_vec)
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(scores)
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+bench_retrieval.py — 검색 성능 벤치마크 (합성 한/영 코퍼스 생성 + 측정 + JSON 기록)
+
+크기별로 합성 소스 디렉토리를 만들고, 새 프로세스에서 인덱스를 처음부터 만든 뒤 아래 항목을 측정합니다.
+
+    cold_build_s     인덱스 생성 (청크 분할·목차 통계·토큰화·SimHash, 디스크 저장 포함)
+    warm_load_s      변경 없는 디스크 인덱스 로드 + 검색용 펼치기
+    prepare_s        검색 구조 구성 (역색인 / 희소 행렬 / BM25F 가중치 / 위치 색인) — 첫 질문에 드는 비용
+    single_query_ms  질문 하나만 처리하는 실행(CLI)의 채점 p50: doc_tf 훑기(scan) vs 저장된 게시 목록 + MaxScore
+                     (stored, 어휘 로드 포함) — stored가 빨라지는 청크 수가 postings_store.POSTINGS_MIN_CHUNKS
+    query_ms         로드된 인덱스로 질문 하나 검색 (p50 / p99 / mean, 본문 읽기 포함)
+    cli_ms           retrieve_chunks.py 한 번 실행 (프로세스 기동 + 로드 + 검색, --no-cache) p50
+    peak_rss_mb      측정 프로세스 최대 RSS
+    index_bytes      인덱스 폴더 크기 (bm25_*.json 등)
+    recall@k         라벨된 질문 중 정답 청크가 top-k에 든 비율
+
+합성 코퍼스 ({corpus_dir}/size_{N}/sources/*.md, rag/ 폴더 포함 → 실제 토픽과 같은 인덱스 위치):
+    - frontmatter(title, source_url) + "# 제목" + "## 절" 구조
+    - 영문 기술 용어 / 합성 영문 단어(Zipf 분포) / 한글 용어 / 합성 한글 어절을 섞은 문단
+    - 10% 문단은 목차형 링크 블록, 5% 파일은 다른 파일의 미러(근접 중복)
+    - 라벨된 질문: 고유 용어 3개 + 한글 어절로 된 문장을 한 문단에 심고, 용어 2개만 가진 방해 문장을
+      다른 파일에 심음. 정답 = 세 용어를 모두 포함한 청크 (청크 분할 방식과 무관하게 판정).
+      정답 문단이 목차 블록과 한 청크로 묶여 필터되면 놓치므로 목차 필터의 부작용도 recall에 반영됨
+      질문은 {corpus}/size_{N}/queries.jsonl (--queries-file 형식)에도 저장
+
+Usage:
+    python scripts/bench_retrieval.py --sizes 20 200 --queries 50 --output bench.json
+
+    # 변경 전후 비교
+    python scripts/bench_retrieval.py --sizes 200 --output after.json --compare before.json
+
+    # 검색 옵션별 recall / 지연 비교
+    python scripts/bench_retrieval.py --sizes 200 --bm25f --chunker heading --output bm25f.json
+    python scripts/bench_retrieval.py --sizes 200 --top-k 3 --rerank --output rerank.json   # 재순위 (query_ms에 모델 포함)
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+CORPUS_VERSION = 1
+
+EN_TERMS = (
+    "tensor core fp8 mig partition nvlink memory bandwidth selection mechanism mamba ssm state space "
+    "model attention transformer gpu hopper kernel cache latency throughput scheduler"
+).split()
+KO_TERMS = "파티셔닝 원리 메모리 대역폭 선택 메커니즘 상태 공간 모델 자율주행 센서 구성 텐서 코어 연산 구조 성능 지연".split()
+
+
+# ────────────────────────── 합성 코퍼스 ──────────────────────────
+
+def _ko_word(rng: random.Random) -> str:
+    return "".join(chr(0xAC00 + rng.randrange(11172)) for _ in range(rng.randint(2, 4)))
+
+
+def _paragraph(rng: random.Random, en_vocab: List[str], en_weights: List[float], ko_vocab: List[str]) -> str:
+    n = rng.randint(15, 70)
+    words = rng.choices(en_vocab, en_weights, k=n) + rng.choices(ko_vocab, k=n // 4)
+    rng.shuffle(words)
+    return " ".join(words) + "."
+
+
+def _toc_block(rng: random.Random, doc: int) -> str:
+    return "\n".join(f"- [Section {k}](https://docs.example.com/{doc}/{k})" for k in range(rng.randint(5, 12)))
+
+
+def generate_corpus(root: Path, n_files: int, n_queries: int, seed: int = 1) -> List[dict]:
+    """
+    root/sources/*.md 합성 코퍼스 + root/queries.jsonl 생성 (같은 인자면 같은 내용).
+    Returns: 라벨된 질문 [{"id", "query", "relevant": [필수 용어, ...]}, ...]
+    """
+    rng = random.Random(seed * 1_000_003 + n_files)
+    sources = root / "sources"
+    if root.exists():
+        shutil.rmtree(root)
+    sources.mkdir(parents=True)
+    (root / "rag").mkdir()
+
+    en_vocab = EN_TERMS + [f"w{i}" for i in range(5000)]
+    en_weights = [1 / (i + 1) for i in range(len(en_vocab))]
+    ko_vocab = KO_TERMS + [_ko_word(rng) for _ in range(2000)]
+
+    # 파일 → 절 → 문단
+    docs: List[List[List[str]]] = []
+    for i in range(n_files):
+        sections = []
+        for _ in range(rng.randint(2, 8)):
+            paras = []
+            for _ in range(rng.randint(2, 10)):
+                paras.append(_toc_block(rng, i) if rng.random() < 0.1 else _paragraph(rng, en_vocab, en_weights, ko_vocab))
+            sections.append(paras)
+        docs.append(sections)
+
+    # 미러 파일은 원본 내용으로 덮어쓰므로 정답 문장은 미러가 아닌 파일에만 심음
+    mirrors = {i: rng.randrange(n_files) for i in range(n_files) if rng.random() < 0.05}
+    originals = [i for i in range(n_files) if i not in mirrors] or [0]
+
+    # 라벨된 질문: 정답 문장 + 방해 문장 (용어 2개만)
+    queries = []
+    for q in range(n_queries):
+        terms = [f"needle{q}{s}" for s in "abc"]
+        ko = _ko_word(rng) + _ko_word(rng)
+        # 목차 블록은 검색 시 필터되므로 일반 문단에만 심음
+        slots = [(sec, j) for sec in docs[rng.choice(originals)] for j, para in enumerate(sec)
+                 if not para.startswith("- [")]
+        while not slots:
+            slots = [(sec, j) for sec in docs[rng.choice(originals)] for j, para in enumerate(sec)
+                     if not para.startswith("- [")]
+        section, j = rng.choice(slots)
+        section[j] = f"{section[j]} {terms[0]} {terms[1]} {ko} {terms[2]}."
+        for pair in ((0, 1), (1, 2)):
+            other = rng.choice(rng.choice(docs))
+            k = rng.randrange(len(other))
+            other[k] = f"{other[k]} {terms[pair[0]]} {terms[pair[1]]}."
+        noise = " ".join(rng.sample(EN_TERMS, 2) + rng.sample(KO_TERMS, 1))
+        queries.append({
+            "id":       f"q{q}",
+            "query":    f"{terms[0]} {ko} {terms[2]} {noise}",
+            "relevant": terms,
+        })
+
+    for i, sections in enumerate(docs):
+        body = sections if i not in mirrors else docs[mirrors[i]]
+        lines = [
+            "---",
+            f'title: "Synthetic {rng.choice(EN_TERMS)} {rng.choice(KO_TERMS)} {i}"',
+            f"source_url: https://site{i % 17}.example.com/doc/{i}",
+            "---",
+            "",
+            f"# Document {i}",
+        ]
+        for s, paras in enumerate(body):
+            lines += ["", f"## {rng.choice(KO_TERMS)} {rng.choice(EN_TERMS)} {s}", ""]
+            lines.append("\n\n".join(paras))
+        (sources / f"doc_{i:05d}.md").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    with open(root / "queries.jsonl", "w", encoding="utf-8") as f:
+        for item in queries:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    (root / "corpus.json").write_text(
+        json.dumps({"version": CORPUS_VERSION, "files": n_files, "queries": n_queries, "seed": seed}),
+        encoding="utf-8",
+    )
+    return queries
+
+
+def ensure_corpus(root: Path, n_files: int, n_queries: int, seed: int) -> List[dict]:
+    """같은 설정으로 만든 코퍼스가 있으면 재사용 (소스는 그대로, 인덱스는 측정 때 다시 생성)"""
+    spec = {"version": CORPUS_VERSION, "files": n_files, "queries": n_queries, "seed": seed}
+    try:
+        if json.loads((root / "corpus.json").read_text(encoding="utf-8")) == spec:
+            lines = (root / "queries.jsonl").read_text(encoding="utf-8").splitlines()
+            return [json.loads(line) for line in lines if line.strip()]
+    except (OSError, ValueError):
+        pass
+    return generate_corpus(root, n_files, n_queries, seed)
+
+
+# ────────────────────────── 측정 ──────────────────────────
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """nearest-rank 백분위수"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) if path.exists() else 0
+
+
+def single_query_ms(index: dict, queries: List[dict], top_k: int) -> dict:
+    """
+    질문 하나 채점 시간 p50 (ms): scan(_topk_scan) / stored(postings_store, 질문마다 어휘부터 다시 로드).
+    POSTINGS_MIN_CHUNKS 미만 코퍼스도 비교할 수 있도록 저장 게시 목록이 없으면 만듦. 두 방식의 순위가
+    다르면 mismatch로 셈 (0이어야 함).
+    """
+    import postings_store
+    from rag_index import _topk_scan
+
+    paths = []
+    for part in index["parts"]:
+        paths.append(postings_store.store_paths(part["sources_dir"], index["params"], part.get("index_dir")))
+        if not postings_store.is_current(part["stored"], paths[-1][1]):
+            postings_store.sync(part["stored"], part["sources_dir"], index["params"], part.get("index_dir"))
+
+    scan: List[float] = []
+    stored: List[float] = []
+    mismatch = 0
+    for item in queries:
+        stats = {"postings": 0, "scored": 0, "total_postings": 0}
+        t0 = time.perf_counter()
+        expected = _topk_scan(index, item["query"], top_k, stats)
+        scan.append((time.perf_counter() - t0) * 1000)
+        for bin_path, _, _ in paths:
+            postings_store.release(bin_path)
+        t0 = time.perf_counter()
+        stores = postings_store.open_stores(index, min_chunks=0)
+        ranked = postings_store.topk(index, stores, item["query"], top_k, stats) if stores else None
+        stored.append((time.perf_counter() - t0) * 1000)
+        mismatch += ranked != expected
+    return {
+        "scan":     round(percentile(scan, 50), 3) if scan else None,
+        "stored":   round(percentile(stored, 50), 3) if stored else None,
+        "mismatch": mismatch,
+    }
+
+
+def measure(cfg: dict) -> dict:
+    """
+    측정 프로세스 본체 (--worker). 인덱스 폴더를 지우고 처음부터 생성 → 다시 로드 → 질문 채점.
+    cfg: {"root", "top_k", "chunk_size", "overlap", "chunker", "engine", "field_weights", "positional", "jobs",
+          "rerank_model"}
+    """
+    import bm25f
+    import positional
+    import reranker
+    from rag_index import (
+        default_index_dir, get_combined_index, index_params, materialize, prepare_search, rank_unique, search_index,
+    )
+
+    root = Path(cfg["root"])
+    sources = root / "sources"
+    index_dir = default_index_dir(sources)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    params = index_params(cfg["chunk_size"], cfg["overlap"], 0.03, "*.md", True, chunker=cfg["chunker"])
+    weights = bm25f.parse_weights(cfg["field_weights"]) if cfg["field_weights"] is not None else None
+
+    t0 = time.perf_counter()
+    get_combined_index([sources], params, jobs=cfg["jobs"])
+    cold_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = get_combined_index([sources], params)
+    warm_load = time.perf_counter() - t0
+    index_bytes = dir_bytes(index_dir)
+
+    queries = [json.loads(line) for line in (root / "queries.jsonl").read_text(encoding="utf-8").splitlines() if line]
+    top_k = cfg["top_k"]
+    single = single_query_ms(index, queries, top_k)
+
+    t0 = time.perf_counter()
+    prepare_search(index, cfg["engine"], weights)
+    if cfg["positional"]:
+        positional.chunk_positions(index)
+    prepare = time.perf_counter() - t0
+
+    rerank_model = cfg.get("rerank_model")
+    depth = reranker.pool_size(top_k) if rerank_model else top_k
+    if rerank_model:
+        reranker.load_model(rerank_model)   # 모델 로드는 질문 지연에서 제외
+    latencies: List[float] = []
+    hits = duplicates = 0
+    for item in queries:
+        t0 = time.perf_counter()
+        dups: dict = {}
+        if cfg["positional"]:
+            ranked = rank_unique(
+                index, lambda d, q=item["query"]: positional.search(index, q, d, cfg["engine"], weights), depth, dups,
+            )
+            results = materialize(index, ranked)
+        else:
+            results = search_index(index, item["query"], depth, engine=cfg["engine"], field_weights=weights,
+                                   dups_out=dups)
+        if rerank_model:
+            results = reranker.rerank(index, item["query"], results, rerank_model, top_k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        duplicates += sum(len(same) for same in dups.values())
+        if any(all(t in text for t in item["relevant"]) for _, _, text, _ in results):
+            hits += 1
+
+    return {
+        "files":          len(list(sources.glob("*.md"))),
+        "source_bytes":   dir_bytes(sources),
+        "chunks":         len(index["chunks"]),
+        "filtered":       index["filtered_count"],
+        "duplicates":     duplicates,
+        "cold_build_s":   round(cold_build, 4),
+        "warm_load_s":    round(warm_load, 4),
+        "prepare_s":      round(prepare, 4),
+        "single_query_ms": single,
+        "query_ms": {
+            "p50":  round(percentile(latencies, 50), 3) if latencies else None,
+            "p99":  round(percentile(latencies, 99), 3) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        },
+        "peak_rss_mb":    peak_rss_mb(),
+        "index_bytes":    index_bytes,
+        f"recall@{top_k}": round(hits / len(queries), 4) if queries else None,
+    }
+
+
+def cli_latency(root: Path, cfg: dict, queries: List[dict], runs: int) -> Optional[float]:
+    """retrieve_chunks.py 실행 시간 p50 (ms). 인덱스는 이미 최신 → 질문당 웜 경로 전체."""
+    if runs <= 0 or not queries:
+        return None
+    cmd = [
+        sys.executable, str(SCRIPT_DIR / "retrieve_chunks.py"), "--sources-dir", str(root / "sources"),
+        "--top-k", str(cfg["top_k"]), "--chunk-size", str(cfg["chunk_size"]), "--overlap", str(cfg["overlap"]),
+        "--chunker", cfg["chunker"], "--engine", cfg["engine"], "--no-cache",
+    ]
+    if cfg["field_weights"] is not None:
+        cmd.append("--bm25f")
+        if cfg["field_weights"]:
+            cmd += ["--field-weights", cfg["field_weights"]]
+    if cfg["positional"]:
+        cmd.append("--positional")
+    if cfg.get("rerank_model"):
+        # 재순위 점수는 측정 단계에서 캐시됨 → 반복 질문 비용 (캐시 적중이면 모델도 로드하지 않음)
+        cmd += ["--rerank", "--rerank-model", cfg["rerank_model"]]
+    times = []
+    for item in queries[:runs]:
+        t0 = time.perf_counter()
+        subprocess.run(cmd + ["--query", item["query"]], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(percentile(times, 50), 1)
+
+
+def run_size(root: Path, cfg: dict, cli_runs: int) -> dict:
+    """크기 하나: 새 프로세스에서 측정 (cold 상태·RSS가 다른 크기의 영향을 받지 않도록)"""
+    proc = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--worker", json.dumps(dict(cfg, root=str(root)))],
+        capture_output=True, text=True, encoding="utf-8",
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"측정 실패 ({root}):\n{proc.stderr}")
+    result = json.loads(proc.stdout)
+    queries = [json.loads(line) for line in (root / "queries.jsonl").read_text(encoding="utf-8").splitlines() if line]
+    result["cli_ms_p50"] = cli_latency(root, cfg, queries, cli_runs)
+    return result
+
+
+# ────────────────────────── 비교 ──────────────────────────
+
+COMPARE_KEYS = ("cold_build_s", "warm_load_s", "prepare_s", "single_query_ms.scan", "single_query_ms.stored",
+                "query_ms.p50", "query_ms.p99", "cli_ms_p50", "peak_rss_mb", "index_bytes")
+
+
+def _get(result: dict, key: str):
+    for part in key.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+
+def compare(base: dict, new: dict) -> List[str]:
+    """같은 파일 수끼리 항목별 변화율 (+ 느려짐/커짐) 및 recall 차이"""
+    lines = []
+    base_by_size = {r["files"]: r for r in base.get("results", [])}
+    for r in new.get("results", []):
+        old = base_by_size.get(r["files"])
+        if old is None:
+            continue
+        lines.append(f"[files={r['files']}]")
+        for key in COMPARE_KEYS:
+            a, b = _get(old, key), _get(r, key)
+            if a and b is not None:
+                lines.append(f"  {key:<14} {a:>12} → {b:<12} ({(b / a - 1) * 100:+.1f}%)")
+        for key in r:
+            if key.startswith("recall@") and key in old:
+                lines.append(f"  {key:<14} {old[key]:>12} → {r[key]:<12} ({r[key] - old[key]:+.4f})")
+    return lines
+
+
+# ────────────────────────── CLI ──────────────────────────
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                             capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def main() -> int:
+    from rag_index import ENGINES, INDEX_VERSION
+    from chunking import CHUNKERS
+
+    parser = argparse.ArgumentParser(description="RAG Retriever 벤치마크 — 합성 코퍼스로 생성·검색 비용과 recall 측정")
+    parser.add_argument("--sizes",        type=int, nargs="+", default=[20, 200], help="코퍼스 크기 (파일 수, 복수 가능)")
+    parser.add_argument("--queries",      type=int, default=50,    help="라벨된 질문 수 (기본 50)")
+    parser.add_argument("--top-k",        type=int, default=5,     help="recall@k의 k (기본 5)")
+    parser.add_argument("--seed",         type=int, default=1,     help="코퍼스 생성 시드")
+    parser.add_argument("--corpus-dir",   default=None,
+                        help="코퍼스 폴더 (기본: 임시 폴더, 실행 후 삭제). 지정하면 같은 설정의 코퍼스를 재사용")
+    parser.add_argument("--chunk-size",   type=int, default=800,   help="청크 크기 (기본 800자)")
+    parser.add_argument("--overlap",      type=int, default=100,   help="청크 간 겹침 (기본 100자)")
+    parser.add_argument("--chunker",      choices=CHUNKERS, default="paragraph", help="청크 분할 방식")
+    parser.add_argument("--engine",       choices=ENGINES, default="auto", help="점수 계산 엔진")
+    parser.add_argument("--bm25f",        action="store_true",     help="BM25F로 채점")
+    parser.add_argument("--field-weights", default=None,           help="BM25F 필드 가중치 (--bm25f 포함)")
+    parser.add_argument("--positional",   action="store_true",     help="구절 필터 + 근접도 가중")
+    parser.add_argument("--rerank",       action="store_true",     help="상위 후보를 cross-encoder로 재순위")
+    parser.add_argument("--rerank-model", default=None,            help="재순위 cross-encoder (--rerank 포함)")
+    parser.add_argument("--jobs",         type=int, default=1,     help="인덱스 생성 프로세스 수 (기본 1: 순차)")
+    parser.add_argument("--cli-runs",     type=int, default=5,     help="retrieve_chunks.py 실행 시간 측정 횟수 (0이면 생략)")
+    parser.add_argument("--output",       default=None,            help="결과 JSON 경로 (미지정 시 stdout)")
+    parser.add_argument("--compare",      default=None,            help="이전 결과 JSON과 비교해 stderr에 출력")
+    parser.add_argument("--worker",       default=None,            help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(json.loads(args.worker))))
+        return 0
+
+    field_weights = None
+    if args.bm25f or args.field_weights:
+        import bm25f
+        try:
+            bm25f.parse_weights(args.field_weights)
+        except ValueError as e:
+            parser.error(str(e))
+        field_weights = args.field_weights or ""
+    cfg = {
+        "top_k":         args.top_k,
+        "chunk_size":    args.chunk_size,
+        "overlap":       args.overlap,
+        "chunker":       args.chunker,
+        "engine":        args.engine,
+        "field_weights": field_weights,
+        "positional":    args.positional,
+        "jobs":          args.jobs,
+        "rerank_model":  None,
+    }
+    if args.rerank or args.rerank_model:
+        import reranker
+        cfg["rerank_model"] = args.rerank_model or reranker.DEFAULT_MODEL
+
+    corpus_dir = Path(args.corpus_dir) if args.corpus_dir else Path(tempfile.mkdtemp(prefix="rag_bench_"))
+    results = []
+    try:
+        for size in args.sizes:
+            root = corpus_dir / f"size_{size}"
+            print(f"  [bench] 코퍼스 {size}개 파일 준비: {root}", file=sys.stderr)
+            ensure_corpus(root, size, args.queries, args.seed)
+            print("  [bench] 측정 중 ...", file=sys.stderr)
+            result = run_size(root, cfg, args.cli_runs)
+            print(f"  [bench] {json.dumps(result, ensure_ascii=False)}", file=sys.stderr)
+            results.append(result)
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    report = {
+        "created":       time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision":      git_revision(),
+        "index_version": INDEX_VERSION,
+        "python":        platform.python_version(),
+        "platform":      platform.platform(),
+        "cpus":          os.cpu_count(),
+        "config":        dict(cfg, queries=args.queries, seed=args.seed),
+        "results":       results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"  [bench] 결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        base = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print("\n".join([f"[비교] {args.compare} → {args.output or 'stdout'}"] + compare(base, report)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+bm25_sparse.py — BM25 희소 행렬 엔진 (NumPy / SciPy, 선택 의존성)
+
+청크별 토큰 빈도를 BM25 가중치가 곱해진 CSR 행렬(토큰 × 청크)로 한 번 구성해 두고,
+쿼리를 희소 벡터(토큰 등장 횟수)로 만들어 행렬 곱 한 번으로 모든 청크 점수를 구합니다.
+top-k는 점수가 0보다 큰 청크에 대해서만 np.partition(부분 선택)으로 고릅니다.
+
+    W[t, d] = idf(t) · tf·(k1+1) / (tf + k1·(1 − b + b·dl/avgdl))
+    score   = q · W            (q[t] = 쿼리 내 토큰 t 등장 횟수)
+
+여러 질문은 쿼리 행렬 Q(질문 × 토큰)와 W의 희소 행렬 곱 한 번으로 채점합니다 (배치 검색).
+항 가중치는 rank_bm25와 같은 연산 순서로 계산하므로 점수는 순수 Python 엔진과
+부동소수 합산 순서 차이(마지막 자릿수) 외에는 같고, 동점은 chunk_id 오름차순입니다.
+
+numpy / scipy가 없으면 available()이 False를 반환하고 rag_index.py의 MaxScore 엔진이 쓰입니다.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from chunking import tokenize
+from rag_index import BM25_B, BM25_K1, compute_idf
+import profiling
+
+
+# 질문이 많을 때 결과 행렬(질문 × 청크) 메모리를 제한하기 위한 블록 크기
+QUERY_BLOCK = 256
+
+_modules: Optional[tuple] = None
+
+
+def _load() -> Optional[tuple]:
+    """numpy / scipy.sparse 지연 import (없으면 None)"""
+    global _modules
+    if _modules is None:
+        try:
+            import numpy
+            from scipy import sparse
+            _modules = (numpy, sparse)
+        except ImportError:
+            _modules = ()
+    return _modules or None
+
+
+def available() -> bool:
+    return _load() is not None
+
+
+# ────────────────────────── 행렬 구성 ──────────────────────────
+
+def build_matrix(index: dict) -> dict:
+    """
+    BM25 가중치 CSR 행렬을 구성해 인덱스 dict에 캐시.
+        matrix  토큰 × 청크 CSR (float64)
+        vocab   {token: 행 번호}  청크 순서대로 처음 등장한 순
+        avgdl   평균 청크 길이
+    """
+    if "matrix" in index:
+        return index
+    with profiling.stage("bm25_build") as st:
+        st["chunks"] = len(index["doc_len"])
+        return _build_matrix(index)
+
+
+def _build_matrix(index: dict) -> dict:
+    np, sparse = _load()
+
+    doc_tf  = index["doc_tf"]
+    doc_len = index["doc_len"]
+    n_docs  = len(doc_len)
+    avgdl   = index["total_len"] / n_docs if n_docs else 1.0
+
+    # 청크 × 토큰 좌표 (청크 순서대로 처음 등장한 토큰부터 번호 부여)
+    vocab: Dict[str, int] = {}
+    cols: List[int] = []
+    tfs:  List[int] = []
+    indptr = [0]
+    for tf_map in doc_tf:
+        for tok, tf in tf_map.items():
+            col = vocab.get(tok)
+            if col is None:
+                vocab[tok] = col = len(vocab)
+            cols.append(col)
+            tfs.append(tf)
+        indptr.append(len(cols))
+
+    # IDF 평균 합산 순서를 BM25Okapi와 맞추기 위해 vocab(첫 등장) 순서로 계산
+    df = index["df"]
+    idf_map = compute_idf({tok: df[tok] for tok in vocab}, n_docs)
+    idf = np.fromiter((idf_map[tok] for tok in vocab), dtype=np.float64, count=len(vocab))
+
+    indptr_arr = np.asarray(indptr, dtype=np.int64)
+    cols_arr   = np.asarray(cols, dtype=np.int64)
+    tf_arr     = np.asarray(tfs, dtype=np.float64)
+    dl_arr     = np.repeat(np.asarray(doc_len, dtype=np.float64), np.diff(indptr_arr))
+
+    # _term_score()와 같은 연산 순서
+    norm    = BM25_K1 * (1 - BM25_B + BM25_B * dl_arr / avgdl)
+    weights = idf[cols_arr] * (tf_arr * (BM25_K1 + 1) / (tf_arr + norm))
+
+    by_doc = sparse.csr_matrix((weights, cols_arr, indptr_arr), shape=(n_docs, len(vocab)))
+    index.update({"matrix": by_doc.T.tocsr(), "vocab": vocab, "avgdl": avgdl})
+    return index
+
+
+def query_matrix(index: dict, queries: Sequence[str]):
+    """질문 목록 → 질문 × 토큰 CSR (값 = 토큰 등장 횟수, 인덱스에 없는 토큰은 무시)"""
+    np, sparse = _load()
+    vocab = index["vocab"]
+    cols: List[int] = []
+    vals: List[float] = []
+    indptr = [0]
+    for query in queries:
+        counts: Dict[int, int] = {}
+        for tok in tokenize(query):
+            col = vocab.get(tok)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        for col in sorted(counts):
+            cols.append(col)
+            vals.append(counts[col])
+        indptr.append(len(cols))
+    return sparse.csr_matrix(
+        (np.asarray(vals, dtype=np.float64), np.asarray(cols, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(queries), len(vocab)),
+    )
+
+
+# ────────────────────────── top-k ──────────────────────────
+
+def _row_topk(ids, scores, top_k: int) -> List[Tuple[float, int]]:
+    """한 질문의 (청크 id, 점수) 중 점수 > 0 상위 top_k (동점은 chunk_id 오름차순)"""
+    np, _ = _load()
+    if top_k <= 0:
+        return []
+    keep = scores > 0
+    ids, scores = ids[keep], scores[keep]
+    if len(scores) > top_k:
+        # k번째 점수와 동점인 청크는 모두 남긴 뒤 정렬해야 동점 순서가 결정적
+        kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+        keep = scores >= kth
+        ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))[:top_k]
+    return [(float(scores[j]), int(ids[j])) for j in order]
+
+
+def search_many(
+    index: dict,
+    queries: Sequence[str],
+    top_ks: Sequence[int],
+    stats_out: Optional[dict] = None,
+) -> List[List[Tuple[float, int]]]:
+    """
+    여러 질문을 희소 행렬 곱으로 채점 (QUERY_BLOCK개씩).
+
+    Args:
+        stats_out: 전달하면 {"postings": 곱셈에 쓰인 게시 항목 수, "scored": 점수가 생긴 청크 수,
+                   "total_postings": 위와 같음}을 누적
+    Returns: 질문별 [(score, chunk_id), ...]  점수 내림차순
+    """
+    np, _ = _load()
+    build_matrix(index)
+    matrix = index["matrix"]
+    row_nnz = np.diff(matrix.indptr)
+
+    ranked: List[List[Tuple[float, int]]] = []
+    for start in range(0, len(queries), QUERY_BLOCK):
+        q = query_matrix(index, queries[start:start + QUERY_BLOCK])
+        result = (q @ matrix).tocsr()
+        result.sort_indices()
+        for r in range(result.shape[0]):
+            lo, hi = result.indptr[r], result.indptr[r + 1]
+            ranked.append(_row_topk(result.indices[lo:hi], result.data[lo:hi], top_ks[start + r]))
+            if stats_out is not None:
+                touched = int(row_nnz[q.indices[q.indptr[r]:q.indptr[r + 1]]].sum())
+                stats_out["postings"] = stats_out.get("postings", 0) + touched
+                stats_out["total_postings"] = stats_out.get("total_postings", 0) + touched
+                stats_out["scored"] = stats_out.get("scored", 0) + int(hi - lo)
+    return ranked
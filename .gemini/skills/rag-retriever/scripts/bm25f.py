@@ -0,0 +1,280 @@
+"""
+bm25f.py — 필드 가중 BM25F (제목 / 제목 경로 / 본문 / 출처 도메인)
+
+기본 BM25는 청크 본문만 봅니다. 같은 단어라도 문서 제목(frontmatter title:)이나
+청크가 속한 제목 경로(chunker="heading"의 breadcrumb)에 있으면 더 강한 신호이므로,
+필드별 가중치와 필드별 길이 정규화를 적용한 BM25F로 채점할 수 있게 합니다.
+
+    필드     내용                                       길이 정규화 b
+    title    frontmatter title (파일의 모든 청크에 공통)  0.5
+    heading  제목 경로 ("개요 > 구조")                    0.5
+    body     청크 본문 (doc_tf − 제목 경로 토큰)          0.75 (BM25_B)
+    domain   frontmatter source_url 호스트 (arxiv.org)   0 (정규화 없음)
+
+    tf~(t, d) = Σ_f  w_f · tf_f(t, d) / (1 − b_f + b_f · len_f(d) / avglen_f)
+    W[t, d]   = idf(t) · tf~·(k1+1) / (tf~ + k1)
+    score     = q · W            (q[t] = 쿼리 내 토큰 t 등장 횟수)
+
+idf의 df는 네 필드 중 하나에라도 토큰이 있는 청크 수입니다.
+필드별 토큰 빈도·길이는 index_file()이 파일당 field_tf / field_len으로 저장하므로 (제목 경로는 sections별),
+검색 시 제목·도메인·제목 경로를 다시 토큰화하지 않습니다.
+
+- 질문 하나 (CLI 1회 실행): topk()가 질문 토큰의 본문 게시 목록(저장된 postings_store 또는 doc_tf 훑기)과
+  제목·도메인에 토큰이 있는 파일의 청크만 채점 — 가중 게시 목록·행렬을 만들지 않음
+- 여러 질문 / 서버: build()로 W를 한 번 만들어 인덱스 dict에 가중치별로 캐시하므로, 질의 비용은 기본
+  BM25와 같음 (python 엔진: 가중 게시 목록 누적 한 번, sparse 엔진: bm25_sparse 행렬 곱 한 번)
+"""
+
+import heapq
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+from chunking import tokenize
+from rag_index import BM25_B, BM25_K1, compute_idf, resolve_engine
+import profiling
+
+
+FIELDS = ("title", "heading", "body", "domain")
+DEFAULT_WEIGHTS = {"title": 2.0, "heading": 1.5, "body": 1.0, "domain": 0.5}
+FIELD_B         = {"title": 0.5, "heading": 0.5, "body": BM25_B, "domain": 0.0}
+
+
+def parse_weights(spec: Optional[str]) -> Dict[str, float]:
+    """
+    "title=3,heading=2" → 필드 가중치 (생략한 필드는 DEFAULT_WEIGHTS).
+    알 수 없는 필드나 음수 가중치는 ValueError.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in weights:
+            raise ValueError(f"잘못된 필드 가중치: {item!r} (형식: title=2,heading=1.5,body=1,domain=0.5)")
+        weights[name] = float(value)
+        if weights[name] < 0:
+            raise ValueError(f"필드 가중치는 0 이상이어야 합니다: {item!r}")
+    return weights
+
+
+# ────────────────────────── 가중치 구성 ──────────────────────────
+
+_NO_FIELDS = ({}, {}, {}, 0, 0, 0)
+
+
+def _field_reader(index: dict) -> Callable[[int], tuple]:
+    """
+    청크 id → (title tf, heading tf, domain tf, title 길이, heading 길이, domain 길이).
+    index_file()이 파일당 저장한 field_tf / field_len을 참조만 함 (토큰화 없음).
+    """
+    fields = index.get("fields")
+    if not fields:
+        return lambda i: _NO_FIELDS
+    spans, records = index["spans"], index["records"]
+
+    def read(i: int) -> tuple:
+        entry = fields.get(spans[i][0])
+        if entry is None:
+            return _NO_FIELDS
+        tf, length = entry["tf"], entry["len"]
+        section = records[i][8]
+        if section >= 0:
+            head, head_len = tf["heading"][section], length["heading"][section]
+        else:
+            head, head_len = {}, 0
+        return tf["title"], head, tf["domain"], length["title"], head_len, length["domain"]
+    return read
+
+
+def _averages(index: dict) -> Dict[str, float]:
+    """필드별 평균 길이 (본문 = 전체 토큰 수 − 제목 경로 토큰 수)"""
+    n_docs = len(index["doc_len"])
+    total = dict(index.get("field_total") or {"title": 0, "heading": 0, "domain": 0})
+    total["body"] = index["total_len"] - total["heading"]
+    return {f: (total[f] / n_docs if n_docs else 0.0) for f in FIELDS}
+
+
+def _scales(weights: Dict[str, float], avg: Dict[str, float], fields: tuple, dl: int) -> Tuple[float, ...]:
+    """필드별 w_f / 길이 정규화 (FIELDS 순서, 필드가 코퍼스 전체에서 비어 있으면 0)"""
+    _, _, _, title_len, head_len, domain_len = fields
+    lengths = {"title": title_len, "heading": head_len, "body": dl - head_len, "domain": domain_len}
+    return tuple(
+        weights[f] / (1 - FIELD_B[f] + FIELD_B[f] * lengths[f] / avg[f]) if avg[f] and weights[f] else 0.0
+        for f in FIELDS
+    )
+
+
+def _weighted_tf(tok: str, tf: int, fields: tuple, scales: Tuple[float, ...]) -> float:
+    """tf~(tok, d). tf = 청크 doc_tf의 빈도 (제목 경로 포함, 제목·도메인에만 있으면 0)"""
+    title, head, domain = fields[:3]
+    s_title, s_head, s_body, s_domain = scales
+    if tf:
+        h = head.get(tok, 0)
+        return s_body * (tf - h) + s_head * h + s_title * title.get(tok, 0) + s_domain * domain.get(tok, 0)
+    if tok in title:
+        return s_title * title[tok] + s_domain * domain.get(tok, 0)
+    return s_domain * domain.get(tok, 0)
+
+
+def _saturate(idf: float, t: float) -> float:
+    return idf * (t * (BM25_K1 + 1) / (t + BM25_K1)) if t > 0 else 0.0
+
+
+def build(index: dict, weights: Dict[str, float], matrix: bool = False) -> dict:
+    """
+    BM25F 항 가중치를 구성해 인덱스 dict에 가중치별로 캐시.
+        postings  {token: ([chunk_id, ...], [W, ...])}  chunk_id 오름차순
+        vocab     {token: 행 번호}  청크 순서대로 처음 등장한 순
+        matrix    토큰 × 청크 CSR (matrix=True일 때, bm25_sparse.search_many()에 그대로 전달)
+    """
+    key = tuple(weights[f] for f in FIELDS)
+    cache = index.setdefault("bm25f", {})
+    prepared = cache.get(key)
+    if prepared is None:
+        with profiling.stage("bm25f_build") as st:
+            st["chunks"] = len(index["doc_len"])
+            prepared = cache[key] = _build_postings(index, weights)
+    if matrix and "matrix" not in prepared:
+        with profiling.stage("bm25f_build"):
+            prepared["matrix"] = _build_matrix(prepared, len(index["doc_len"]))
+    return prepared
+
+
+def _build_matrix(prepared: dict, n_docs: int):
+    import bm25_sparse
+    np, sparse = bm25_sparse._load()
+    postings = prepared["postings"]
+    indptr = [0]
+    for ids, _ in postings.values():
+        indptr.append(indptr[-1] + len(ids))
+    cols = np.fromiter((i for ids, _ in postings.values() for i in ids), dtype=np.int64, count=indptr[-1])
+    vals = np.fromiter((w for _, ws in postings.values() for w in ws), dtype=np.float64, count=indptr[-1])
+    return sparse.csr_matrix((vals, cols, np.asarray(indptr, dtype=np.int64)), shape=(len(postings), n_docs))
+
+
+def _build_postings(index: dict, weights: Dict[str, float]) -> dict:
+    doc_tf    = index["doc_tf"]
+    n_docs    = len(index["doc_len"])
+    fields_of = _field_reader(index)
+    avg       = _averages(index)
+
+    postings: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    def add(tok: str, i: int, value: float) -> None:
+        entry = postings.get(tok)
+        if entry is None:
+            postings[tok] = entry = ([], [])
+        entry[0].append(i)
+        entry[1].append(value)
+
+    for i, tf_map in enumerate(doc_tf):
+        fields = fields_of(i)
+        title, _, domain = fields[:3]
+        scales = _scales(weights, avg, fields, index["doc_len"][i])
+        for tok, tf in tf_map.items():
+            add(tok, i, _weighted_tf(tok, tf, fields, scales))
+        for tok in title:
+            if tok not in tf_map:
+                add(tok, i, _weighted_tf(tok, 0, fields, scales))
+        for tok in domain:
+            if tok not in tf_map and tok not in title:
+                add(tok, i, _weighted_tf(tok, 0, fields, scales))
+
+    # 가중 tf → 포화 + IDF (df = 어느 필드에든 토큰이 있는 청크 수)
+    idf = compute_idf({tok: len(ids) for tok, (ids, _) in postings.items()}, n_docs)
+    for tok, (_, values) in postings.items():
+        q_idf = idf[tok]
+        values[:] = [_saturate(q_idf, t) for t in values]
+
+    return {"postings": postings, "vocab": {tok: row for row, tok in enumerate(postings)}}
+
+
+# ────────────────────────── 검색 ──────────────────────────
+
+def _topk_python(prepared: dict, query: str, top_k: int, stats: dict) -> List[Tuple[float, int]]:
+    """가중 게시 목록을 쿼리 토큰 순서대로 누적 → [(score, chunk_id), ...]  (동점은 chunk_id 오름차순)"""
+    postings = prepared["postings"]
+    scores: Dict[int, float] = {}
+    for q in tokenize(query):
+        entry = postings.get(q)
+        if entry is None:
+            continue
+        stats["postings"] += len(entry[0])
+        stats["total_postings"] += len(entry[0])
+        for i, w in zip(*entry):
+            scores[i] = scores.get(i, 0.0) + w
+    stats["scored"] += len(scores)
+    return [(-neg, i) for neg, i in heapq.nsmallest(top_k, ((-s, i) for i, s in scores.items()))]
+
+
+def topk(
+    index: dict,
+    query: str,
+    top_k: int,
+    weights: Dict[str, float],
+    stats: dict,
+    postings: Dict[str, Tuple[List[int], List[int]]],
+) -> Optional[List[Tuple[float, int]]]:
+    """
+    질문 하나를 가중 게시 목록 구성 없이 채점 → build() + _topk_python()과 같은 [(score, chunk_id), ...].
+    postings: 질문 토큰의 본문 게시 목록 {token: ([chunk_id, ...], [tf, ...])}
+              (postings_store.query_postings() 또는 rag_index.scan_postings())
+    후보 = 본문 게시 목록 + 제목·도메인에 토큰이 있는 파일의 청크, df도 같은 집합으로 셈.
+    IDF가 음수인 질문 토큰이 있으면 None (epsilon은 전체 어휘 IDF가 필요 → build()로 채점).
+    """
+    q_tokens = tokenize(query)
+    n_docs   = len(index["doc_len"])
+    fields   = (index.get("fields") or {}).values()
+
+    candidates: Dict[str, Dict[int, int]] = {}
+    for q in dict.fromkeys(q_tokens):
+        ids, tfs = postings.get(q, ((), ()))
+        tf_of = dict(zip(ids, tfs))
+        for entry in fields:
+            if q in entry["tf"]["title"] or q in entry["tf"]["domain"]:
+                for i in range(entry["start"], entry["end"]):
+                    tf_of.setdefault(i, 0)
+        if tf_of:
+            candidates[q] = tf_of
+    idf = {q: math.log(n_docs - len(c) + 0.5) - math.log(len(c) + 0.5) for q, c in candidates.items()}
+    if any(w < 0 for w in idf.values()):
+        return None
+
+    fields_of = _field_reader(index)
+    avg       = _averages(index)
+    doc_len   = index["doc_len"]
+    per_doc: Dict[int, tuple] = {}
+    scores: Dict[int, float] = {}
+    for q in q_tokens:
+        tf_of = candidates.get(q)
+        if tf_of is None:
+            continue
+        stats["postings"] += len(tf_of)
+        stats["total_postings"] += len(tf_of)
+        for i, tf in tf_of.items():
+            cached = per_doc.get(i)
+            if cached is None:
+                doc_fields = fields_of(i)
+                cached = per_doc[i] = (doc_fields, _scales(weights, avg, doc_fields, doc_len[i]))
+            w = _saturate(idf[q], _weighted_tf(q, tf, *cached))
+            scores[i] = scores.get(i, 0.0) + w
+    stats["scored"] += len(scores)
+    return [(-neg, i) for neg, i in heapq.nsmallest(top_k, ((-s, i) for i, s in scores.items()))]
+
+
+def rank_many(
+    index: dict,
+    queries: List[str],
+    top_ks: List[int],
+    weights: Dict[str, float],
+    stats: dict,
+    engine: str = "auto",
+) -> List[List[Tuple[float, int]]]:
+    """rag_index.rank_many()의 BM25F 판 (stats는 같은 키에 누적)"""
+    if resolve_engine(engine) == "sparse":
+        import bm25_sparse
+        return bm25_sparse.search_many(build(index, weights, matrix=True), queries, top_ks, stats)
+    prepared = build(index, weights)
+    return [_topk_python(prepared, q, k, stats) if k > 0 else [] for q, k in zip(queries, top_ks)]
@@ -0,0 +1,259 @@
+"""
+chunk_store.py — 청크 본문 저장소 (웜 경로에서 소스 .md를 열지 않고 결과 청크만 읽기)
+
+인덱스는 청크 본문 대신 소스 파일의 바이트 구간만 저장하므로, 결과를 출력할 때마다 소스 .md를
+열어 구간을 읽고 문단 공백을 정규화했습니다. 인덱스 옆에 청크 본문을 이어 붙인 UTF-8 파일과
+고정 폭 위치표를 두어, 저장된 인덱스가 최신이면 결과 청크의 본문을 이 저장소에서만 읽습니다.
+
+    {topic}/rag/index/text_{key}.bin   chunk_texts()와 같은 청크 본문을 저장 인덱스 순서로 이어 붙인 UTF-8
+    {topic}/rag/index/text_{key}.off   int64 배열 [순서 지문, 청크 수 n, 위치 0, ..., 위치 n]  (.bin 바이트 위치)
+
+- 저장 인덱스 순서 = 파일명 정렬 → 파일 안 청크 순서 (목차 청크 포함, summary 파일 제외).
+  combine()이 검색용 청크마다 이 순서의 번호(slots)를 기록
+- 순서 지문(청크 해시 목록 sha1의 앞 8바이트)을 저장 인덱스의 text_store에도 기록하고, 읽을 때 둘이
+  다르면 (저장소 쓰기 중 중단, 다른 프로세스가 갱신 등) 소스 파일 구간을 읽는 기존 경로로 돌아감
+- 증분 갱신 시 바뀌지 않은 청크 본문은 이전 저장소에서 복사하고, 새 청크만 소스에서 읽음
+- 읽기는 두 파일을 mmap으로 열어 결과 청크의 위치표 항목(16바이트)과 본문 구간만 디코딩.
+  열린 mmap은 프로세스에 남겨 두므로(상주 서버, vault 검색) 본문은 Python 힙이 아니라 OS 페이지 캐시에만
+  올라감. 힙에 남는 것은 인덱스(청크별 doc_tf·통계)와 검색 구조(역색인 또는 행렬)로, 본문보다 작지만
+  청크 수에 비례함
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from chunking import chunk_text, with_breadcrumb
+from rag_index import index_path
+
+
+HEADER = 2   # [순서 지문, 청크 수]
+ITEM = struct.calcsize("=q")   # 위치표 항목 크기 (array("q")와 같은 크기·바이트 순서)
+PAIR = struct.Struct("=2q")
+
+_maps: Dict[str, Tuple[Optional[mmap.mmap], mmap.mmap]] = {}   # .bin 경로 → (본문 mmap, 위치표 mmap)
+_lock = threading.Lock()
+
+
+def store_paths(sources_dir: Path, params: dict, index_dir: Optional[Path] = None) -> Tuple[Path, Path]:
+    """(본문 .bin, 위치표 .off) 경로 (BM25 인덱스와 같은 key 규칙)"""
+    return (index_path(sources_dir, params, index_dir, prefix="text", suffix=".bin"),
+            index_path(sources_dir, params, index_dir, prefix="text", suffix=".off"))
+
+
+def stored_order(files: Dict[str, dict]) -> List[Tuple[str, list, str]]:
+    """저장 인덱스 순서의 (파일명, 청크 레코드, 제목 경로) 목록"""
+    order = []
+    for name in sorted(files):
+        record = files[name]
+        sections = record.get("sections", [])
+        order.extend((name, c, sections[c[8]] if c[8] >= 0 else "") for c in record.get("chunks", []))
+    return order
+
+
+def order_digest(hashes: List[str]) -> int:
+    """청크 해시 목록 → 순서 지문 (부호 있는 int64)"""
+    digest = hashlib.sha1("".join(hashes).encode("ascii")).digest()
+    return int.from_bytes(digest[:8], "little", signed=True)
+
+
+def read_header(off_path: Path) -> Optional[Tuple[int, int]]:
+    """위치표 머리 (순서 지문, 청크 수). 없거나 손상이면 None."""
+    header = array("q")
+    try:
+        with open(off_path, "rb") as f:
+            header.fromfile(f, HEADER)
+    except (OSError, EOFError):
+        return None
+    return header[0], header[1]
+
+
+def is_current(stored: dict, off_path: Path) -> bool:
+    """저장소가 이 저장 인덱스의 청크 순서로 만들어졌는지 (위치표 머리 16바이트만 읽음)"""
+    header = read_header(off_path)
+    return header is not None and stored.get("text_store") == header[0]
+
+
+# ────────────────────────── 쓰기 ──────────────────────────
+
+def _load(bin_path: Path, off_path: Path) -> Tuple[Optional[mmap.mmap], Optional[array]]:
+    """이전 저장소 (증분 갱신 시 바뀌지 않은 본문 복사용, 본문은 mmap — 호출자가 닫음)"""
+    offsets = array("q")
+    try:
+        with open(off_path, "rb") as f:
+            offsets.frombytes(f.read())
+        if len(offsets) < HEADER or len(offsets) != HEADER + offsets[1] + 1 or not offsets[-1]:
+            return None, None
+        return _map(bin_path), offsets
+    except (OSError, ValueError):
+        return None, None
+
+
+def sync(
+    stored: dict,
+    old_files: Optional[Dict[str, dict]],
+    sources_dir: Path,
+    params: dict,
+    index_dir: Optional[Path] = None,
+) -> bool:
+    """
+    저장 인덱스에 맞게 저장소를 갱신하고 stored["text_store"]에 순서 지문 기록.
+    old_files: 갱신 전 저장 인덱스의 files (이전 저장소의 청크 순서, 없으면 모두 소스에서 읽음)
+    Returns: stored["text_store"]가 바뀌었는지 (True면 저장 인덱스도 다시 저장해야 함)
+    """
+    bin_path, off_path = store_paths(sources_dir, params, index_dir)
+    order = stored_order(stored["files"])
+    digest = order_digest([c[6] for _, c, _ in order])
+    header = read_header(off_path)
+    if header is not None and header[0] == digest:
+        changed = stored.get("text_store") != digest
+        stored["text_store"] = digest
+        return changed
+
+    # 이전 저장소에서 재사용할 수 있는 본문: 청크 해시 → (시작, 끝)
+    reuse: Dict[str, Tuple[int, int]] = {}
+    blob, old_offsets = _load(bin_path, off_path) if old_files else (None, None)
+    try:
+        if blob is not None:
+            old_order = stored_order(old_files)
+            if old_offsets[0] == order_digest([c[6] for _, c, _ in old_order]):
+                for slot, (_, c, _) in enumerate(old_order):
+                    reuse.setdefault(c[6], (old_offsets[HEADER + slot], old_offsets[HEADER + slot + 1]))
+
+        # 새 청크는 소스 파일에서 (파일당 한 번 읽기)
+        fresh: Dict[str, List[int]] = {}
+        for slot, (name, c, _) in enumerate(order):
+            if c[6] not in reuse:
+                fresh.setdefault(name, []).append(slot)
+        texts: Dict[int, bytes] = {}
+        for name, slots in fresh.items():
+            data = (sources_dir / name).read_bytes()
+            for slot in slots:
+                _, c, crumb = order[slot]
+                texts[slot] = with_breadcrumb(crumb, chunk_text(data[c[1]:c[2]].decode("utf-8"))).encode("utf-8")
+
+        # 본문은 청크마다 임시 파일에 바로 씀 (전체 본문을 메모리에 모으지 않음)
+        bin_path.parent.mkdir(parents=True, exist_ok=True)
+        suffix = f".tmp{os.getpid()}"
+        tmp_bin, tmp_off = bin_path.with_name(bin_path.name + suffix), off_path.with_name(off_path.name + suffix)
+        offsets = array("q", [digest, len(order), 0])
+        pos = 0
+        with open(tmp_bin, "wb") as f:
+            for slot, (_, c, _) in enumerate(order):
+                piece = texts[slot] if slot in texts else blob[slice(*reuse[c[6]])]
+                f.write(piece)
+                pos += len(piece)
+                offsets.append(pos)
+    finally:
+        if blob is not None:
+            blob.close()
+
+    with open(tmp_off, "wb") as f:
+        offsets.tofile(f)
+    # 위치표를 나중에 교체: 중간에 중단되면 지문이 맞지 않아 소스 경로로 돌아감
+    release(bin_path)   # 이 프로세스의 mmap을 닫아야 교체 가능 (Windows)
+    os.replace(tmp_bin, bin_path)
+    os.replace(tmp_off, off_path)
+    stored["text_store"] = digest
+    return True
+
+
+# ────────────────────────── 읽기 ──────────────────────────
+
+def _map(path: Path) -> mmap.mmap:
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_maps(bin_path: Path, off_path: Path, digest: Optional[int]) -> Optional[Tuple[Optional[mmap.mmap], mmap.mmap]]:
+    """
+    (본문, 위치표) mmap. 프로세스당 한 번 열어 재사용하고, 위치표 머리의 순서 지문이 digest와 다르면
+    (저장소가 갱신돼 파일이 교체됨) 다시 엶. 그래도 다르거나 열 수 없으면 None. 청크가 없으면 본문은 None.
+    """
+    if digest is None:
+        return None
+    key = str(bin_path)
+    with _lock:
+        maps = _maps.get(key)
+        if maps is not None and PAIR.unpack_from(maps[1], 0)[0] != digest:
+            _close(key)
+            maps = None
+        if maps is None:
+            try:
+                off = _map(off_path)
+            except (OSError, ValueError):
+                return None
+            try:
+                blob = _map(bin_path) if os.path.getsize(bin_path) else None   # 빈 파일은 mmap할 수 없음
+            except (OSError, ValueError):
+                off.close()
+                return None
+            maps = (blob, off)
+            if len(off) < PAIR.size or PAIR.unpack_from(off, 0)[0] != digest:
+                _close_maps(maps)
+                return None
+            _maps[key] = maps
+    return maps
+
+
+def _close_maps(maps: Tuple[Optional[mmap.mmap], mmap.mmap]) -> None:
+    for m in maps:
+        if m is not None:
+            m.close()
+
+
+def _close(key: str) -> None:
+    maps = _maps.pop(key, None)
+    if maps is not None:
+        _close_maps(maps)
+
+
+def release(bin_path: Path) -> None:
+    """열어 둔 mmap 닫기 (저장소 파일 교체 전)"""
+    with _lock:
+        _close(str(bin_path))
+
+
+def read_slots(bin_path: Path, off_path: Path, digest: Optional[int], slots: List[int]) -> Dict[int, str]:
+    """저장 인덱스 순서 번호 → 본문 (저장소가 digest와 맞지 않으면 빈 dict)"""
+    maps = open_maps(bin_path, off_path, digest)
+    if maps is None:
+        return {}
+    blob, off = maps
+    out: Dict[int, str] = {}
+    try:
+        n = PAIR.unpack_from(off, 0)[1]
+        for slot in slots:
+            if not 0 <= slot < n:
+                return {}
+            start, end = PAIR.unpack_from(off, (HEADER + slot) * ITEM)
+            out[slot] = blob[start:end].decode("utf-8") if end > start else ""
+    except (struct.error, UnicodeDecodeError, ValueError, TypeError):
+        return {}
+    return out
+
+
+def read_chunks(index: dict, ids: List[int]) -> Dict[int, str]:
+    """
+    청크 id → 본문 (저장소가 최신인 디렉토리의 청크만). 나머지는 호출자가 소스 구간에서 읽음.
+    위치표는 필요한 항목(16바이트)만, 본문은 해당 구간만 mmap에서 디코딩.
+    """
+    slots = index.get("slots")
+    out: Dict[int, str] = {}
+    if slots is None:
+        return out
+    for part in index["parts"]:
+        members = [i for i in ids if part["start"] <= i < part["end"]]
+        if not members:
+            continue
+        bin_path, off_path = store_paths(part["sources_dir"], index["params"], part.get("index_dir"))
+        texts = read_slots(bin_path, off_path, part["stored"].get("text_store"), [slots[i] for i in members])
+        for i in members:
+            if slots[i] in texts:
+                out[i] = texts[slots[i]]
+    return out
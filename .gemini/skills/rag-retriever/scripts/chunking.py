@@ -0,0 +1,277 @@
+"""
+chunking.py — RAG 청크 분할 / 목차 필터 / 토크나이저
+
+retrieve_chunks.py 와 rag_index.py 가 공유하는 순수 텍스트 처리 함수 모음.
+인덱스 생성 시 한 번만 실행되고, 질의 시에는 쿼리 토큰화(tokenize)만 사용합니다.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+FRONTMATTER_RE = re.compile(r'^---[\s\S]*?---\n')
+FRONTMATTER_FIELD_RE = re.compile(r'^([\w-]+):[ \t]*(.*?)[ \t]*$', re.M)
+
+
+def strip_frontmatter(text: str) -> str:
+    """frontmatter(--- ... ---) 제거"""
+    return FRONTMATTER_RE.sub('', text, count=1).strip()
+
+
+def frontmatter_fields(text: str) -> Dict[str, str]:
+    """frontmatter의 한 줄짜리 "key: value" 항목 (따옴표 제거). 없으면 {}."""
+    m = FRONTMATTER_RE.match(text)
+    if not m:
+        return {}
+    fields: Dict[str, str] = {}
+    for key, value in FRONTMATTER_FIELD_RE.findall(m.group(0)):
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        fields.setdefault(key, value)
+    return fields
+
+
+def source_domain(url: str) -> str:
+    """source_url → 호스트 이름 (www. 제거, 없으면 "")"""
+    host = (urlsplit(url).hostname or "") if url else ""
+    return host[4:] if host.startswith("www.") else host
+
+
+# ────────────────────────── 청크 분할 ──────────────────────────
+
+PARAGRAPH_SEP_RE = re.compile(r'\n{2,}')
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """text[start:end].strip()에 해당하는 구간 (복사 없이 경계만 이동)"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def iter_paragraph_spans(text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """문단(빈 줄 경계) 구간을 앞뒤 공백을 뺀 (start, end)로 순서대로 생성. 빈 문단은 건너뜀."""
+    end = len(text) if end is None else end
+    pos = start
+    for m in PARAGRAPH_SEP_RE.finditer(text, start, end):
+        s, e = _strip_span(text, pos, m.start())
+        if s < e:
+            yield s, e
+        pos = m.end()
+    s, e = _strip_span(text, pos, end)
+    if s < e:
+        yield s, e
+
+
+def iter_chunk_spans(
+    text: str,
+    chunk_size: int,
+    overlap: int,
+    source: Optional[str] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    first_idx: int = 0,
+) -> Iterator[Tuple[Optional[str], int, int, int]]:
+    """
+    텍스트를 chunk_size 단위로 분할해 (source, chunk_idx, start, end) 문자 구간을 생성.
+    텍스트를 복사·이어 붙이지 않고 경계만 계산 (청크 본문은 chunk_text()로 필요할 때만 만듦).
+    - frontmatter(--- ... ---)는 건너뜀 (start를 주면 text[start:end] 구간만 분할, 번호는 first_idx부터)
+    - 문단(빈 줄) 경계를 우선 존중, 여러 문단을 묶은 청크 본문은 문단 사이를 빈 줄 하나로 정규화
+    - 단락 자체가 chunk_size보다 크면 chunk_size - overlap 간격으로 문자 단위로 자름
+    """
+    if start is None:
+        m = FRONTMATTER_RE.match(text)
+        start = m.end() if m else 0
+    idx = first_idx
+    cur_start = cur_end = -1
+    cur_len = 0  # 정규화된 청크 본문 길이 (문단 길이 + 구분자 2자)
+
+    for ps, pe in iter_paragraph_spans(text, start, end):
+        para_len = pe - ps
+        if cur_len + para_len + 2 <= chunk_size:
+            cur_len = cur_len + 2 + para_len if cur_start >= 0 else para_len
+            if cur_start < 0:
+                cur_start = ps
+            cur_end = pe
+            continue
+
+        if cur_start >= 0:
+            yield source, idx, cur_start, cur_end
+            idx += 1
+        if para_len > chunk_size:
+            for i in range(0, para_len, chunk_size - overlap):
+                s, e = _strip_span(text, ps + i, min(ps + i + chunk_size, pe))
+                if s < e:
+                    yield source, idx, s, e
+                    idx += 1
+            cur_start, cur_len = -1, 0
+        else:
+            cur_start, cur_end, cur_len = ps, pe, para_len
+
+    if cur_start >= 0:
+        yield source, idx, cur_start, cur_end
+
+
+CHUNKERS = ("paragraph", "heading")   # 문단 경계만 / 제목 구조 + 문단 경계
+
+# 마크다운 제목: ATX(# 제목) 또는 Setext(제목 다음 줄 === / ---). Jina Reader 출력은 Setext를 씀
+HEADING_RE = re.compile(
+    r'^(?P<hashes>#{1,6})[ \t]+(?P<atx>[^\n]*?)[ \t#]*$'
+    r'|^(?P<setext>[ \t]*\S[^\n]*)\n(?P<rule>=+|-+)[ \t]*$',
+    re.M,
+)
+FENCE_RE = re.compile(r'^[ \t]*(```|~~~)', re.M)
+BREADCRUMB_SEP = " > "
+
+
+def iter_sections(text: str) -> Iterator[Tuple[str, int, int]]:
+    """
+    제목 기준 구간 (breadcrumb, start, end). 본문은 제목 줄 다음부터 다음 제목 직전까지.
+    breadcrumb은 상위 제목부터 이어 붙인 경로 ("개요 > 구조 > MIG"), 첫 제목 앞 구간은 "".
+    코드 블록(``` / ~~~) 안의 # 줄은 제목으로 보지 않음. frontmatter는 건너뜀.
+    """
+    m = FRONTMATTER_RE.match(text)
+    pos = m.end() if m else 0
+    fences = [f.start() for f in FENCE_RE.finditer(text, pos)]
+
+    stack: List[Tuple[int, str]] = []   # (level, title)
+    crumb = ""
+    for h in HEADING_RE.finditer(text, pos):
+        # 앞쪽 펜스 수가 홀수면 코드 블록 안
+        if bisect_left(fences, h.start()) % 2:
+            continue
+        if h.group("hashes"):
+            level, title = len(h.group("hashes")), h.group("atx").strip()
+        else:
+            level, title = (1 if h.group("rule")[0] == "=" else 2), h.group("setext").strip()
+        if not title:
+            continue
+        yield crumb, pos, h.start()
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, title))
+        crumb = BREADCRUMB_SEP.join(t for _, t in stack)
+        pos = h.end()
+    yield crumb, pos, len(text)
+
+
+def iter_heading_chunk_spans(
+    text: str,
+    chunk_size: int,
+    overlap: int,
+) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    제목 구조를 따르는 청크 분할 → (breadcrumb, chunk_idx, start, end).
+    청크는 한 구간(iter_sections) 안에서만 만들어지므로 제목 경계를 넘지 않음.
+    제목이 없는 문서는 iter_chunk_spans()와 같은 청크.
+    """
+    idx = 0
+    for crumb, start, end in iter_sections(text):
+        for _, idx, s, e in iter_chunk_spans(text, chunk_size, overlap, None, start, end, idx):
+            yield crumb, idx, s, e
+            idx += 1
+
+
+def with_breadcrumb(breadcrumb: str, body: str) -> str:
+    """제목 경로를 본문 앞에 붙인 청크 본문 (검색 결과·색인 대상 텍스트)"""
+    return f"§ {breadcrumb}\n\n{body}" if breadcrumb else body
+
+
+def chunk_text(text: str, start: int = 0, end: Optional[int] = None) -> str:
+    """iter_chunk_spans() 구간의 청크 본문 (문단 앞뒤 공백 제거, 문단 사이는 빈 줄 하나)"""
+    span = text[start:end]
+    if "\n\n" not in span:
+        return span.strip()
+    return "\n\n".join(p for p in (q.strip() for q in PARAGRAPH_SEP_RE.split(span)) if p)
+
+
+def split_into_chunks(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    텍스트를 chunk_size 단위로 분할. overlap으로 문맥 연속성 보장.
+    - 문단(빈 줄) 경계를 우선 존중
+    - 불가피할 경우 문자 단위로 자름
+    (iter_chunk_spans()의 청크 본문을 모두 만들어 반환)
+    """
+    return [chunk_text(text, s, e) for _, _, s, e in iter_chunk_spans(text, chunk_size, overlap)]
+
+
+MD_LINK_RE = re.compile(r'\[.*?\]\(https?://[^)]+\)')
+RAW_URL_RE = re.compile(r'(?<!\()\bhttps?://\S+')
+URL_RE     = re.compile(r'https?://\S+')
+SPACE_RE   = re.compile(r'\s+')
+
+
+def toc_stats(chunk: str) -> Tuple[int, int, int]:
+    """
+    목차 판별용 청크 통계 (인덱스 생성 시 한 번 계산해 저장).
+    Returns: (link_count, text_len, chunk_len)
+        link_count  마크다운 링크 + 독립 URL 수
+        text_len    링크·URL 제거 후 공백 정규화한 순수 텍스트 길이
+        chunk_len   청크 전체 길이
+    """
+    link_count = len(MD_LINK_RE.findall(chunk)) + len(RAW_URL_RE.findall(chunk))
+    text_only  = URL_RE.sub('', MD_LINK_RE.sub('', chunk))
+    text_only  = SPACE_RE.sub(' ', text_only).strip()
+    return link_count, len(text_only), len(chunk)
+
+
+def is_toc(stats, max_link_ratio: float, min_text_length: int = 80) -> bool:
+    """
+    toc_stats() 결과로 목차/네비게이션/URL 잔재 청크 판별 (정규식 없이 숫자 비교만).
+
+    판별 기준 (하나라도 해당하면 필터):
+    1. min_text_length: URL·링크 제거 후 순수 텍스트가 너무 짧음
+       → 실질 내용 없는 URL 잔재 조각 제거
+    2. link_ratio: 마크다운 링크([text](url)) 밀도가 높음
+       → 100자당 링크 수가 max_link_ratio 초과
+    3. text_ratio: 링크 제거 후 순수 텍스트 비율이 30% 미만
+       → 링크가 청크 대부분을 차지하는 목차 블록
+    """
+    link_count, text_len, chunk_len = stats
+    chunk_len = max(chunk_len, 1)
+
+    # 조건 1: 순수 텍스트가 너무 짧음 (URL 잔재 조각)
+    if text_len < min_text_length:
+        return True
+
+    # 조건 2: 링크 밀도 초과
+    link_ratio = link_count / (chunk_len / 100)
+    if link_ratio > max_link_ratio:
+        return True
+
+    # 조건 3: 링크가 내용 대부분을 차지
+    text_ratio = text_len / chunk_len
+    if link_count > 2 and text_ratio < 0.30:
+        return True
+
+    return False
+
+
+def is_toc_chunk(chunk: str, max_link_ratio: float, min_text_length: int = 80) -> bool:
+    """목차/네비게이션/URL 잔재 청크 판별 (기준은 is_toc() 참고)"""
+    return is_toc(toc_stats(chunk), max_link_ratio, min_text_length)
+
+
+# ────────────────────────── 토크나이저 ──────────────────────────
+
+def tokenize(text: str) -> List[str]:
+    """
+    간단한 토크나이저.
+    - 소문자화
+    - 영문: 단어 단위
+    - 한글: 2-gram (형태소 분석기 없이 근사)
+    """
+    text = text.lower()
+    tokens = re.findall(r'[a-z0-9]+', text)
+
+    # 한글 2-gram
+    korean = re.findall(r'[\uac00-\ud7a3]+', text)
+    for word in korean:
+        tokens += [word[i:i+2] for i in range(len(word) - 1)]
+        tokens.append(word)  # 전체 단어도 포함
+
+    return tokens
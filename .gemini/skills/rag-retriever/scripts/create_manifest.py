@@ -15,6 +15,10 @@ create_manifest.py — RAG 토픽 manifest 생성/업데이트
 
 출력:
     {rag_root}/{safe_topic}/manifest.json
+
+파일별 mtime / sha256 과 BM25 인덱스 기여 통계(청크·토큰 수)를 함께 기록합니다.
+인덱스(rag/index/)는 새로 추가되거나 내용이 바뀐 파일만 다시 청크 분할하고,
+삭제된 파일은 제거합니다 — 재실행 비용은 전체 코퍼스가 아니라 변경량에 비례합니다.
 """
 
 import argparse
@@ -23,6 +27,12 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from chunking import CHUNKERS  # noqa: E402
+from rag_index import content_hash, file_stats, index_params, index_path, load_updated  # noqa: E402
 
 try:
     from dotenv import load_dotenv
@@ -44,24 +54,55 @@ def to_relative(path: Path, vault_path: Path) -> str:
         return str(path.resolve())
 
 
-def scan_sources(source_dirs: list[str], vault_path: Path) -> dict:
-    """소스 디렉토리의 .md 파일 목록과 통계를 수집"""
+def scan_sources(source_dirs: list[str], vault_path: Path, params: Optional[dict] = None, jobs: int = 0) -> dict:
+    """
+    소스 디렉토리의 .md 파일 목록과 통계를 수집.
+    params가 주어지면 해당 설정의 BM25 인덱스를 증분 갱신하고 (jobs개 프로세스로 병렬 인덱싱)
+    파일별 fingerprint(mtime, sha256)와 청크/토큰 통계를 함께 기록.
+    """
     files = []
     total_bytes = 0
+    index_stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "paths": []}
     for src_dir in source_dirs:
         p = Path(src_dir)
         if not p.exists():
             print(f"  [warn] 소스 디렉토리 없음: {src_dir}", file=sys.stderr)
             continue
+
+        records = {}
+        if params is not None:
+            stats: dict = {}
+            records = load_updated(p, params, stats_out=stats, jobs=jobs)["files"]
+            for key in ("added", "changed", "removed"):
+                index_stats[key] += len(stats[key])
+            index_stats["unchanged"] += stats["unchanged"]
+            index_stats["paths"].append(to_relative(index_path(p, params), vault_path))
+
         for md in sorted(p.glob("*.md")):
-            size = md.stat().st_size
-            files.append({
-                "path": to_relative(md, vault_path),
-                "name": md.name,
-                "size_bytes": size,
-            })
-            total_bytes += size
-    return {"files": files, "file_count": len(files), "total_bytes": total_bytes}
+            st = md.stat()
+            record = records.get(md.name)
+            if record is not None and record["size"] == st.st_size and record["mtime_ns"] == st.st_mtime_ns:
+                digest = record["sha256"]
+            else:
+                record = None
+                digest = content_hash(md.read_bytes())
+            entry = {
+                "path":       to_relative(md, vault_path),
+                "name":       md.name,
+                "size_bytes": st.st_size,
+                "mtime":      datetime.fromtimestamp(st.st_mtime).isoformat(timespec="seconds"),
+                "sha256":     digest,
+            }
+            if record is not None:
+                entry.update(file_stats(record, params["max_link_ratio"]))
+            files.append(entry)
+            total_bytes += st.st_size
+    return {
+        "files":       files,
+        "file_count":  len(files),
+        "total_bytes": total_bytes,
+        "index_stats": index_stats if params is not None else None,
+    }
 
 
 def load_existing(manifest_path: Path) -> dict:
@@ -82,6 +123,15 @@ def main() -> int:
     parser.add_argument("--vault-path",  default=None,            help="Obsidian vault 루트 경로 (미지정 시 OBSIDIAN_VAULT_PATH 환경변수 사용)")
     parser.add_argument("--category",   default="",              help="주제 카테고리 (예: NVBit, PyTorch)")
     parser.add_argument("--tags",        nargs="*", default=[],   help="추가 태그")
+    # BM25 인덱스 설정 (retrieve_chunks.py 옵션과 같은 값을 주면 첫 검색이 바로 인덱스를 재사용)
+    parser.add_argument("--chunk-size",     type=int,   default=800,  help="인덱스 청크 크기 (기본 800자)")
+    parser.add_argument("--overlap",        type=int,   default=100,  help="인덱스 청크 겹침 (기본 100자)")
+    parser.add_argument("--max-link-ratio", type=float, default=0.03, help="목차 청크 필터 임계값 (기본 0.03)")
+    parser.add_argument("--chunker",        choices=CHUNKERS, default="paragraph",
+                        help="청크 분할 방식 (paragraph: 문단 경계, heading: 마크다운 제목 구간 안에서만 분할)")
+    parser.add_argument("--no-index",       action="store_true",      help="BM25 인덱스 갱신 생략 (파일 목록만 기록)")
+    parser.add_argument("--jobs",           type=int,   default=0,
+                        help="인덱싱 프로세스 수 (기본 0: 변경 파일 합계가 크면 CPU 수, 1이면 순차)")
     args = parser.parse_args()
 
     vault_str = args.vault_path or os.environ.get("OBSIDIAN_VAULT_PATH", "")
@@ -106,7 +156,10 @@ def main() -> int:
     now = datetime.now().isoformat(timespec="seconds")
     existing = load_existing(manifest_path)
 
-    scan = scan_sources(args.sources_dir, vault_path)
+    params = None
+    if not args.no_index:
+        params = index_params(args.chunk_size, args.overlap, args.max_link_ratio, "*.md", True, chunker=args.chunker)
+    scan = scan_sources(args.sources_dir, vault_path, params, args.jobs)
 
     manifest = {
         "topic":        args.topic,
@@ -117,10 +170,17 @@ def main() -> int:
         "files":        scan["files"],
         "file_count":   scan["file_count"],
         "total_bytes":  scan["total_bytes"],
+        "chunk_count":  sum(f.get("chunk_count", 0) for f in scan["files"]),
+        "token_count":  sum(f.get("token_count", 0) for f in scan["files"]),
         "tags":         args.tags or existing.get("tags", []),
         "created":      existing.get("created", now),
         "updated":      now,
     }
+    if params is not None:
+        manifest["index"] = {
+            "params": params,
+            "paths":  scan["index_stats"]["paths"],
+        }
 
     manifest_path.write_text(
         json.dumps(manifest, ensure_ascii=False, indent=2),
@@ -131,6 +191,10 @@ def main() -> int:
     print(f"   topic      : {manifest['topic']}")
     print(f"   source_dirs: {manifest['source_dirs']}")
     print(f"   files      : {manifest['file_count']}개 ({manifest['total_bytes']:,} bytes)")
+    if params is not None:
+        st = scan["index_stats"]
+        print(f"   index      : 추가 {st['added']} / 변경 {st['changed']} / 삭제 {st['removed']} / 유지 {st['unchanged']}"
+              f" → {manifest['chunk_count']:,}개 청크, {manifest['token_count']:,} tokens")
     return 0
 
 
@@ -0,0 +1,222 @@
+"""
+dense.py — 임베딩(dense) 검색 채널 + BM25 결과 융합 (선택 의존성: sentence-transformers)
+
+한국어 2-gram BM25가 놓치는 바꿔 말하기(paraphrase)를 보완하기 위해, mem0-memory 스킬과 같은
+로컬 임베더(all-MiniLM-L6-v2, CPU)로 청크를 임베딩하고 BM25 순위와 RRF로 융합합니다.
+
+    RRF(d) = Σ_채널 1 / (RRF_K + rank_채널(d))
+
+임베딩 캐시:
+    {topic}/rag/index/emb_{model}_{key}.npz   (BM25 인덱스 옆, 같은 key 규칙)
+    hashes   청크 본문 해시 (rag_index.chunk_hash)
+    vectors  float16 정규화 임베딩 (행 = hashes 순서)
+청크 해시로 조회하므로 소스가 바뀌어도 내용이 바뀐 청크만 다시 임베딩합니다.
+인덱스에서 사라진 청크의 임베딩은 캐시를 다시 쓸 때 정리됩니다.
+"""
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from rag_index import chunk_texts, dedup_depth, index_path, materialize, rank_many, rank_unique
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+RRF_K         = 60
+FUSE_DEPTH    = 50   # 채널별 융합 후보 수 (top_k × 5가 더 크면 그만큼)
+ENCODE_BATCH  = 64
+
+_models: Dict[str, object] = {}
+
+
+def available() -> bool:
+    """sentence-transformers / numpy 설치 여부 (모듈을 실제로 import하지 않고 확인)"""
+    import importlib.util
+    return all(importlib.util.find_spec(m) is not None for m in ("numpy", "sentence_transformers"))
+
+
+def load_model(model_name: str):
+    """임베딩 모델 로드 (프로세스당 한 번, 상주 서버에서는 계속 재사용)"""
+    model = _models.get(model_name)
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = _models[model_name] = SentenceTransformer(model_name, device="cpu")
+    return model
+
+
+def encode(model_name: str, texts: List[str]):
+    """텍스트 목록 → 정규화 임베딩 (float32, 행 = 텍스트). 내적 = 코사인 유사도."""
+    import numpy as np
+    vectors = load_model(model_name).encode(
+        texts,
+        batch_size=ENCODE_BATCH,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+# ────────────────────────── 임베딩 캐시 ──────────────────────────
+
+def cache_path(index: dict, part: dict, model_name: str) -> Path:
+    model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:8]
+    return index_path(part["sources_dir"], index["params"], part["index_dir"],
+                      prefix=f"emb_{model_key}", suffix=".npz")
+
+
+def load_cache(path: Path) -> Tuple[List[str], Optional[object]]:
+    """캐시 로드 → (hashes, float16 vectors). 없거나 깨졌으면 ([], None)."""
+    import numpy as np
+    if not path.exists():
+        return [], None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return [str(h) for h in data["hashes"]], data["vectors"]
+    except Exception:
+        return [], None
+
+
+def save_cache(path: Path, hashes: List[str], vectors) -> None:
+    """임시 파일에 쓴 뒤 교체 (rag_index.save_index와 같은 방식)"""
+    import numpy as np
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp, "wb") as f:
+        np.savez(f, hashes=np.asarray(hashes, dtype="U16"), vectors=vectors)
+    os.replace(tmp, path)
+
+
+def _part_embeddings(index: dict, part: dict, model_name: str):
+    """디렉토리 하나의 청크 임베딩 (캐시에 없는 청크만 계산 후 캐시 갱신)"""
+    import numpy as np
+    path = cache_path(index, part, model_name)
+    hashes, vectors = load_cache(path)
+    row: Dict[str, int] = {h: i for i, h in enumerate(hashes)}
+
+    ids = range(part["start"], part["end"])
+    missing: Dict[str, int] = {}
+    for i in ids:
+        h = index["hashes"][i]
+        if h not in row and h not in missing:
+            missing[h] = i
+
+    if missing:
+        print(f"  [dense] 임베딩 계산: {len(missing)}개 청크 (캐시 {len(hashes)}개)", file=sys.stderr)
+        texts = chunk_texts(index, list(missing.values()))
+        new = encode(model_name, [texts[i] for i in missing.values()]).astype(np.float16)
+
+        # 저장 인덱스에 남아 있는 청크(목차 청크 포함)의 임베딩만 유지
+        live = {c[6] for record in part["stored"]["files"].values() for c in record.get("chunks", [])}
+        keep = [j for j, h in enumerate(hashes) if h in live]
+        hashes = [hashes[j] for j in keep] + list(missing)
+        vectors = new if vectors is None else np.vstack([vectors[keep], new])
+        row = {h: i for i, h in enumerate(hashes)}
+        try:
+            save_cache(path, hashes, vectors)
+        except OSError:
+            pass
+
+    if not len(ids):
+        return np.zeros((0, 0), dtype=np.float32)
+    return vectors[[row[index["hashes"][i]] for i in ids]].astype(np.float32)
+
+
+def chunk_embeddings(index: dict, model_name: str):
+    """
+    검색용 인덱스 전체의 청크 임베딩 행렬 (청크 × 차원, float32). 인덱스 dict에 캐시.
+    메모리 인덱스(index_from_chunks)는 디스크 캐시 없이 바로 계산.
+    """
+    import numpy as np
+    cache = index.setdefault("dense", {})
+    if model_name in cache:
+        return cache[model_name]
+
+    if not index["parts"]:
+        texts = chunk_texts(index, list(range(len(index["chunks"]))))
+        matrix = encode(model_name, [texts[i] for i in range(len(index["chunks"]))])
+    else:
+        blocks = [_part_embeddings(index, part, model_name) for part in index["parts"]]
+        blocks = [b for b in blocks if b.size]
+        matrix = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    cache[model_name] = matrix
+    return matrix
+
+
+# ────────────────────────── 검색 / 융합 ──────────────────────────
+
+def dense_rank(matrix, query_vec, depth: int) -> List[Tuple[float, int]]:
+    """코사인 유사도 상위 depth개 [(similarity, chunk_id), ...] (동점은 chunk_id 오름차순)"""
+    import numpy as np
+    if not len(matrix) or depth <= 0:
+        return []
+    scores = matrix @ query_vec
+    if len(scores) > depth:
+        cand = np.argpartition(-scores, depth - 1)[:depth]
+    else:
+        cand = np.arange(len(scores))
+    order = cand[np.lexsort((cand, -scores[cand]))]
+    return [(float(scores[i]), int(i)) for i in order]
+
+
+def rrf_fuse(rankings: List[List[Tuple[float, int]]], top_k: int, rrf_k: int = RRF_K) -> List[Tuple[float, int]]:
+    """채널별 순위 목록 → RRF 점수 상위 top_k [(rrf_score, chunk_id), ...]"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (_, i) in enumerate(ranking, 1):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(((s, i) for i, s in fused.items()), key=lambda x: (-x[0], x[1]))[:top_k]
+
+
+def hybrid_search_many(
+    index: dict,
+    queries: Sequence[str],
+    top_ks: Sequence[int],
+    model_name: str = DEFAULT_MODEL,
+    engine: str = "auto",
+    rrf_k: int = RRF_K,
+    field_weights: Optional[Dict[str, float]] = None,
+    dups_out: Optional[List[dict]] = None,
+) -> List[List[Tuple[float, str, str, int]]]:
+    """
+    BM25 + dense 하이브리드 검색. 채널마다 max(FUSE_DEPTH, top_k × 5)개 후보를 뽑아 RRF로 융합.
+    BM25 채널은 점수 0 초과 청크만 참여합니다 (field_weights가 있으면 BM25F 채널).
+    융합 순위에서 근접 중복을 합침 (rag_index.collapse, dups_out에 질문별 dict 추가).
+
+    Returns: 질문별 [(rrf_score, source_name, chunk_text, chunk_idx), ...]
+    """
+    if not index["chunks"]:
+        return [[] for _ in queries]
+    depths = [max(FUSE_DEPTH, dedup_depth(index, k) * 5) for k in top_ks]
+    bm25 = rank_many(index, list(queries), depths, engine=engine, field_weights=field_weights)
+    matrix = chunk_embeddings(index, model_name)
+    query_vecs = encode(model_name, list(queries))
+
+    results = []
+    for j, k in enumerate(top_ks):
+        lexical = [(s, i) for s, i in bm25[j] if s > 0]
+        semantic = dense_rank(matrix, query_vecs[j], depths[j])
+        dups: dict = {}
+        fused = rank_unique(index, lambda depth, ch=(lexical, semantic): rrf_fuse(list(ch), depth, rrf_k), k, dups)
+        if dups_out is not None:
+            dups_out.append(dups)
+        results.append(materialize(index, fused))
+    return results
+
+
+def hybrid_search(
+    index: dict,
+    query: str,
+    top_k: int,
+    model_name: str = DEFAULT_MODEL,
+    engine: str = "auto",
+    field_weights: Optional[Dict[str, float]] = None,
+    dups_out: Optional[dict] = None,
+) -> List[Tuple[float, str, str, int]]:
+    dups: List[dict] = []
+    results = hybrid_search_many(index, [query], [top_k], model_name, engine, field_weights=field_weights, dups_out=dups)
+    if dups_out is not None and dups:
+        dups_out.update(dups[0])
+    return results[0]
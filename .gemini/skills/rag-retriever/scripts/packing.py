@@ -0,0 +1,88 @@
+"""
+packing.py — 토큰 예산 안에 청크 채우기 (MMR + 중복 청크 제거)
+
+같은 문단이 arXiv HTML / PDF 두 판본에서 나오거나 인접 청크가 겹치면 top-k 결과에
+사실상 같은 내용이 여러 번 들어가 컨텍스트 창을 낭비합니다. --max-tokens를 주면
+관련도 상위 후보 풀에서 MMR(maximal marginal relevance) 순으로 청크를 고르고,
+이미 고른 청크와 거의 같은 청크는 버리며, 예산이 찰 때까지 greedy하게 채웁니다.
+선택한 청크는 점수 순으로 다시 정렬해 반환합니다 (개수는 top_k가 아니라 예산이 정함).
+
+    MMR(d) = λ · rel(d) − (1 − λ) · max_{s ∈ 선택} sim(d, s)
+    rel(d) = score(d) / 최고 점수          (BM25 / RRF 점수 모두 0~1로 정규화)
+    sim    = 토큰 집합 포함도 |A ∩ B| / min(|A|, |B|)
+    sim ≥ DUP_THRESHOLD 이면 중복으로 보고 제외
+
+토큰 수는 --show-stats와 같은 근사(4자 ≈ 1 token)를 씁니다.
+"""
+
+from typing import Dict, List, Set, Tuple
+
+from chunking import tokenize
+
+
+PACK_LAMBDA   = 0.7
+DUP_THRESHOLD = 0.8
+POOL_MIN      = 50    # 후보 풀 크기 (top_k × 5가 더 크면 그만큼)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def pool_size(top_k: int) -> int:
+    return max(POOL_MIN, top_k * 5)
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """토큰 집합 포함도 (작은 쪽이 큰 쪽에 얼마나 들어 있는지)"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def pack(
+    results: List[Tuple[float, str, str, int]],
+    max_tokens: int,
+    lam: float = PACK_LAMBDA,
+    dup_threshold: float = DUP_THRESHOLD,
+) -> Tuple[List[Tuple[float, str, str, int]], Dict[str, int]]:
+    """
+    관련도 순 후보 [(score, source, text, chunk_idx), ...] → 예산 안의 MMR 선택 목록
+    (점수 순, 동점이면 원래 순위).
+
+    Returns: (selected, {"candidates", "duplicates", "over_budget", "tokens"})
+    """
+    info = {"candidates": len(results), "duplicates": 0, "over_budget": 0, "tokens": 0}
+    if not results:
+        return [], info
+
+    top = max(r[0] for r in results) or 1.0
+    rel = [r[0] / top for r in results]
+    sets = [set(tokenize(r[2])) for r in results]
+    cost = [estimate_tokens(r[2]) for r in results]
+    max_sim = [0.0] * len(results)
+
+    remaining = list(range(len(results)))
+    selected: List[int] = []
+    budget = max_tokens
+    while remaining:
+        live = []
+        for i in remaining:
+            if max_sim[i] >= dup_threshold:
+                info["duplicates"] += 1
+            elif cost[i] > budget:
+                info["over_budget"] += 1    # 예산은 줄기만 하므로 다시 들어갈 수 없음
+            else:
+                live.append(i)
+        if not live:
+            break
+        # 동점이면 원래 순위가 앞선 후보
+        best = max(live, key=lambda i: (lam * rel[i] - (1 - lam) * max_sim[i], -i))
+        selected.append(best)
+        budget -= cost[best]
+        remaining = [i for i in live if i != best]
+        for i in remaining:
+            max_sim[i] = max(max_sim[i], similarity(sets[i], sets[best]))
+
+    info["tokens"] = max_tokens - budget
+    return [results[i] for i in sorted(selected)], info
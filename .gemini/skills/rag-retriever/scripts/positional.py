@@ -0,0 +1,278 @@
+"""
+positional.py — 위치 색인 (따옴표 구절 일치 / 근접도 가중, 요청한 토픽에서만 지연 생성)
+
+BM25는 단어 가방 모델이라 `"tensor core" FP8`처럼 붙어 있어야 의미가 있는 질문도 두 단어가
+청크 양 끝에 떨어져 있으면 같은 점수를 줍니다. --positional을 주면 청크별 단어 위치 색인으로
+    - "따옴표 구절": 구절의 단어가 그 순서로 연달아 나오는 청크만 남김
+    - 근접도 가중: 질문에서 이웃한 두 단어가 청크 안에서 가까울수록 점수를 높임
+        score' = score · (1 + PROXIMITY_WEIGHT · mean_{이웃 단어 쌍} 1 / d²)   (d = 최소 단어 거리)
+BM25 상위 max(POOL_MIN, top_k × 5)개를 다시 채점합니다. 구절이 있으면 위치 색인의 토큰 목록으로 구절 단어를
+모두 가진 청크만 구절 검사하고, 배수 상한(1 + PROXIMITY_WEIGHT)으로 후보 밖 청크가 top_k에 들 수 없을 때까지
+후보 수를 PHRASE_GROWTH배씩 늘립니다 (점수 > 0인 모든 청크를 다시 채점한 결과와 같음).
+
+위치는 단어 단위 (영문 [a-z0-9]+ 하나 / 한글 어절 하나 = 위치 하나). 한글 어절의 2-gram은 모두
+그 어절 위치에 놓이므로, 질문 단어의 2-gram이 모두 같은 위치에 있으면 일치로 봅니다.
+
+위치 캐시 (임베딩 캐시와 같은 방식, 처음 --positional 질문 시에만 생성):
+    {topic}/rag/index/pos_{key}.json
+        {"version", "chunks": [chunk_hash, ...], "postings": {token: {chunk_hash: [첫 위치, 차이, ...]}}}
+토큰 → 청크 → 위치 목록 (역색인 posting마다 위치). 위치 목록은 차분(delta)으로 저장하고,
+질의 시 질문 토큰의 posting에서 후보 청크 것만 복원합니다.
+청크 해시로 조회하므로 소스가 바뀌면 내용이 바뀐 청크만 다시 계산합니다.
+"""
+
+import itertools
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from rag_index import chunk_texts, index_path, rank_many
+
+
+POSITIONAL_VERSION = 2
+PROXIMITY_WEIGHT   = 0.5
+POOL_MIN           = 50    # 근접도로 다시 채점할 BM25 후보 수 (top_k × 5가 더 크면 그만큼)
+PHRASE_GROWTH      = 8     # 구절 질문에서 후보가 모자랄 때 후보 수를 늘리는 배수
+
+WORD_RE   = re.compile(r'[a-z0-9]+|[가-힣]+')
+PHRASE_RE = re.compile(r'"([^"]*)"')
+
+
+# ────────────────────────── 질문 / 위치 ──────────────────────────
+
+def parse_query(query: str) -> Tuple[str, List[List[str]]]:
+    """질문 → (따옴표를 뺀 BM25 질문, 구절별 단어 목록). 단어가 둘 미만인 구절은 일반 단어로 취급."""
+    phrases = []
+    for m in PHRASE_RE.finditer(query):
+        words = WORD_RE.findall(m.group(1).lower())
+        if len(words) >= 2:
+            phrases.append(words)
+    return query.replace('"', " "), phrases
+
+
+def word_tokens(word: str) -> List[str]:
+    """단어 하나가 위치 색인에 남기는 토큰 (영문: 단어, 한글: 2-gram, 한 글자 어절은 그대로)"""
+    if word[0] <= "z" or len(word) < 2:
+        return [word]
+    return [word[i:i + 2] for i in range(len(word) - 1)]
+
+
+def token_positions(text: str) -> Dict[str, List[int]]:
+    """본문 → {token: 단어 위치 오름차순}"""
+    out: Dict[str, List[int]] = {}
+    for pos, m in enumerate(WORD_RE.finditer(text.lower())):
+        for tok in word_tokens(m.group()):
+            seen = out.setdefault(tok, [])
+            if not seen or seen[-1] != pos:
+                seen.append(pos)
+    return out
+
+
+def encode(positions: List[int]) -> List[int]:
+    return [positions[0]] + [b - a for a, b in zip(positions, positions[1:])]
+
+
+def decode(deltas: List[int]) -> List[int]:
+    return list(itertools.accumulate(deltas))
+
+
+def word_positions(postings: Dict[str, Dict[int, List[int]]], i: int, word: str, memo: dict) -> Set[int]:
+    """청크 i에서 단어의 모든 토큰이 함께 놓인 위치 집합 (memo: 토큰별 복원 결과 재사용)"""
+    result: Optional[Set[int]] = None
+    for tok in word_tokens(word):
+        if tok not in memo:
+            deltas = postings.get(tok, {}).get(i)
+            memo[tok] = set(decode(deltas)) if deltas else set()
+        result = memo[tok] if result is None else result & memo[tok]
+        if not result:
+            return set()
+    return result or set()
+
+
+def phrase_match(postings: Dict[str, Dict[int, List[int]]], i: int, words: List[str], memo: dict) -> bool:
+    """청크 i에 구절 단어가 순서대로 연달아 나오는지"""
+    sets = [word_positions(postings, i, w, memo) for w in words]
+    if not all(sets):
+        return False
+    return any(all(p + k in sets[k] for k in range(1, len(sets))) for p in sets[0])
+
+
+def phrase_candidates(postings: Dict[str, Dict[int, List[int]]], phrases: List[List[str]]) -> Set[int]:
+    """구절 단어의 토큰을 모두 가진 청크 id (토큰 posting의 교집합, 구절 검사 대상)"""
+    tokens = sorted({tok for words in phrases for w in words for tok in word_tokens(w)},
+                    key=lambda t: len(postings.get(t, ())))
+    result: Optional[Set[int]] = None
+    for tok in tokens:
+        result = set(postings.get(tok, ())) if result is None else result & postings.get(tok, {}).keys()
+        if not result:
+            return set()
+    return result or set()
+
+
+def proximity(postings: Dict[str, Dict[int, List[int]]], i: int, words: List[str], memo: dict) -> float:
+    """질문의 이웃한 서로 다른 단어 쌍별 1 / (최소 거리)² 평균 (0~1, 한 쪽이 없는 쌍은 0)"""
+    pairs = list(zip(words, words[1:]))
+    if not pairs:
+        return 0.0
+    total = 0.0
+    for a, b in pairs:
+        pa, pb = sorted(word_positions(postings, i, a, memo)), sorted(word_positions(postings, i, b, memo))
+        if not pa or not pb:
+            continue
+        # 정렬된 두 목록을 병합하며 최소 간격
+        x = y = 0
+        best = None
+        while x < len(pa) and y < len(pb):
+            d = abs(pa[x] - pb[y])
+            best = d if best is None else min(best, d)
+            if pa[x] < pb[y]:
+                x += 1
+            else:
+                y += 1
+        total += 1.0 / max(best, 1) ** 2
+    return total / len(pairs)
+
+
+# ────────────────────────── 위치 캐시 ──────────────────────────
+
+def cache_path(index: dict, part: dict) -> Path:
+    return index_path(part["sources_dir"], index["params"], part["index_dir"], prefix="pos")
+
+
+def load_cache(path: Path) -> Tuple[Set[str], Dict[str, Dict[str, List[int]]]]:
+    """→ (캐시된 청크 해시, {token: {chunk_hash: 위치 차분}}). 없거나 버전이 다르면 빈 캐시"""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set(), {}
+    if data.get("version") != POSITIONAL_VERSION:
+        return set(), {}
+    return set(data.get("chunks", [])), data.get("postings", {})
+
+
+def save_cache(path: Path, hashes: Set[str], postings: Dict[str, Dict[str, List[int]]]) -> None:
+    """임시 파일에 쓴 뒤 교체 (rag_index.save_index와 같은 방식)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    data = {"version": POSITIONAL_VERSION, "chunks": sorted(hashes), "postings": postings}
+    tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _add_postings(postings: dict, key, text: str) -> None:
+    """본문 하나의 토큰별 위치 차분을 postings[token][key]에 추가"""
+    for tok, positions in token_positions(text).items():
+        postings.setdefault(tok, {})[key] = encode(positions)
+
+
+def _part_postings(index: dict, part: dict, out: Dict[str, Dict[int, List[int]]]) -> None:
+    """
+    디렉토리 하나의 위치 posting을 out[token][chunk_id]에 추가
+    (캐시에 없는 청크만 본문을 읽어 계산 후 캐시 갱신)
+    """
+    path = cache_path(index, part)
+    cached, postings = load_cache(path)
+    ids_by_hash: Dict[str, List[int]] = {}
+    for i in range(part["start"], part["end"]):
+        ids_by_hash.setdefault(index["hashes"][i], []).append(i)
+    missing = {h: ids[0] for h, ids in ids_by_hash.items() if h not in cached}
+
+    if missing:
+        print(f"  [positional] 위치 색인 생성: {len(missing)}개 청크 (캐시 {len(cached)}개)", file=sys.stderr)
+        texts = chunk_texts(index, list(missing.values()))
+        # 저장 인덱스에 남아 있는 청크(목차 청크 포함)의 위치만 유지
+        live = {c[6] for record in part["stored"]["files"].values() for c in record.get("chunks", [])}
+        if cached - live:
+            postings = {tok: kept for tok, by_hash in postings.items()
+                        if (kept := {h: d for h, d in by_hash.items() if h in live})}
+            cached &= live
+        for h, i in missing.items():
+            _add_postings(postings, h, texts[i])
+        cached |= missing.keys()
+        try:
+            save_cache(path, cached, postings)
+        except OSError:
+            pass
+
+    for tok, by_hash in postings.items():
+        target = None
+        for h, deltas in by_hash.items():
+            ids = ids_by_hash.get(h)
+            if ids:
+                if target is None:
+                    target = out.setdefault(tok, {})
+                for i in ids:
+                    target[i] = deltas
+
+
+def chunk_positions(index: dict) -> Dict[str, Dict[int, List[int]]]:
+    """
+    검색용 인덱스 전체의 위치 posting {token: {chunk_id: 위치 차분}} (인덱스 dict에 캐시).
+    메모리 인덱스(index_from_chunks)는 디스크 캐시 없이 바로 계산.
+    """
+    if "positional" not in index:
+        postings: Dict[str, Dict[int, List[int]]] = {}
+        if not index["parts"]:
+            texts = chunk_texts(index, list(range(len(index["chunks"]))))
+            for i in range(len(index["chunks"])):
+                _add_postings(postings, i, texts[i])
+        else:
+            for part in index["parts"]:
+                _part_postings(index, part, postings)
+        index["positional"] = postings
+    return index["positional"]
+
+
+# ────────────────────────── 검색 ──────────────────────────
+
+def search(
+    index: dict,
+    query: str,
+    top_k: int,
+    engine: str = "auto",
+    field_weights: Optional[Dict[str, float]] = None,
+    stats_out: Optional[dict] = None,
+) -> List[Tuple[float, int]]:
+    """
+    구절 필터 + 근접도 가중 검색 → [(score, chunk_id), ...]  점수 내림차순 (동점은 chunk_id 오름차순).
+    BM25(field_weights가 있으면 BM25F) 점수에 근접도 배수를 곱함.
+    stats_out: 전달하면 rank_many() 통계와 {"phrases": 구절 수, "phrase_rejected": 검사한 후보 중 구절 불일치로
+               뺀 청크 수, "depth": 마지막으로 다시 채점한 BM25 후보 수}를 채움
+    """
+    text, phrases = parse_query(query)
+    depth = max(POOL_MIN, top_k * 5)
+    words = list(dict.fromkeys(WORD_RE.findall(text.lower())))
+    postings = chunk_positions(index) if top_k > 0 else {}
+    matches = phrase_candidates(postings, phrases) if phrases else None
+    boosted: Dict[int, Optional[float]] = {}   # 청크별 근접도 가중 점수 (구절 불일치면 None), 후보를 늘려도 재사용
+    stats: dict = {}
+    while True:
+        ranked = [(s, i) for s, i in rank_many(index, [text], [depth], stats, engine, field_weights)[0] if s > 0]
+        out: List[Tuple[float, int]] = []
+        rejected = 0
+        if top_k > 0 and (matches is None or matches):
+            for score, i in ranked:
+                if i not in boosted:
+                    memo: dict = {}
+                    if phrases and (i not in matches or not all(phrase_match(postings, i, p, memo) for p in phrases)):
+                        boosted[i] = None
+                    else:
+                        boosted[i] = score * (1 + PROXIMITY_WEIGHT * proximity(postings, i, words, memo))
+                if boosted[i] is None:
+                    rejected += 1
+                else:
+                    out.append((boosted[i], i))
+        out.sort(key=lambda x: (-x[0], x[1]))
+        # 구절이 없으면 후보 풀 근사 그대로. 구절이 있으면 top_k번째 점수가 후보 밖 청크(BM25 ≤ 마지막 후보)의
+        # 최대 점수보다 높거나, 점수 > 0인 청크를 다 봤거나, 구절 후보(phrase_candidates)를 다 봤으면 종료
+        if (not phrases or len(ranked) < depth or not matches
+                or (len(out) >= top_k and out[top_k - 1][0] > ranked[-1][0] * (1 + PROXIMITY_WEIGHT))
+                or sum(1 for _, i in ranked if i in matches) == len(matches)):
+            break
+        depth *= PHRASE_GROWTH
+    if stats_out is not None:
+        stats_out.update(stats, phrases=len(phrases), phrase_rejected=rejected, depth=depth)
+    return out[:top_k]
@@ -0,0 +1,320 @@
+"""
+postings_store.py — 디렉토리별 영속 역색인 (웜 경로의 질문 하나를 전체 훑기 없이 MaxScore로 채점)
+
+질문 하나로 끝나는 CLI 실행은 메모리 역색인을 만들면 구성 비용(게시 항목 전체)이 검색보다 훨씬 커서
+doc_tf를 한 번 훑는 _topk_scan()으로 채점했습니다. 훑기는 청크 수에 비례하므로, 인덱스 옆에 게시 목록을
+저장해 두고 질문 토큰의 게시 목록만 읽어 MaxScore(rag_index._topk_maxscore)로 채점합니다.
+
+    {topic}/rag/index/post_{key}.bin   int32 배열. 토큰마다 [청크 순서 번호 ..., tf ...] (순서 번호 오름차순)
+    {topic}/rag/index/post_{key}.off   int64 배열 [순서 지문, 청크 수, 토큰 수 n, 위치 0, ..., 위치 n]  (.bin 항목 위치)
+    {topic}/rag/index/post_{key}.voc   토큰을 "\\n"으로 이은 UTF-8 (.off 위치표 순서)
+
+- 청크 순서 번호 = 저장 인덱스 순서 (chunk_store와 같음, 목차 청크 포함). 검색 시 combine()의 slots로
+  검색용 청크 id에 대응시키고, 목차 필터·근접 중복으로 빠진 청크는 건너뜀
+- 순서 지문(chunk_store.order_digest)을 저장 인덱스의 postings_store에도 기록하고, 둘이 다르면 사용하지 않음
+- IDF·avgdl·점수 상한은 검색 시 합친 인덱스 기준으로 계산하므로 여러 디렉토리·필터와 무관하게
+  _topk_scan()·전체 역색인과 같은 점수·순위
+- 검색 시 메모리: 질문 토큰의 게시 목록과 디렉토리별 순서 번호 → 청크 id 표(청크당 4바이트, 인덱스 dict에 캐시)만
+  만듦. 인덱스 JSON 자체(청크별 doc_tf·통계)는 그대로 로드하므로 전체 메모리는 여전히 청크 수에 비례
+- 게시 목록 저장은 인덱스가 바뀔 때마다 디렉토리 전체를 다시 씀 (게시 항목 수에 비례). 그래서 청크가
+  POSTINGS_MIN_CHUNKS개 이상인 디렉토리만 저장하고, 검색할 인덱스의 모든 디렉토리에 최신 저장본이 있을 때만 사용
+
+POSTINGS_MIN_CHUNKS는 bench_retrieval.py의 single_query_ms(scan / stored, 어휘 로드 포함)로 잰 교차점입니다.
+그보다 작은 코퍼스는 어휘 목록(.voc) 로드가 훑기보다 비쌉니다. 합성 코퍼스 p50 (1코어):
+
+    청크      243    1126   1629   2075   3140   10949   33500
+    scan     6.7ms  28ms   27ms   44ms   42ms   140ms   534ms
+    stored  13.8ms  35ms   28ms   44ms   28ms    38ms   103ms
+"""
+
+import mmap
+import os
+import struct
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from chunking import tokenize
+from chunk_store import order_digest
+from rag_index import _term_score, _topk_exhaustive, _topk_maxscore, index_path, query_idf
+
+
+# 질문 하나를 훑기 대신 저장된 게시 목록으로 채점하는 최소 청크 수 (bench_retrieval.py single_query_ms 교차점)
+POSTINGS_MIN_CHUNKS = 2000
+
+HEADER = 3   # [순서 지문, 청크 수, 토큰 수]
+ITEM = struct.calcsize("=q")
+PAIR = struct.Struct("=2q")
+INT = array("i").itemsize
+
+_stores: Dict[str, Tuple[Dict[str, int], Optional[mmap.mmap], mmap.mmap]] = {}   # .bin 경로 → (어휘, 게시 mmap, 위치표 mmap)
+_lock = threading.Lock()
+
+
+def store_paths(sources_dir: Path, params: dict, index_dir: Optional[Path] = None) -> Tuple[Path, Path, Path]:
+    """(게시 목록 .bin, 위치표 .off, 어휘 .voc) 경로 (BM25 인덱스와 같은 key 규칙)"""
+    return tuple(index_path(sources_dir, params, index_dir, prefix="post", suffix=s) for s in (".bin", ".off", ".voc"))
+
+
+def chunk_count(stored: dict) -> int:
+    """저장 인덱스의 청크 수 (목차 청크 포함)"""
+    return sum(len(record.get("chunks", [])) for record in stored["files"].values())
+
+
+def is_current(stored: dict, off_path: Path) -> bool:
+    """저장된 게시 목록이 이 저장 인덱스의 청크 순서로 만들어졌는지 (위치표 머리만 읽음)"""
+    header = array("q")
+    try:
+        with open(off_path, "rb") as f:
+            header.fromfile(f, HEADER)
+    except (OSError, EOFError):
+        return False
+    return stored.get("postings_store") == header[0]
+
+
+# ────────────────────────── 쓰기 ──────────────────────────
+
+def sync(stored: dict, sources_dir: Path, params: dict, index_dir: Optional[Path] = None) -> bool:
+    """
+    저장 인덱스의 doc_tf로 게시 목록을 다시 써서 stored["postings_store"]에 순서 지문 기록 (소스는 읽지 않음).
+    Returns: stored["postings_store"]가 바뀌었는지 (True면 저장 인덱스도 다시 저장해야 함)
+    """
+    bin_path, off_path, voc_path = store_paths(sources_dir, params, index_dir)
+    hashes: List[str] = []
+    postings: Dict[str, Tuple[array, array]] = {}
+    slot = 0
+    for name in sorted(stored["files"]):
+        record = stored["files"][name]
+        hashes.extend(c[6] for c in record.get("chunks", []))
+        for tf_map in record.get("doc_tf", []):
+            for tok, tf in tf_map.items():
+                entry = postings.get(tok)
+                if entry is None:
+                    postings[tok] = entry = (array("i"), array("i"))
+                entry[0].append(slot)
+                entry[1].append(tf)
+            slot += 1
+    digest = order_digest(hashes)
+
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+    suffix = f".tmp{os.getpid()}"
+    tmp_bin, tmp_off, tmp_voc = (p.with_name(p.name + suffix) for p in (bin_path, off_path, voc_path))
+    offsets = array("q", [digest, slot, len(postings), 0])
+    pos = 0
+    with open(tmp_bin, "wb") as f:
+        for slots, tfs in postings.values():
+            slots.tofile(f)
+            tfs.tofile(f)
+            pos += 2 * len(slots)
+            offsets.append(pos)
+    tmp_voc.write_bytes("\n".join(postings).encode("utf-8"))
+    with open(tmp_off, "wb") as f:
+        offsets.tofile(f)
+    # 위치표를 나중에 교체: 중간에 중단되면 지문이 맞지 않아 훑기로 돌아감
+    release(bin_path)
+    os.replace(tmp_bin, bin_path)
+    os.replace(tmp_voc, voc_path)
+    os.replace(tmp_off, off_path)
+    changed = stored.get("postings_store") != digest
+    stored["postings_store"] = digest
+    return changed
+
+
+# ────────────────────────── 읽기 ──────────────────────────
+
+def _map(path: Path) -> mmap.mmap:
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_store(
+    bin_path: Path, off_path: Path, voc_path: Path, digest: Optional[int],
+) -> Optional[Tuple[Dict[str, int], Optional[mmap.mmap], mmap.mmap]]:
+    """
+    (어휘 {토큰: 위치표 번호}, 게시 mmap, 위치표 mmap). 프로세스당 한 번 열어 재사용하고,
+    위치표 머리의 순서 지문이 digest와 다르면 다시 엶. 그래도 다르거나 열 수 없으면 None.
+    """
+    if digest is None:
+        return None
+    key = str(bin_path)
+    with _lock:
+        store = _stores.get(key)
+        if store is not None and PAIR.unpack_from(store[2], 0)[0] != digest:
+            _close(key)
+            store = None
+        if store is None:
+            try:
+                off = _map(off_path)
+            except (OSError, ValueError):
+                return None
+            try:
+                if len(off) < HEADER * ITEM or PAIR.unpack_from(off, 0)[0] != digest:
+                    raise ValueError("순서 지문 불일치")
+                n_terms = struct.unpack_from("=q", off, 2 * ITEM)[0]
+                tokens = voc_path.read_bytes().decode("utf-8").split("\n") if n_terms else []
+                if len(tokens) != n_terms or len(off) != (HEADER + n_terms + 1) * ITEM:
+                    raise ValueError("어휘 수 불일치")
+                blob = _map(bin_path) if os.path.getsize(bin_path) else None   # 빈 파일은 mmap할 수 없음
+            except (OSError, ValueError, UnicodeDecodeError):
+                off.close()
+                return None
+            store = ({tok: i for i, tok in enumerate(tokens)}, blob, off)
+            _stores[key] = store
+    return store
+
+
+def _close(key: str) -> None:
+    store = _stores.pop(key, None)
+    if store is not None:
+        for m in store[1:]:
+            if m is not None:
+                m.close()
+
+
+def release(bin_path: Path) -> None:
+    """열어 둔 mmap 닫기 (게시 목록 파일 교체 전)"""
+    with _lock:
+        _close(str(bin_path))
+
+
+def read_postings(store: Tuple[Dict[str, int], Optional[mmap.mmap], mmap.mmap], tok: str) -> Tuple[array, array]:
+    """토큰의 (청크 순서 번호 배열, tf 배열). 없는 토큰이면 빈 배열."""
+    vocab, blob, off = store
+    slots, tfs = array("i"), array("i")
+    i = vocab.get(tok)
+    if i is None or blob is None:
+        return slots, tfs
+    start, end = PAIR.unpack_from(off, (HEADER + i) * ITEM)
+    mid = start + (end - start) // 2
+    slots.frombytes(blob[start * INT:mid * INT])
+    tfs.frombytes(blob[mid * INT:end * INT])
+    return slots, tfs
+
+
+def open_stores(index: dict, min_chunks: int = POSTINGS_MIN_CHUNKS) -> Optional[list]:
+    """
+    검색용 인덱스의 디렉토리별 저장 게시 목록. 청크가 min_chunks개 미만이거나,
+    최신 저장본이 없는 디렉토리가 하나라도 있으면 None (→ 훑기).
+    """
+    if "slots" not in index or len(index["chunks"]) < min_chunks:
+        return None
+    stores = []
+    for part in index["parts"]:
+        paths = store_paths(part["sources_dir"], index["params"], part.get("index_dir"))
+        store = open_store(*paths, part["stored"].get("postings_store"))
+        if store is None:
+            return None
+        stores.append(store)
+    return stores
+
+
+def vocab_order(index: dict, stores: list, inverse: List[array]) -> List[str]:
+    """
+    검색용 인덱스의 청크 순서대로 처음 등장한 토큰 목록 (query_idf()의 epsilon 합산 순서, doc_tf를 훑지 않음).
+    .voc는 저장 인덱스 순서의 첫 등장 순이므로 토큰마다 첫 게시 항목만 보면 되고, 첫 청크가 목차 필터·
+    근접 중복으로 빠진 토큰만 남은 청크 중 첫 청크를 찾아 그 청크의 토큰 순서로 끼워 넣음.
+    """
+    groups: Dict[int, List[Tuple[str, bool]]] = {}   # 첫 등장 청크 id → [(토큰, 첫 청크가 빠졌는지), ...]
+    seen = set()
+    for inv, (vocab, blob, off) in zip(inverse, stores):
+        if blob is None:
+            continue
+        pos = array("q")
+        pos.frombytes(off[HEADER * ITEM:(HEADER + len(vocab) + 1) * ITEM])
+        with memoryview(blob) as view, view.cast("i") as ints:
+            for tok, k in vocab.items():
+                if tok in seen:
+                    continue
+                first = inv[ints[pos[k]]]
+                moved = first < 0
+                if moved:
+                    mid = pos[k] + (pos[k + 1] - pos[k]) // 2
+                    first = next((inv[s] for s in ints[pos[k] + 1:mid] if inv[s] >= 0), -1)
+                    if first < 0:
+                        continue
+                seen.add(tok)
+                groups.setdefault(first, []).append((tok, moved))
+
+    doc_tf = index["doc_tf"]
+    order: List[str] = []
+    for i in sorted(groups):
+        group = groups[i]
+        if any(moved for _, moved in group):
+            rank = {tok: r for r, tok in enumerate(doc_tf[i])}
+            group.sort(key=lambda g: rank[g[0]])
+        order.extend(tok for tok, _ in group)
+    return order
+
+
+def inverse_maps(index: dict, stores: list) -> List[array]:
+    """
+    디렉토리별 청크 순서 번호 → 검색용 청크 id (빠진 청크는 -1).
+    만드는 데 청크 수만큼 걸리므로 인덱스 dict에 캐시 (rank_unique()가 후보를 늘려 다시 채점하거나
+    같은 인덱스로 질문을 여러 번 채점할 때 재사용). 저장소를 다시 열었으면 새로 만듦.
+    """
+    cached = index.get("store_inverse")
+    if cached is not None and len(cached[0]) == len(stores) and all(a is b[2] for a, b in zip(cached[0], stores)):
+        return cached[1]
+    slots = index["slots"]
+    inverse = []
+    for part, store in zip(index["parts"], stores):
+        inv = array("i", [-1]) * PAIR.unpack_from(store[2], 0)[1]
+        for i in range(part["start"], part["end"]):
+            inv[slots[i]] = i
+        inverse.append(inv)
+    index["store_inverse"] = ([store[2] for store in stores], inverse)
+    return inverse
+
+
+def query_postings(stores: list, inverse: List[array], tokens) -> Dict[str, Tuple[List[int], List[int]]]:
+    """토큰별 게시 목록 → {token: ([chunk_id, ...], [tf, ...])}  검색용 청크 id 오름차순, 없는 토큰은 빠짐"""
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    for tok in tokens:
+        ids: List[int] = []
+        tfs: List[int] = []
+        for inv, store in zip(inverse, stores):
+            for s, tf in zip(*read_postings(store, tok)):
+                i = inv[s]
+                if i >= 0:
+                    ids.append(i)
+                    tfs.append(tf)
+        if ids:
+            postings[tok] = (ids, tfs)
+    return postings
+
+
+def topk(index: dict, stores: list, query: str, top_k: int, stats: dict) -> List[Tuple[float, int]]:
+    """
+    저장된 게시 목록으로 질문 하나 채점 → [(score, chunk_id), ...]  (_topk_scan과 같은 결과).
+    질문 토큰의 게시 목록만 읽어 검색용 청크 id로 바꾼 뒤 MaxScore (음수 IDF가 섞이면 전수 채점).
+    """
+    q_tokens = tokenize(query)
+    doc_len  = index["doc_len"]
+    n_docs   = len(doc_len)
+    avgdl    = index["total_len"] / n_docs if n_docs else 1.0
+
+    inverse = inverse_maps(index, stores)
+    idf = query_idf(index, q_tokens, lambda: vocab_order(index, stores, inverse))
+
+    postings = query_postings(stores, inverse, idf)
+    max_score = {
+        tok: max(_term_score(idf[tok], tf, doc_len[i], avgdl) for i, tf in zip(ids, tfs))
+        for tok, (ids, tfs) in postings.items()
+    }
+    view = {
+        "postings":  postings,
+        "idf":       idf,
+        "max_score": max_score,
+        "doc_tf":    index["doc_tf"],
+        "doc_len":   doc_len,
+        "avgdl":     avgdl,
+    }
+    stats["total_postings"] += sum(len(postings[q][0]) for q in q_tokens if q in postings)
+
+    # 상한 가지치기는 모든 항 점수가 0 이상일 때만 정확
+    if all(idf[q] > 0 for q in q_tokens if q in postings):
+        ranked = _topk_maxscore(view, q_tokens, top_k, stats)
+    else:
+        ranked = _topk_exhaustive(view, q_tokens, top_k, stats)
+    return [(-neg_score, i) for neg_score, i in ranked]
@@ -0,0 +1,167 @@
+"""
+profiling.py — 단계별 시간 / 메모리 계측 (--profile, RAG_PROFILE)
+
+질문 하나가 몇 초씩 걸릴 때 파일 읽기·청크 분할·목차 필터·토큰화·BM25 구성·출력 포맷 중
+어디에 시간이 드는지 보기 위한 계측 훅입니다. Profiler가 활성화된 동안에만 기록하고,
+비활성 상태의 훅 비용은 ContextVar 조회 한 번입니다.
+
+    with Profiler() as prof:                      # 라이브러리에서 직접
+        retrieve(query, sources_dir)
+    prof.report()
+
+    RAG_PROFILE=1  python scripts/retrieve_chunks.py ...          # stderr에 JSON 한 줄
+    RAG_PROFILE=/tmp/rag_profile.jsonl  (또는 --profile 경로)      # 파일에 JSONL로 추가
+
+단계 (처음 기록된 순서로 보고, 같은 이름은 누적):
+    wall_ms   경과 시간 합
+    calls     호출 수
+    peak_kb   단계 중 tracemalloc 최대 사용량 − 단계 시작 시 사용량 (stage()로 감싼 단계만)
+    그 밖의 키  단계별 개수 (files, chunks, results ...)
+
+tracemalloc은 추적된 모든 할당에 비용이 들어 계측 중에는 전체 시간이 1.5~3배 늘어납니다.
+단계 간 비율을 보는 용도이며, 절대 시간은 Profiler(memory=False)로 따로 재는 것이 정확합니다.
+병렬 인덱싱(--jobs > 1) 중 워커 프로세스 안의 하위 단계(chunk / tokenize ...)는 기록되지 않습니다.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+
+PROFILE_ENV = "RAG_PROFILE"
+
+_current: ContextVar[Optional["Profiler"]] = ContextVar("rag_profiler", default=None)
+
+
+class Profiler:
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.stages: Dict[str, dict] = {}
+        self._stack: List[List[int]] = []     # 열린 stage()별 [시작 시 사용량, 지금까지 최대]
+        self._token = None
+        self._started_tracing = False
+        self._t0 = 0.0
+        self.total_ms = 0.0
+        self.peak_kb: Optional[int] = None
+
+    # ── 활성화 ──
+    def __enter__(self) -> "Profiler":
+        import tracemalloc   # 계측할 때만 (CLI 시작 시간에서 제외)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _current.set(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.total_ms += (time.perf_counter() - self._t0) * 1000
+        _current.reset(self._token)
+        if self._started_tracing:
+            import tracemalloc
+            self.peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    # ── 기록 ──
+    def _entry(self, name: str) -> dict:
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {"wall_ms": 0.0, "calls": 0}
+        return entry
+
+    def add(self, name: str, seconds: float, **counts: int) -> None:
+        """측정해 둔 시간을 단계에 누적 (반복문 안처럼 stage()가 무거운 곳)"""
+        entry = self._entry(name)
+        entry["wall_ms"] += seconds * 1000
+        entry["calls"] += 1
+        for key, value in counts.items():
+            entry[key] = entry.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict]:
+        """with 블록 하나를 단계로 기록. yield한 dict에 넣은 개수는 단계에 누적."""
+        import tracemalloc
+        counts: Dict[str, int] = {}
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, current])
+        t0 = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add(name, time.perf_counter() - t0, **counts)
+            if tracing:
+                start, seen = self._stack.pop()
+                peak = max(seen, tracemalloc.get_traced_memory()[1])
+                entry = self.stages[name]
+                entry["peak_kb"] = max(entry.get("peak_kb", 0), (peak - start) // 1024)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def report(self, **extra) -> dict:
+        record = dict(extra)
+        record["total_ms"] = round(self.total_ms, 3)
+        if self.peak_kb is not None:
+            record["peak_kb"] = self.peak_kb
+        record["stages"] = [
+            dict(stage=name, **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in entry.items()})
+            for name, entry in self.stages.items()
+        ]
+        return record
+
+
+# ────────────────────────── 훅 (계측 대상 모듈에서 사용) ──────────────────────────
+
+def active() -> Optional[Profiler]:
+    return _current.get()
+
+
+def stage(name: str):
+    """활성 Profiler가 있으면 그 stage(), 없으면 빈 dict를 주는 nullcontext"""
+    prof = _current.get()
+    return prof.stage(name) if prof is not None else nullcontext({})
+
+
+def add(name: str, seconds: float, **counts: int) -> None:
+    prof = _current.get()
+    if prof is not None:
+        prof.add(name, seconds, **counts)
+
+
+# ────────────────────────── 출력 ──────────────────────────
+
+def emit(record: dict, target: str) -> None:
+    """target이 "1" / "-" / "stderr"면 stderr에 JSON 한 줄, 그 외에는 그 경로에 JSONL로 추가"""
+    line = json.dumps(record, ensure_ascii=False)
+    if target in ("1", "-", "stderr", "true"):
+        print(line, file=sys.stderr)
+        return
+    try:
+        with open(target, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"  [warn] 프로파일 기록 실패 ({target}): {e}", file=sys.stderr)
+
+
+@contextmanager
+def session(target: Optional[str] = None, **meta) -> Iterator[Optional[Profiler]]:
+    """
+    target(없으면 RAG_PROFILE 환경 변수)이 있으면 Profiler를 켜고 끝날 때 emit().
+    이미 바깥에서 Profiler가 활성화돼 있으면 그 Profiler에 기록만 함 (중복 출력 없음).
+    """
+    target = target or os.environ.get(PROFILE_ENV)
+    if not target or target == "0" or _current.get() is not None:
+        yield _current.get()
+        return
+    with Profiler() as prof:
+        yield prof
+    emit(prof.report(**meta), target)
@@ -0,0 +1,1247 @@
+"""
+rag_index.py — 소스 디렉토리별 영속 BM25 인덱스 (증분 갱신)
+
+retrieve_chunks.py가 질문마다 모든 .md 파일을 다시 읽고 청크 분할·목차 필터·
+토큰화·BM25 구축을 반복하지 않도록, 그 결과를 디스크에 저장해 두고 재사용합니다.
+
+저장 위치:
+    {topic}/rag/index/bm25_{key}.json   (sources_dir 옆에 rag/ 폴더가 있을 때)
+    {sources_dir}/.rag_index/bm25_{key}.json   (그 외)
+
+key는 chunk_size / overlap / glob / summary 포함 여부 / chunker로 정해지므로
+CLI 옵션을 바꾸면 별도 인덱스가 만들어집니다. 목차 필터(max_link_ratio)는 청크별로
+저장된 통계에 대한 검색 시 필터라 key에 포함되지 않습니다 (임계값을 바꿔도 재생성 없음).
+
+인덱스는 파일 단위 레코드로 저장되어, 소스가 추가·변경·삭제되면 해당 파일만
+다시 청크 분할합니다 (재생성 비용 ∝ 변경량).
+
+저장 내용:
+    params       인덱스 파라미터
+    files        {relpath: {size, mtime_ns, sha256, chunks, doc_tf, doc_len, chars[, sections][, field_tf, field_len]}}
+                 chunks = [[chunk_idx, byte_start, byte_end, link_count, text_len, chunk_len, chunk_hash,
+                            simhash, section, char_start, char_end], ...]
+                 (청크 본문은 저장하지 않음, link_count~chunk_len은 목차 판별 통계 — chunking.toc_stats(),
+                  chunk_hash는 본문 sha1 앞 16자 — 임베딩 캐시 키, simhash는 근접 중복 판별용 64비트 서명,
+                  section은 sections(제목 경로 목록)의 위치 — chunker="heading"일 때만, 아니면 -1,
+                  char_start~char_end는 소스 파일 안 문자 구간 — --format json이 소스를 열지 않도록)
+                 field_tf = {"title": {tok: tf}, "domain": {tok: tf}, "heading": [{tok: tf}, ...]}
+                 field_len = {"title": n, "domain": n, "heading": [n, ...]}  BM25F 필드 — frontmatter title /
+                 source_url 호스트 / sections별 토큰 빈도와 길이 (제목·도메인·제목 경로가 있을 때만)
+                 chars = 파일 글자 수 (--show-stats가 소스를 다시 읽지 않도록)
+                 (summary 파일은 {size, mtime_ns, sha256, summary_text, chars})
+    df           토큰별 문서(청크) 빈도 (목차 청크 포함) — 파일 추가/삭제 시 기여분만 가감
+    text_store   청크 본문 저장소(chunk_store.py, text_{key}.bin/.off)의 순서 지문 — 최신이면
+                 chunk_texts()가 소스 .md 대신 저장소(mmap)에서 결과 청크만 디코딩
+    postings_store  영속 역색인(postings_store.py, post_{key}.bin/.off/.voc)의 순서 지문 — 청크가
+                 POSTINGS_MIN_CHUNKS개 이상인 디렉토리만 저장
+
+검색 시 assemble() / combine()이 목차 필터를 적용하며 펼쳐 만드는 필드
+(여러 디렉토리는 df를 합산해 전역 랭킹, 필터된 청크의 df 기여분은 제외):
+    chunks       [(source_name, chunk_idx), ...]  목차 필터 통과 청크
+    spans        [(소스 파일 경로, byte_start, byte_end), ...]  → chunk_texts()가 반환 청크만 읽음
+    records      청크별 저장 레코드 (files의 chunks 항목 참조 — 문자 구간, 목차 통계)
+    hashes       청크별 chunk_hash
+    breadcrumbs  청크별 제목 경로 ("" = 없음) → chunk_texts()가 본문 앞에 붙임
+    fields       {소스 파일 경로: {"tf", "len", "start", "end"}}  파일의 field_tf / field_len과 청크 id 범위
+                 (BM25F — bm25f.py)
+    field_total  {"title", "heading", "domain"} 필드별 전체 길이 (avglen_f = field_total / N)
+    parts        [{"sources_dir", "stored", "start", "end", "index_dir"}, ...]  디렉토리별 청크 id 범위
+    doc_tf       청크별 토큰 빈도 {token: tf}
+    doc_len      청크별 토큰 수
+    total_len    전체 토큰 수 (avgdl = total_len / N)
+    simhashes    청크별 SimHash 서명 → collapse()가 순위 후보의 근접 중복을 검색 시 합침
+    near_dup_bits  근접 중복 해밍 거리 임계값 (음수면 통합 안 함)
+    slots        청크별 디렉토리 저장 인덱스 안 순서 번호 (chunk_store 위치표 조회용)
+    source_chars 소스 파일 글자 수 합
+
+웜 경로 (저장 인덱스가 최신): 인덱스 JSON 하나 + 결과 청크 본문만 읽고, 질문 하나면 rank_bm25·NumPy
+없이 채점 — 청크가 POSTINGS_MIN_CHUNKS개 이상이면 저장된 게시 목록(postings_store.py)의 질문 토큰만 읽어
+MaxScore, 그보다 작으면 doc_tf를 한 번 훑음 (_topk_scan, 게시 목록 구성 생략). 시작 시간 예산은
+startup_budget.py로 확인.
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from chunking import (
+    chunk_text, frontmatter_fields, is_toc, iter_chunk_spans, iter_heading_chunk_spans, source_domain,
+    strip_frontmatter, toc_stats, tokenize, with_breadcrumb,
+)
+from simhash import NEAR_DUP_BITS, collapse_ranked, simhash
+import profiling
+
+
+INDEX_VERSION = 11
+
+# jobs=0(자동)일 때 다시 인덱싱할 파일 합계가 이 크기 이상이면 프로세스 풀 사용
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+# rank_bm25.BM25Okapi 기본 파라미터와 동일 (점수 호환)
+BM25_K1      = 1.5
+BM25_B       = 0.75
+BM25_EPSILON = 0.25
+
+
+# ────────────────────────── 경로 / 키 ──────────────────────────
+
+def default_index_dir(sources_dir: Path) -> Path:
+    """
+    인덱스 저장 폴더 결정.
+    Agent/{Category}/{topic}/sources 구조면 옆의 rag/ (manifest.json 위치) 아래에,
+    아니면 sources_dir 안의 숨김 폴더에 저장.
+    """
+    rag_dir = sources_dir.parent / "rag"
+    if rag_dir.is_dir():
+        return rag_dir / "index"
+    return sources_dir / ".rag_index"
+
+
+def index_params(
+    chunk_size: int,
+    overlap: int,
+    max_link_ratio: float,
+    glob: str,
+    include_summary: bool,
+    near_dup_bits: int = NEAR_DUP_BITS,
+    chunker: str = "paragraph",
+) -> dict:
+    """
+    인덱스·검색 파라미터 묶음. chunker: "paragraph" | "heading" (chunking.CHUNKERS).
+    max_link_ratio / near_dup_bits는 검색 시 필터라 저장 인덱스 key(stored_params)에서는 빠짐.
+    near_dup_bits가 음수면 근접 중복 통합 비활성화.
+    """
+    return {
+        "version":         INDEX_VERSION,
+        "chunk_size":      chunk_size,
+        "overlap":         overlap,
+        "max_link_ratio":  max_link_ratio,
+        "glob":            glob,
+        "include_summary": include_summary,
+        "near_dup_bits":   near_dup_bits,
+        "chunker":         chunker,
+    }
+
+
+# 검색 시에만 쓰이는 파라미터 (저장 인덱스 재사용 여부와 무관)
+SEARCH_ONLY_PARAMS = ("max_link_ratio", "near_dup_bits")
+
+
+def stored_params(params: dict) -> dict:
+    """인덱스 재사용 여부를 결정하는 파라미터 (저장 인덱스의 params 필드)"""
+    return {k: v for k, v in params.items() if k not in SEARCH_ONLY_PARAMS}
+
+
+def params_key(params: dict) -> str:
+    raw = json.dumps(stored_params(params), sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def index_path(
+    sources_dir: Path,
+    params: dict,
+    index_dir: Optional[Path] = None,
+    prefix: str = "bm25",
+    suffix: str = ".json",
+) -> Path:
+    """
+    인덱스 파일 경로. index_dir을 직접 지정하면 여러 소스 디렉토리가 같은 폴더를
+    공유할 수 있으므로 디렉토리 경로 해시를 파일명에 덧붙임.
+    prefix / suffix로 같은 규칙의 부속 파일(임베딩 캐시 등) 경로도 만듦.
+    """
+    if index_dir is None:
+        return default_index_dir(sources_dir) / f"{prefix}_{params_key(params)}{suffix}"
+    dir_key = hashlib.sha1(str(sources_dir.resolve()).encode("utf-8")).hexdigest()[:8]
+    return index_dir / f"{prefix}_{params_key(params)}_{dir_key}{suffix}"
+
+
+def scan_files(sources_dir: Path, glob: str) -> Dict[str, Tuple[int, int]]:
+    """파일 내용을 읽지 않고 stat만으로 소스 상태 수집: {relpath: (size, mtime_ns)}"""
+    state: Dict[str, Tuple[int, int]] = {}
+    for path in sorted(sources_dir.glob(glob)):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        state[path.relative_to(sources_dir).as_posix()] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+def chunk_hash(text: str) -> str:
+    """청크 본문 해시 (임베딩·재순위 캐시 키)"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# ────────────────────────── 파일 단위 인덱싱 ──────────────────────────
+
+def _byte_offsets(text: str, positions: List[int]) -> List[int]:
+    """문자 위치 목록 → UTF-8 바이트 위치 (오름차순이면 앞에서부터 한 번만 인코딩)"""
+    out: List[int] = []
+    char_pos = byte_pos = 0
+    for pos in positions:
+        if pos < char_pos:
+            char_pos = byte_pos = 0
+        byte_pos += len(text[char_pos:pos].encode("utf-8"))
+        char_pos = pos
+        out.append(byte_pos)
+    return out
+
+
+def index_file(name: str, content: str, params: dict) -> dict:
+    """
+    파일 하나를 청크 분할 → 목차 판별 통계 → 토큰화.
+    청크는 본문 대신 소스 파일 내 바이트 구간만 저장 (검색 결과로 반환될 때만 읽음).
+    chunker="heading"이면 제목 구간 안에서만 청크를 만들고, 제목 경로는 파일당 sections에 한 번 저장.
+    제목 경로는 색인 대상에 포함 (토큰화·해시는 with_breadcrumb(경로, 본문) 기준, 목차 통계는 본문 기준).
+    목차 청크도 모두 저장하고, 필터는 검색 시 통계로 적용 (combine()).
+    BM25F 필드(frontmatter title / source_url 호스트 / 제목 경로)는 토큰 빈도·길이를 파일당 field_tf /
+    field_len으로 저장 (검색 시 bm25f.py가 다시 토큰화하지 않음).
+    summary 파일은 청크 대신 본문만 보관 (맥락 제공용).
+    """
+    if "summary" in Path(name).name.lower() and params["include_summary"]:
+        return {"summary_text": strip_frontmatter(content), "chars": len(content)}
+
+    chunks: List[list] = []
+    doc_tf: List[Dict[str, int]] = []
+    doc_len: List[int] = []
+    sections: Dict[str, int] = {}
+
+    # 단계별 시간 (profiling 활성 시 보고): 청크 분할 = 전체 − 토큰화 − 목차 통계 − 서명
+    clock = time.perf_counter
+    t_file = clock()
+    t_tok = t_toc = t_sig = 0.0
+
+    if params.get("chunker") == "heading":
+        spans = iter_heading_chunk_spans(content, params["chunk_size"], params["overlap"])
+    else:
+        spans = iter_chunk_spans(content, params["chunk_size"], params["overlap"])
+    for crumb, idx, start, end in spans:
+        body = chunk_text(content, start, end)
+        chunk = with_breadcrumb(crumb, body) if crumb else body
+        t0 = clock()
+        tokens = tokenize(chunk)
+        tf: Dict[str, int] = {}
+        for tok in tokens:
+            tf[tok] = tf.get(tok, 0) + 1
+        t1 = clock()
+        stats = toc_stats(body)
+        t2 = clock()
+        signature = [chunk_hash(chunk), simhash(tf)]
+        t3 = clock()
+        t_tok, t_toc, t_sig = t_tok + t1 - t0, t_toc + t2 - t1, t_sig + t3 - t2
+        section = sections.setdefault(crumb, len(sections)) if crumb else -1
+        chunks.append([idx, start, end, *stats, *signature, section, start, end])
+        doc_tf.append(tf)
+        doc_len.append(len(tokens))
+
+    # 문자 구간(c[9], c[10])은 그대로 두고 읽기용 구간(c[1], c[2])만 바이트 위치로 변환
+    starts = _byte_offsets(content, [c[1] for c in chunks])
+    ends   = _byte_offsets(content, [c[2] for c in chunks])
+    for c, b_start, b_end in zip(chunks, starts, ends):
+        c[1], c[2] = b_start, b_end
+
+    if profiling.active():
+        profiling.add("chunk", clock() - t_file - t_tok - t_toc - t_sig, chunks=len(chunks))
+        profiling.add("tokenize", t_tok, tokens=sum(doc_len))
+        profiling.add("toc_stats", t_toc)
+        profiling.add("signature", t_sig)
+
+    record = {"chunks": chunks, "doc_tf": doc_tf, "doc_len": doc_len, "chars": len(content)}
+    if sections:
+        record["sections"] = list(sections)
+    fm = frontmatter_fields(content)
+    field_tf = {
+        "title":   _token_counts(fm.get("title", "")),
+        "domain":  _token_counts(source_domain(fm.get("source_url", ""))),
+        "heading": [_token_counts(crumb) for crumb in sections],
+    }
+    if field_tf["title"] or field_tf["domain"] or sections:
+        record["field_tf"] = field_tf
+        record["field_len"] = {
+            "title":   sum(field_tf["title"].values()),
+            "domain":  sum(field_tf["domain"].values()),
+            "heading": [sum(tf.values()) for tf in field_tf["heading"]],
+        }
+    return record
+
+
+def _token_counts(text: str) -> Dict[str, int]:
+    tf: Dict[str, int] = {}
+    for tok in tokenize(text):
+        tf[tok] = tf.get(tok, 0) + 1
+    return tf
+
+
+def kept_chunks(record: dict, max_link_ratio: float) -> List[int]:
+    """목차 필터를 통과한 청크의 레코드 내 위치 (max_link_ratio가 0이면 전부)"""
+    chunks = record.get("chunks", [])
+    if max_link_ratio <= 0:
+        return list(range(len(chunks)))
+    return [j for j, c in enumerate(chunks) if not is_toc(c[3:6], max_link_ratio)]
+
+
+def file_stats(record: dict, max_link_ratio: float) -> dict:
+    """파일 하나가 BM25 인덱스에 기여한 청크/토큰 통계 (manifest 기록용)"""
+    kept = kept_chunks(record, max_link_ratio)
+    doc_len = record.get("doc_len", [])
+    return {
+        "chunk_count":     len(kept),
+        "filtered_chunks": len(record.get("chunks", [])) - len(kept),
+        "token_count":     sum(doc_len[j] for j in kept),
+    }
+
+
+def _apply_df(df: Dict[str, int], record: dict, sign: int) -> None:
+    """레코드의 문서 빈도 기여분을 df에 더하거나(+1) 뺌(-1)"""
+    for tf in record.get("doc_tf", []):
+        for tok in tf:
+            count = df.get(tok, 0) + sign
+            if count > 0:
+                df[tok] = count
+            else:
+                df.pop(tok, None)
+
+
+def _index_job(job: Tuple[str, str, dict, Optional[str]]) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    파일 하나 읽기 → sha256 → (내용이 바뀌었으면) index_file(). 프로세스 풀 작업 단위.
+    Returns: (sha256, record)  읽기 실패 → (None, None), 내용 동일 → (sha256, None)
+    """
+    path, name, params, old_digest = job
+    t0 = time.perf_counter()
+    try:
+        data = Path(path).read_bytes()
+        content = data.decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None, None
+    digest = content_hash(data)
+    profiling.add("read", time.perf_counter() - t0, files=1, bytes=len(data))
+    if digest == old_digest:
+        return digest, None
+    return digest, index_file(name, content, params)
+
+
+def resolve_jobs(jobs: int, n_files: int, n_bytes: int) -> int:
+    """인덱싱 프로세스 수. 0(자동)이면 변경량이 PARALLEL_MIN_BYTES 이상일 때만 CPU 수만큼."""
+    if jobs == 0:
+        jobs = (os.cpu_count() or 1) if n_bytes >= PARALLEL_MIN_BYTES else 1
+    return max(1, min(jobs, n_files))
+
+
+def update_index(
+    index: Optional[dict],
+    sources_dir: Path,
+    params: dict,
+    jobs: int = 0,
+) -> Tuple[dict, dict]:
+    """
+    기존 인덱스를 현재 소스 상태에 맞게 증분 갱신.
+    - (크기, mtime) 동일 → 그대로 유지 (파일을 읽지 않음)
+    - 크기/mtime 변경 → sha256 비교, 내용까지 바뀐 파일만 다시 청크 분할
+    - 사라진 파일, 바뀌었는데 읽을 수 없는 파일 → 레코드와 df 기여분 제거
+    다시 읽을 파일은 파일 단위로 독립이므로 jobs개 프로세스로 나눠 처리하고,
+    결과는 파일 순서대로 병합 (순차 처리와 같은 인덱스).
+
+    Returns: (index, {"added": [...], "changed": [...], "removed": [...], "unchanged": n, "dirty": bool})
+    """
+    params = stored_params(params)
+    if index is None or index.get("params") != params:
+        index = {"params": params, "files": {}, "df": {}}
+
+    files: Dict[str, dict] = index["files"]
+    df: Dict[str, int] = index["df"]
+    stats = {"added": [], "changed": [], "removed": [], "unchanged": 0, "dirty": False}
+
+    with profiling.stage("scan") as st:
+        current = scan_files(sources_dir, params["glob"])
+        st["files"] = len(current)
+
+    for name in [n for n in files if n not in current]:
+        _apply_df(df, files.pop(name), -1)
+        stats["removed"].append(name)
+        stats["dirty"] = True
+
+    pending: List[Tuple[str, int, int]] = []
+    for name, (size, mtime_ns) in current.items():
+        old = files.get(name)
+        if old is not None and old["size"] == size and old["mtime_ns"] == mtime_ns:
+            stats["unchanged"] += 1
+            continue
+        pending.append((name, size, mtime_ns))
+
+    job_args = [
+        (str(sources_dir / name), name, params, files[name]["sha256"] if name in files else None)
+        for name, _, _ in pending
+    ]
+    workers = resolve_jobs(jobs, len(pending), sum(size for _, size, _ in pending))
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with profiling.stage("index_parallel") as st, ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_index_job, job_args))
+            st.update(files=len(job_args), workers=workers)
+    else:
+        results = [_index_job(job) for job in job_args]
+
+    for (name, size, mtime_ns), (digest, record) in zip(pending, results):
+        old = files.get(name)
+        if digest is None:
+            # 읽을 수 없는 파일 (UTF-8 아님, 권한 등): 이전 레코드의 바이트 구간은 더 이상 맞지 않으므로 제거
+            # (다음 실행에서 다시 시도)
+            if old is not None:
+                _apply_df(df, files.pop(name), -1)
+                stats["removed"].append(name)
+                stats["dirty"] = True
+            continue
+        stats["dirty"] = True
+
+        if record is None:
+            # touch 등으로 mtime만 바뀐 경우: 재분할 불필요
+            old["size"], old["mtime_ns"] = size, mtime_ns
+            stats["unchanged"] += 1
+            continue
+
+        record.update({"size": size, "mtime_ns": mtime_ns, "sha256": digest})
+
+        if old is not None:
+            _apply_df(df, old, -1)
+            stats["changed"].append(name)
+        else:
+            stats["added"].append(name)
+        _apply_df(df, record, +1)
+        files[name] = record
+
+    return index, stats
+
+
+def source_label(sources_dir: Path) -> str:
+    """
+    통합 검색 결과에서 출처를 구분할 라벨.
+    Agent/{Category}/{safe_topic}/sources → "Category/safe_topic" (knowledge_query 식별자와 동일)
+    """
+    sources_dir = sources_dir.resolve()
+    if sources_dir.name == "sources":
+        return f"{sources_dir.parent.parent.name}/{sources_dir.parent.name}"
+    return sources_dir.name
+
+
+def combine(
+    parts: List[Tuple[Optional[str], dict, Path]],
+    max_link_ratio: float,
+    near_dup_bits: int = NEAR_DUP_BITS,
+) -> dict:
+    """
+    (라벨, 저장 인덱스, 소스 디렉토리) 목록을 하나의 검색용 인덱스로 펼침 (토큰화 없이 참조만 연결).
+    - 목차 필터: 저장된 청크 통계로 판별, 필터된 청크의 df 기여분은 빼서 필터 후 코퍼스 기준 IDF 유지
+    - 근접 중복: 여기서는 합치지 않고 서명(simhashes)과 임계값만 넘김 → 검색 시 collapse()가
+      순위 후보에서 합침 (코퍼스·IDF는 그대로). 디렉토리가 달라도 합침
+    - 청크 순서: 입력 순서 → 파일명 정렬 → 청크 순서 (동점 순위도 전체 재생성과 동일)
+    - df는 합산 → 모든 디렉토리가 같은 IDF/avgdl을 공유하는 하나의 전역 랭킹
+    - 라벨이 None이면 (단일 디렉토리) 출처는 파일명만 표시
+    """
+    chunks: List[list] = []
+    spans: List[tuple] = []
+    records: List[list] = []
+    hashes: List[str] = []
+    crumbs: List[str] = []
+    fields: Dict[str, dict] = {}
+    field_total = {"title": 0, "heading": 0, "domain": 0}
+    sigs: List[int] = []
+    part_info: List[dict] = []
+    doc_tf: List[Dict[str, int]] = []
+    doc_len: List[int] = []
+    summaries: List[Tuple[Optional[str], str]] = []
+    filtered_count = 0
+    files: Dict[str, dict] = {}
+    removed_tf: List[Dict[str, int]] = []
+    slots: List[int] = []
+    source_chars = 0
+
+    with profiling.stage("toc_filter") as st:
+        for label, index, sources_dir in parts:
+            part_start = len(chunks)
+            summary_text = ""
+            slot = 0
+            for name in sorted(index["files"]):
+                record = index["files"][name]
+                files[f"{label}/{name}" if label else name] = record
+                source_chars += record.get("chars", 0)
+                if "summary_text" in record:
+                    summary_text = record["summary_text"]
+                    continue
+                display = f"{label}/{Path(name).name}" if label else Path(name).name
+                path = str(sources_dir / name)
+                kept = kept_chunks(record, max_link_ratio)
+                if len(kept) == len(record["chunks"]):
+                    rec_chunks, rec_tf, rec_len = record["chunks"], record["doc_tf"], record["doc_len"]
+                else:
+                    rec_chunks = [record["chunks"][j] for j in kept]
+                    rec_tf     = [record["doc_tf"][j] for j in kept]
+                    rec_len    = [record["doc_len"][j] for j in kept]
+                    kept_set = set(kept)
+                    removed_tf.extend(tf for j, tf in enumerate(record["doc_tf"]) if j not in kept_set)
+                    filtered_count += len(record["chunks"]) - len(kept)
+                slots.extend(slot + j for j in kept)
+                slot += len(record["chunks"])
+                chunks.extend([display, c[0]] for c in rec_chunks)
+                spans.extend((path, c[1], c[2]) for c in rec_chunks)
+                records.extend(rec_chunks)
+                hashes.extend(c[6] for c in rec_chunks)
+                sigs.extend(c[7] for c in rec_chunks)
+                sections = record.get("sections", [])
+                crumbs.extend(sections[c[8]] if c[8] >= 0 else "" for c in rec_chunks)
+                if "field_tf" in record:
+                    lengths = record["field_len"]
+                    fields[path] = {"tf": record["field_tf"], "len": lengths,
+                                    "start": len(chunks) - len(rec_chunks), "end": len(chunks)}
+                    field_total["title"] += lengths["title"] * len(rec_chunks)
+                    field_total["domain"] += lengths["domain"] * len(rec_chunks)
+                    if sections:
+                        field_total["heading"] += sum(lengths["heading"][c[8]] for c in rec_chunks if c[8] >= 0)
+                doc_tf.extend(rec_tf)
+                doc_len.extend(rec_len)
+            part_info.append({"sources_dir": sources_dir, "stored": index, "start": part_start, "end": len(chunks)})
+            if summary_text:
+                summaries.append((label, summary_text))
+        st.update(chunks=len(chunks), filtered=filtered_count)
+
+    if len(parts) == 1 and not removed_tf:
+        df = parts[0][1]["df"]
+    else:
+        df = {}
+        for _, index, _ in parts:
+            for tok, count in index["df"].items():
+                df[tok] = df.get(tok, 0) + count
+        _apply_df(df, {"doc_tf": removed_tf}, -1)
+
+    if len(summaries) == 1 and summaries[0][0] is None:
+        summary_text = summaries[0][1]
+    else:
+        summary_text = "\n\n".join(f"### [{label}]\n{text}" for label, text in summaries)
+
+    return {
+        "params":         parts[0][1]["params"] if parts else None,
+        "files":          files,
+        "df":             df,
+        "chunks":         chunks,
+        "spans":          spans,
+        "records":        records,
+        "hashes":         hashes,
+        "slots":          slots,
+        "breadcrumbs":    crumbs,
+        "fields":         fields,
+        "field_total":    field_total,
+        "parts":          part_info,
+        "doc_tf":         doc_tf,
+        "doc_len":        doc_len,
+        "summary_text":   summary_text,
+        "filtered_count": filtered_count,
+        "max_link_ratio": max_link_ratio,
+        "simhashes":      sigs,
+        "near_dup_bits":  near_dup_bits,
+        "total_len":      sum(doc_len),
+        "source_chars":   source_chars,
+    }
+
+
+def assemble(
+    index: dict,
+    sources_dir: Path,
+    max_link_ratio: float,
+    near_dup_bits: int = NEAR_DUP_BITS,
+) -> dict:
+    """단일 디렉토리 인덱스를 검색용으로 펼침 (combine()의 단일 입력 형태)"""
+    return combine([(None, index, sources_dir)], max_link_ratio, near_dup_bits)
+
+
+def index_from_chunks(chunks: List[Tuple[str, str, int]]) -> dict:
+    """
+    이미 분할된 (source_name, chunk_text, chunk_idx) 목록으로 메모리 인덱스 구성 (저장 안 함).
+    청크 본문은 소스 파일 구간 대신 texts에 그대로 보관.
+    """
+    doc_tf: List[Dict[str, int]] = []
+    doc_len: List[int] = []
+    df: Dict[str, int] = {}
+    for _, text, _ in chunks:
+        tokens = tokenize(text)
+        tf: Dict[str, int] = {}
+        for tok in tokens:
+            tf[tok] = tf.get(tok, 0) + 1
+        for tok in tf:
+            df[tok] = df.get(tok, 0) + 1
+        doc_tf.append(tf)
+        doc_len.append(len(tokens))
+    return {
+        "chunks":     [[name, idx] for name, _, idx in chunks],
+        "texts":      [text for _, text, _ in chunks],
+        "hashes":     [chunk_hash(text) for _, text, _ in chunks],
+        "parts":      [],
+        "doc_tf":     doc_tf,
+        "doc_len":    doc_len,
+        "df":         df,
+        "total_len":  sum(doc_len),
+    }
+
+
+# ────────────────────────── 저장 / 로드 ──────────────────────────
+
+PERSISTED_KEYS = ("params", "files", "df", "text_store", "postings_store")
+
+
+def save_index(index: dict, path: Path) -> None:
+    """임시 파일에 쓴 뒤 교체 (동시 실행 중인 검색이 깨진 파일을 읽지 않도록)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {k: index[k] for k in PERSISTED_KEYS if k in index}
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_index(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def load_updated(
+    sources_dir: Path,
+    params: dict,
+    index_dir: Optional[Path] = None,
+    rebuild: bool = False,
+    stats_out: Optional[dict] = None,
+    jobs: int = 0,
+) -> dict:
+    """
+    저장된 인덱스를 로드하고 변경된 파일만 증분 갱신 (펼치기 전 저장 형태 그대로 반환).
+    청크 본문 저장소(chunk_store.py)도 인덱스 청크 순서에 맞춰 갱신 (최신이면 위치표 머리만 읽음).
+    청크가 POSTINGS_MIN_CHUNKS개 이상이면 영속 역색인(postings_store.py)도 같은 방식으로 갱신.
+    저장 실패(읽기 전용 vault 등)는 무시하고 메모리 인덱스만 사용 (본문은 소스 파일에서 읽음).
+
+    Args:
+        stats_out: 전달하면 update_index()의 변경 통계를 채워 줌
+        jobs:      인덱싱 프로세스 수 (0: 자동, 1: 순차)
+    """
+    import chunk_store
+    import postings_store
+
+    path = index_path(sources_dir, params, index_dir)
+    with profiling.stage("load_index"):
+        index = None if rebuild else load_index(path)
+    old_files = dict(index["files"]) if index else None
+    index, stats = update_index(index, sources_dir, params, jobs)
+    dirty = stats["dirty"] or rebuild
+    if dirty or not chunk_store.is_current(index, chunk_store.store_paths(sources_dir, params, index_dir)[1]):
+        with profiling.stage("text_store"):
+            try:
+                dirty = chunk_store.sync(index, old_files, sources_dir, params, index_dir) or dirty
+            except (OSError, UnicodeDecodeError):
+                index.pop("text_store", None)
+    if postings_store.chunk_count(index) >= postings_store.POSTINGS_MIN_CHUNKS and (
+            dirty or not postings_store.is_current(index, postings_store.store_paths(sources_dir, params, index_dir)[1])):
+        with profiling.stage("postings_store"):
+            try:
+                dirty = postings_store.sync(index, sources_dir, params, index_dir) or dirty
+            except OSError:
+                index.pop("postings_store", None)
+    if dirty:
+        with profiling.stage("save_index"):
+            try:
+                save_index(index, path)
+            except OSError:
+                pass
+    if stats_out is not None:
+        stats_out.update(stats)
+    return index
+
+
+def get_index(
+    sources_dir: Path,
+    params: dict,
+    index_dir: Optional[Path] = None,
+    rebuild: bool = False,
+    stats_out: Optional[dict] = None,
+    jobs: int = 0,
+) -> dict:
+    """단일 소스 디렉토리 인덱스를 로드·증분 갱신 후 검색용으로 펼쳐 반환"""
+    stored = load_updated(sources_dir, params, index_dir, rebuild, stats_out, jobs)
+    index = assemble(stored, sources_dir, params["max_link_ratio"], params["near_dup_bits"])
+    index["parts"][0]["index_dir"] = index_dir
+    return index
+
+
+def get_combined_index(
+    sources_dirs: List[Path],
+    params: dict,
+    index_dir: Optional[Path] = None,
+    rebuild: bool = False,
+    jobs: int = 0,
+) -> dict:
+    """
+    여러 소스 디렉토리의 인덱스를 각각 로드·증분 갱신한 뒤 하나로 합쳐 반환.
+    디렉토리가 하나면 get_index()와 동일 (출처 라벨 없음).
+    """
+    if len(sources_dirs) == 1:
+        return get_index(sources_dirs[0], params, index_dir, rebuild, jobs=jobs)
+
+    parts: List[Tuple[Optional[str], dict, Path]] = []
+    seen: Dict[str, int] = {}
+    for d in sources_dirs:
+        label = source_label(d)
+        seen[label] = seen.get(label, 0) + 1
+        if seen[label] > 1:
+            label = f"{label}#{seen[label]}"
+        parts.append((label, load_updated(d, params, index_dir, rebuild, jobs=jobs), d))
+    index = combine(parts, params["max_link_ratio"], params["near_dup_bits"])
+    for part in index["parts"]:
+        part["index_dir"] = index_dir
+    return index
+
+
+# ────────────────────────── 청크 본문 ──────────────────────────
+
+def chunk_texts(index: dict, ids: List[int]) -> Dict[int, str]:
+    """
+    청크 id → 본문. 청크 본문 저장소(chunk_store.py)가 최신이면 거기서 해당 구간만 읽고,
+    아니면 소스 파일에서 해당 바이트 구간만 읽어 디코딩 (파일당 한 번 열기).
+    제목 경로가 있는 청크(chunker="heading")는 "§ 경로" 줄을 본문 앞에 붙임 (색인된 텍스트와 동일).
+    인덱스는 로드 시 소스 크기·mtime으로 최신 상태가 보장되므로 구간이 어긋나지 않음.
+    """
+    texts = index.get("texts")
+    if texts is not None:
+        return {i: texts[i] for i in ids}
+    with profiling.stage("read_chunks") as st:
+        st["chunks"] = len(ids)
+        return _read_chunks(index, ids)
+
+
+def _read_chunks(index: dict, ids: List[int]) -> Dict[int, str]:
+    import chunk_store
+
+    out = chunk_store.read_chunks(index, ids)
+    if len(out) == len(ids):
+        return out
+    ids = [i for i in ids if i not in out]
+    spans = index["spans"]
+    crumbs = index["breadcrumbs"]
+    by_path: Dict[str, List[int]] = {}
+    for i in ids:
+        by_path.setdefault(spans[i][0], []).append(i)
+
+    for path, members in by_path.items():
+        with open(path, "rb") as f:
+            for i in sorted(members, key=lambda j: spans[j][1]):
+                _, start, end = spans[i]
+                f.seek(start)
+                out[i] = with_breadcrumb(crumbs[i], chunk_text(f.read(end - start).decode("utf-8")))
+    return out
+
+
+# ────────────────────────── BM25 점수 계산 ──────────────────────────
+
+def compute_idf(df: Dict[str, int], n_docs: int) -> Dict[str, float]:
+    """BM25Okapi와 동일한 IDF (음수 IDF는 epsilon × 평균 IDF로 대체)"""
+    idf: Dict[str, float] = {}
+    idf_sum = 0.0
+    negative = []
+    for tok, freq in df.items():
+        value = math.log(n_docs - freq + 0.5) - math.log(freq + 0.5)
+        idf[tok] = value
+        idf_sum += value
+        if value < 0:
+            negative.append(tok)
+    if idf:
+        eps = BM25_EPSILON * (idf_sum / len(idf))
+        for tok in negative:
+            idf[tok] = eps
+    return idf
+
+
+def _term_score(idf: float, tf: int, dl: int, avgdl: float) -> float:
+    """BM25Okapi 항 점수 (rank_bm25와 같은 연산 순서 → 동일한 부동소수 결과)"""
+    return idf * (tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl)))
+
+
+# ────────────────────────── 역색인 / top-k 가지치기 ──────────────────────────
+
+def build_postings(index: dict) -> dict:
+    """
+    검색용 역색인을 메모리에 구성 (인덱스 dict에 캐시).
+        postings   {token: ([chunk_id, ...], [tf, ...])}  chunk_id 오름차순
+        idf        compute_idf() 결과
+        max_score  토큰별 점수 상한 (MaxScore 가지치기용)
+    """
+    if "postings" in index:
+        return index
+    with profiling.stage("bm25_build") as st:
+        st["chunks"] = len(index["doc_len"])
+        return _build_postings(index)
+
+
+def _build_postings(index: dict) -> dict:
+    doc_len = index["doc_len"]
+    n_docs  = len(doc_len)
+    avgdl   = index["total_len"] / n_docs if n_docs else 1.0
+
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    for i, tf_map in enumerate(index["doc_tf"]):
+        for tok, tf in tf_map.items():
+            entry = postings.get(tok)
+            if entry is None:
+                postings[tok] = entry = ([], [])
+            entry[0].append(i)
+            entry[1].append(tf)
+
+    # IDF 평균(epsilon 기준값)의 합산 순서까지 BM25Okapi와 맞추기 위해
+    # 청크 순서대로 처음 등장한 토큰 순(= postings 삽입 순)으로 계산
+    df = index["df"]
+    idf = compute_idf({tok: df[tok] for tok in postings}, n_docs)
+    max_score: Dict[str, float] = {}
+    for tok, (ids, tfs) in postings.items():
+        q_idf = idf.get(tok) or 0
+        max_score[tok] = max(_term_score(q_idf, tf, doc_len[i], avgdl) for i, tf in zip(ids, tfs))
+
+    index.update({"postings": postings, "idf": idf, "max_score": max_score, "avgdl": avgdl})
+    return index
+
+
+def _full_score(index: dict, doc: int, q_tokens: List[str]) -> float:
+    """후보 청크의 정확한 점수: 쿼리 토큰 순서대로 합산 (전수 계산과 같은 값)"""
+    tf_map = index["doc_tf"][doc]
+    dl     = index["doc_len"][doc]
+    avgdl  = index["avgdl"]
+    idf    = index["idf"]
+    score  = 0.0
+    for q in q_tokens:
+        tf = tf_map.get(q)
+        if tf:
+            score += _term_score(idf.get(q) or 0, tf, dl, avgdl)
+    return score
+
+
+def _topk_exhaustive(index: dict, q_tokens: List[str], top_k: int, stats: dict) -> List[Tuple[float, int]]:
+    """모든 게시 목록을 훑어 점수 누적 (음수 IDF가 섞여 상한 가지치기를 쓸 수 없을 때)"""
+    postings = index["postings"]
+    scores: Dict[int, float] = {}
+    for q in q_tokens:
+        entry = postings.get(q)
+        if entry is None:
+            continue
+        stats["postings"] += len(entry[0])
+        for i in entry[0]:
+            scores[i] = 0.0
+    for i in scores:
+        scores[i] = _full_score(index, i, q_tokens)
+    stats["scored"] += len(scores)
+    return heapq.nsmallest(top_k, ((-s, i) for i, s in scores.items()))
+
+
+def _topk_maxscore(index: dict, q_tokens: List[str], top_k: int, stats: dict) -> List[Tuple[float, int]]:
+    """
+    MaxScore 동적 가지치기.
+    토큰을 점수 상한 오름차순으로 정렬하고, 상한 누적합이 현재 k번째 점수에 못 미치는
+    앞쪽 토큰들(non-essential)에만 등장하는 청크는 아예 방문하지 않습니다.
+    essential 토큰 게시 목록에서 나온 후보도 부분 점수 + 나머지 상한이 임계값 미만이면 건너뜀.
+    최종 점수는 _full_score()로 계산하므로 순위·점수는 전수 계산과 동일합니다.
+    """
+    postings  = index["postings"]
+    max_score = index["max_score"]
+    idf       = index["idf"]
+    doc_len   = index["doc_len"]
+    avgdl     = index["avgdl"]
+
+    counts: Dict[str, int] = {}
+    for q in q_tokens:
+        if q in postings:
+            counts[q] = counts.get(q, 0) + 1
+    terms = sorted(counts, key=lambda t: counts[t] * max_score[t])
+    ubs   = [counts[t] * max_score[t] for t in terms]
+    cum   = list(itertools.accumulate(ubs))           # cum[j] = ubs[0..j] 합
+    lists = [postings[t] for t in terms]
+    ptr   = [0] * len(terms)
+
+    heap: List[Tuple[float, int]] = []                # (score, -doc) 최소 힙, 크기 ≤ top_k
+    threshold = 0.0
+    first_essential = 0
+
+    while True:
+        # 후보 문서: essential 토큰 포인터 중 가장 작은 chunk_id
+        doc = None
+        for j in range(first_essential, len(terms)):
+            ids = lists[j][0]
+            if ptr[j] < len(ids) and (doc is None or ids[ptr[j]] < doc):
+                doc = ids[ptr[j]]
+        if doc is None:
+            break
+
+        # essential 토큰 부분 점수 (항 점수 상한 검사용 근사치)
+        partial = 0.0
+        for j in range(first_essential, len(terms)):
+            ids, tfs = lists[j]
+            k = ptr[j]
+            if k < len(ids) and ids[k] == doc:
+                partial += counts[terms[j]] * _term_score(idf[terms[j]], tfs[k], doc_len[doc], avgdl)
+                ptr[j] = k + 1
+                stats["postings"] += 1
+
+        rest = cum[first_essential - 1] if first_essential else 0.0
+        if len(heap) == top_k and partial + rest < threshold * (1 - 1e-9):
+            continue
+
+        score = _full_score(index, doc, q_tokens)
+        stats["scored"] += 1
+        item = (score, -doc)
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+        else:
+            continue
+
+        if len(heap) == top_k:
+            threshold = heap[0][0]
+            # 상한 누적합이 임계값에 못 미치는 앞쪽 토큰은 non-essential로 전환
+            while (first_essential < len(terms)
+                   and cum[first_essential] < threshold * (1 - 1e-9)):
+                first_essential += 1
+
+    return sorted((-s, -neg) for s, neg in heap)
+
+
+# ────────────────────────── 검색 ──────────────────────────
+
+# auto: numpy/scipy가 있으면 희소 행렬 엔진(bm25_sparse.py), 없으면 순수 Python MaxScore
+ENGINES = ("auto", "sparse", "python")
+
+
+def resolve_engine(engine: str = "auto") -> str:
+    """검색 엔진 결정 → "sparse" | "python" """
+    if engine not in ENGINES:
+        raise ValueError(f"알 수 없는 엔진: {engine} (가능: {', '.join(ENGINES)})")
+    if engine == "python":
+        return "python"
+    import bm25_sparse
+    if bm25_sparse.available():
+        return "sparse"
+    if engine == "sparse":
+        raise RuntimeError("sparse 엔진에는 numpy와 scipy가 필요합니다: pip install numpy scipy")
+    return "python"
+
+
+def prepare_search(index: dict, engine: str = "auto", field_weights: Optional[Dict[str, float]] = None) -> dict:
+    """검색 전용 구조(역색인 또는 희소 행렬)를 미리 구성 (서버가 스레드 공유 전에 호출)"""
+    if field_weights:
+        import bm25f
+        bm25f.build(index, field_weights, matrix=resolve_engine(engine) == "sparse")
+        return index
+    if resolve_engine(engine) == "sparse":
+        import bm25_sparse
+        return bm25_sparse.build_matrix(index)
+    return build_postings(index)
+
+
+def query_idf(
+    index: dict,
+    q_tokens: List[str],
+    vocab_order: Optional[Callable[[], List[str]]] = None,
+) -> Dict[str, float]:
+    """
+    질문 토큰별 IDF (인덱스에 있는 토큰만, compute_idf()와 같은 값).
+    역색인이 있으면 그 IDF를 쓰고, 없으면 질문 토큰만 계산 — 음수 IDF 토큰이 있을 때만
+    epsilon(전체 토큰 평균 IDF)을 위해 전체 IDF를 계산.
+    vocab_order: 청크 순서대로 처음 등장한 토큰 목록을 돌려주는 함수 (없으면 doc_tf를 훑어 구함)
+    """
+    if "idf" in index:
+        return {q: index["idf"][q] for q in q_tokens if q in index["idf"]}
+    df     = index["df"]
+    n_docs = len(index["doc_len"])
+    idf: Dict[str, float] = {}
+    for q in q_tokens:
+        freq = df.get(q)
+        if freq and q not in idf:
+            idf[q] = math.log(n_docs - freq + 0.5) - math.log(freq + 0.5)
+    if any(w < 0 for w in idf.values()):
+        # 합산 순서는 _build_postings()와 같이 청크 순서대로 처음 등장한 토큰 순
+        if vocab_order is not None:
+            vocab = vocab_order()
+        else:
+            vocab = {}
+            for tf_map in index["doc_tf"]:
+                vocab.update(dict.fromkeys(tf_map))
+        full = compute_idf({tok: df[tok] for tok in vocab}, n_docs)
+        idf = {q: full[q] for q in idf}
+    return idf
+
+
+def _topk_scan(index: dict, query: str, top_k: int, stats: dict) -> List[Tuple[float, int]]:
+    """
+    역색인 없이 청크별 doc_tf를 한 번 훑어 채점 → [(score, chunk_id), ...]  (MaxScore와 같은 결과).
+    질문 하나만 처리하고 끝나는 프로세스에서는 전체 역색인 구성보다 훨씬 쌈.
+    """
+    q_tokens = tokenize(query)
+    df      = index["df"]
+    doc_len = index["doc_len"]
+    n_docs  = len(doc_len)
+    avgdl   = index["total_len"] / n_docs if n_docs else 1.0
+
+    idf = query_idf(index, q_tokens)
+    terms = [(q, idf[q]) for q in q_tokens if q in idf]   # 중복 토큰 포함, 쿼리 순서대로 합산
+    stats["total_postings"] += sum(df[q] for q in q_tokens if q in idf)
+
+    scored: List[Tuple[float, int]] = []
+    for i, tf_map in enumerate(index["doc_tf"]):
+        score = 0.0
+        hit = False
+        for q, w in terms:
+            tf = tf_map.get(q)
+            if tf:
+                score += _term_score(w, tf, doc_len[i], avgdl)
+                hit = True
+        if hit:
+            scored.append((-score, i))
+    stats["postings"] += len(scored)
+    stats["scored"] += len(scored)
+    return [(-neg, i) for neg, i in heapq.nsmallest(top_k, scored)]
+
+
+def scan_postings(index: dict, tokens) -> Dict[str, Tuple[List[int], List[int]]]:
+    """doc_tf를 한 번 훑어 토큰별 게시 목록 → {token: ([chunk_id, ...], [tf, ...])}  (없는 토큰은 빠짐)"""
+    postings: Dict[str, Tuple[List[int], List[int]]] = {tok: ([], []) for tok in tokens}
+    for i, tf_map in enumerate(index["doc_tf"]):
+        for tok, (ids, tfs) in postings.items():
+            tf = tf_map.get(tok)
+            if tf:
+                ids.append(i)
+                tfs.append(tf)
+    return {tok: entry for tok, entry in postings.items() if entry[0]}
+
+
+def _topk_python(index: dict, query: str, top_k: int, stats: dict) -> List[Tuple[float, int]]:
+    """역색인 + MaxScore (음수 IDF가 섞이면 전수 채점) → [(score, chunk_id), ...]"""
+    build_postings(index)
+    q_tokens = tokenize(query)
+    postings = index["postings"]
+    idf      = index["idf"]
+    stats["total_postings"] += sum(len(postings[q][0]) for q in q_tokens if q in postings)
+
+    # 상한 가지치기는 모든 항 점수가 0 이상일 때만 정확
+    if all(idf[q] > 0 for q in q_tokens if q in postings):
+        ranked = _topk_maxscore(index, q_tokens, top_k, stats)
+    else:
+        ranked = _topk_exhaustive(index, q_tokens, top_k, stats)
+    return [(-neg_score, i) for neg_score, i in ranked]
+
+
+def result_ids(index: dict, results: List[Tuple[float, str, str, int]]) -> Dict[Tuple[str, int], int]:
+    """반환 결과 [(score, source, text, chunk_idx), ...] → {(source, chunk_idx): 청크 id}  (chunk_idx는 파일 안 번호)"""
+    wanted = {(r[1], r[3]) for r in results}
+    ids: Dict[Tuple[str, int], int] = {}
+    if wanted:
+        for i, (source, idx) in enumerate(index["chunks"]):
+            if (source, idx) in wanted:
+                ids[(source, idx)] = i
+    return ids
+
+
+def materialize(index: dict, ranked: List[Tuple[float, int]]) -> List[Tuple[float, str, str, int]]:
+    """(score, chunk_id) → 반환 결과. 본문은 점수 0 초과 결과에 대해서만 읽음."""
+    chunks = index["chunks"]
+    ranked = [(score, i) for score, i in ranked if score > 0]
+    texts = chunk_texts(index, [i for _, i in ranked])
+    return [(score, chunks[i][0], texts[i], chunks[i][1]) for score, i in ranked]
+
+
+# ────────────────────────── 근접 중복 (검색 시) ──────────────────────────
+
+def dedup_depth(index: dict, top_k: int) -> int:
+    """근접 중복을 합친 뒤에도 top_k개가 남도록 처음 뽑을 후보 수 (통합이 꺼져 있으면 top_k 그대로)"""
+    if top_k <= 0 or index.get("near_dup_bits", -1) < 0 or not index.get("simhashes"):
+        return top_k
+    return top_k * 2
+
+
+def collapse(
+    index: dict,
+    ranked: List[Tuple[float, int]],
+    top_k: int,
+    dups_out: Optional[dict] = None,
+) -> List[Tuple[float, int]]:
+    """
+    점수 내림차순 후보 [(score, chunk_id), ...] → 근접 중복을 합친 상위 top_k (점수 0 이하 제외).
+    그룹마다 점수가 가장 높은 청크를 남기고, 합쳐진 청크는 dups_out[(source, chunk_idx)]에
+    [(source, chunk_idx), ...]로 기록 (남긴 결과의 것만). 채점·IDF는 합치기 전 전체 청크 기준.
+    통합이 꺼져 있으면 (near_dup_bits 음수, 서명 없는 index_from_chunks 인덱스) ranked[:top_k].
+    """
+    if dedup_depth(index, top_k) == top_k:
+        return ranked[:top_k]
+    scores = {i: score for score, i in ranked}
+    with profiling.stage("near_dup") as st:
+        kept, groups = collapse_ranked((i for score, i in ranked if score > 0), index["simhashes"],
+                                       index["doc_len"], index["near_dup_bits"], top_k)
+        st.update(candidates=len(ranked), duplicates=sum(len(g) for g in groups.values()))
+    if dups_out is not None:
+        chunks = index["chunks"]
+        for rep, same in groups.items():
+            dups_out[tuple(chunks[rep])] = [tuple(chunks[i]) for i in same]
+    return [(scores[i], i) for i in kept]
+
+
+def rank_unique(
+    index: dict,
+    rank: Callable[[int], List[Tuple[float, int]]],
+    top_k: int,
+    dups_out: Optional[dict] = None,
+    ranked: Optional[List[Tuple[float, int]]] = None,
+) -> List[Tuple[float, int]]:
+    """
+    rank(depth)가 돌려준 점수 내림차순 후보(rank_many 한 질문, positional.search, RRF 융합 ...)를 collapse().
+    중복이 빠져 top_k개가 안 되면 후보 수를 두 배로 늘려 다시 뽑음 (후보를 다 봤거나 점수 0에 닿으면 종료).
+    ranked: rank(dedup_depth(index, top_k))를 이미 계산했으면 전달 (배치 채점 결과 재사용)
+    """
+    depth = dedup_depth(index, top_k)
+    if ranked is None:
+        ranked = rank(depth)
+    while True:
+        groups: dict = {}
+        kept = collapse(index, ranked, top_k, groups)
+        if len(kept) >= top_k or len(ranked) < depth or not ranked or ranked[-1][0] <= 0:
+            break
+        depth *= 2
+        ranked = rank(depth)
+    if dups_out is not None:
+        dups_out.update(groups)
+    return kept
+
+
+def rank_many(
+    index: dict,
+    queries: List[str],
+    top_ks: List[int],
+    stats_out: Optional[dict] = None,
+    engine: str = "auto",
+    field_weights: Optional[Dict[str, float]] = None,
+) -> List[List[Tuple[float, int]]]:
+    """
+    여러 질문을 한 인덱스로 채점 (본문은 읽지 않음). sparse 엔진은 질문 행렬 × 청크 행렬 곱
+    한 번으로 채점하고, python 엔진은 질문마다 MaxScore를 수행합니다.
+    field_weights가 있으면 BM25F(bm25f.py, 제목·제목 경로·본문·도메인 필드 가중)로 채점합니다.
+    질문이 하나이고 검색 구조를 아직 만들지 않았으면 (auto / python 엔진) 구성 없이 채점합니다 —
+    청크가 POSTINGS_MIN_CHUNKS개 이상이고 저장된 게시 목록이 최신이면 postings_store.topk() (MaxScore),
+    아니면 _topk_scan(). BM25F는 같은 게시 목록(저장본 또는 doc_tf 훑기)의 질문 토큰으로 bm25f.topk()
+    (음수 IDF 토큰이 있으면 bm25f.build()로 대체). 서버처럼 여러 질문을 받는 쪽은 prepare_search()를
+    먼저 호출해 두면 됩니다.
+
+    Returns: 질문별 [(score, chunk_id), ...]  점수 내림차순 (0 이하 포함 가능)
+    """
+    stats = {"postings": 0, "scored": 0, "total_postings": 0}
+    ranked = None
+    if not index["chunks"]:
+        ranked = [[] for _ in queries]
+    elif (len(queries) == 1 and engine in ("auto", "python")
+          and "postings" not in index and "matrix" not in index and "bm25f" not in index):
+        # 질문 하나뿐이고 검색 구조가 아직 없음 (CLI 1회 실행): 구성 없이 채점 (numpy 불필요)
+        import postings_store
+        with profiling.stage("load_postings") as st:
+            stores = postings_store.open_stores(index) if top_ks[0] > 0 else None
+            st["stored"] = int(stores is not None)
+        with profiling.stage("score") as st:
+            st["queries"] = 1
+            if not top_ks[0] > 0:
+                ranked = [[]]
+            elif field_weights:
+                import bm25f
+                q_tokens = set(tokenize(queries[0]))
+                if stores is not None:
+                    postings = postings_store.query_postings(
+                        stores, postings_store.inverse_maps(index, stores), q_tokens)
+                else:
+                    postings = scan_postings(index, q_tokens)
+                result = bm25f.topk(index, queries[0], top_ks[0], field_weights, stats, postings)
+                ranked = None if result is None else [result]
+            elif stores is not None:
+                ranked = [postings_store.topk(index, stores, queries[0], top_ks[0], stats)]
+            else:
+                ranked = [_topk_scan(index, queries[0], top_ks[0], stats)]
+    if ranked is None:
+        prepare_search(index, engine, field_weights)   # 구성 시간은 "score"와 따로 계측
+        with profiling.stage("score") as st:
+            st["queries"] = len(queries)
+            if field_weights:
+                import bm25f
+                ranked = bm25f.rank_many(index, queries, top_ks, field_weights, stats, engine)
+            elif resolve_engine(engine) == "sparse":
+                import bm25_sparse
+                ranked = bm25_sparse.search_many(index, queries, top_ks, stats)
+            else:
+                ranked = [_topk_python(index, q, k, stats) if k > 0 else [] for q, k in zip(queries, top_ks)]
+
+    if stats_out is not None:
+        stats_out.update(stats)
+    return ranked
+
+
+def search_many(
+    index: dict,
+    queries: List[str],
+    top_ks: List[int],
+    stats_out: Optional[dict] = None,
+    engine: str = "auto",
+    field_weights: Optional[Dict[str, float]] = None,
+    dups_out: Optional[List[dict]] = None,
+) -> List[List[Tuple[float, str, str, int]]]:
+    """
+    여러 질문을 한 인덱스로 검색 → 질문별 search_index() 결과 목록.
+    dups_out: 전달하면 질문마다 근접 중복 dict(collapse() 참고)를 순서대로 추가
+    """
+    depths = [dedup_depth(index, k) for k in top_ks]
+    first = rank_many(index, queries, depths, stats_out, engine, field_weights)
+    results = []
+    for query, k, ranked in zip(queries, top_ks, first):
+        dups: dict = {}
+        ranked = rank_unique(
+            index, lambda depth, q=query: rank_many(index, [q], [depth], None, engine, field_weights)[0],
+            k, dups, ranked,
+        )
+        if dups_out is not None:
+            dups_out.append(dups)
+        results.append(materialize(index, ranked))
+    return results
+
+
+def search_index(
+    index: dict,
+    query: str,
+    top_k: int,
+    stats_out: Optional[dict] = None,
+    engine: str = "auto",
+    field_weights: Optional[Dict[str, float]] = None,
+    dups_out: Optional[dict] = None,
+) -> List[Tuple[float, str, str, int]]:
+    """
+    BM25 top_k 검색 (점수 0 이하 제외). 동점은 chunk_id 오름차순.
+    결과는 모든 청크를 채점해 정렬하던 방식과 동일.
+
+    Args:
+        stats_out: 전달하면 {"postings": 방문한 게시 항목 수, "scored": 채점한 청크 수,
+                   "total_postings": 쿼리 토큰 게시 목록 총 길이}를 채워 줌
+        engine:    "auto" | "sparse" (numpy/scipy 희소 행렬) | "python" (역색인 + MaxScore)
+        field_weights: {"title", "heading", "body", "domain"} 가중치 → BM25F (None이면 BM25)
+        dups_out:  전달하면 결과에 합쳐진 근접 중복 {(source, chunk_idx): [(source, chunk_idx), ...]}를 채워 줌
+    Returns: [(score, source_name, chunk_text, chunk_idx), ...]
+    """
+    dups: List[dict] = []
+    results = search_many(index, [query], [top_k], stats_out, engine, field_weights, dups)[0]
+    if dups_out is not None:
+        dups_out.update(dups[0])
+    return results
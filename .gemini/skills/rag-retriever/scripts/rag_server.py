@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+rag_server.py — 상주 RAG 검색 서버 (웜 인덱스)
+
+튜터링 질문마다 새 Python 프로세스를 띄우고 인덱스를 로드하는 대신,
+최근 사용한 토픽의 인덱스를 메모리에 올려 둔 채 localhost HTTP로 검색 요청을 받습니다.
+긴 Socratic 세션에서 질문당 지연이 수 초 → 수 밀리초로 줄어듭니다.
+
+- 인덱스 캐시: (소스 디렉토리 목록, 인덱스 파라미터) 단위, LRU 방식으로 --max-indexes개 유지
+  (로드·검색 구조 구성은 인덱스별 락 → 한 토픽의 첫 로드가 다른 토픽 요청을 막지 않음)
+- 변경 감지: 요청마다 manifest.json mtime과 소스 파일 stat(크기·mtime)을 비교해
+  바뀐 경우에만 디스크 인덱스를 증분 갱신 후 다시 로드
+- 하이브리드 검색(--hybrid): 임베딩 모델과 청크 임베딩 행렬도 메모리에 유지
+- 재순위(--rerank): cross-encoder와 (질문, 청크 해시) 점수 캐시도 메모리에 유지 → 반복 질문은 모델 호출 없음
+- 청크 본문은 인덱스에 두지 않고 본문 저장소(chunk_store.py)를 mmap으로 열어 둔 채 결과 청크만 디코딩
+  → 상주 메모리는 코퍼스 본문이 아니라 청크별 doc_tf·통계와 검색 구조(역색인 또는 행렬) 크기를 따름
+- 127.0.0.1에만 바인딩 (외부 접근 불가). 같은 머신의 브라우저를 통한 요청(DNS rebinding 등)도 막도록
+  Host 헤더가 localhost / 127.0.0.1 / [::1]이 아니면 403, POST 본문이 application/json이 아니면 415
+- 요청의 index_dir은 서버를 --index-root로 실행했을 때 그 폴더 안만 허용 (임의 경로에 인덱스를 쓰지 않도록)
+- /shutdown은 시작 시 만든 토큰(임시 폴더의 rag_server_{port}.token, 소유자만 읽기)을
+  X-Shutdown-Token 헤더로 보내야 실행 — rag_server.py --stop이 토큰 파일을 읽어 요청
+
+Usage:
+    # 서버 실행 (세션 동안 백그라운드로 유지)
+    python scripts/rag_server.py --port 8765
+
+    # 종료
+    python scripts/rag_server.py --stop --port 8765
+
+    # 클라이언트: retrieve_chunks.py에 --server만 추가 (옵션은 동일)
+    python scripts/retrieve_chunks.py --server \
+      --query "MIG 파티셔닝 원리" \
+      --sources-dir "./sources/h100"
+
+Endpoints:
+    POST /retrieve   {"query", "sources_dirs", "top_k", "chunk_size", "overlap", "glob",
+                      "include_summary", "max_link_ratio", "near_dup_bits", "chunker", "index_dir",
+                      "rebuild_index", "engine", "hybrid", "embed_model", "max_tokens", "field_weights",
+                      "use_positions", "output_format", "rerank", "rerank_model", "rerank_depth",
+                      "snippet_chars"}
+                     → {"output", "elapsed_ms", "cache": "hit" | "reload" | "load"}
+    GET  /health     → {"status": "ok", "indexes": n}
+    GET  /stats      → 캐시된 인덱스 목록
+    POST /shutdown   (X-Shutdown-Token 헤더) → 서버 종료
+"""
+
+import os
+import sys
+import json
+import time
+import hmac
+import argparse
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import bm25f  # noqa: E402
+import dense  # noqa: E402
+import positional  # noqa: E402
+import reranker  # noqa: E402
+from rag_index import index_params, params_key, prepare_search, scan_files  # noqa: E402
+from simhash import NEAR_DUP_BITS  # noqa: E402
+from retrieve_chunks import answer, dense_model_for, existing_dirs, open_index, rerank_model_for  # noqa: E402
+
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Host 헤더로 허용하는 이름 (포트 제외)
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+TOKEN_HEADER = "X-Shutdown-Token"
+
+
+class RequestError(ValueError):
+    """클라이언트 요청 오류 (HTTP 400)"""
+
+
+def token_path(port: int) -> Path:
+    """/shutdown 토큰 파일 경로 (포트별)"""
+    return Path(tempfile.gettempdir()) / f"rag_server_{port}.token"
+
+
+def write_token(port: int) -> str:
+    """새 토큰을 만들어 소유자만 읽을 수 있는 파일에 기록"""
+    token = secrets.token_urlsafe(32)
+    path = token_path(port)
+    path.unlink(missing_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def is_local_host(host: Optional[str]) -> bool:
+    """Host 헤더가 루프백 이름인지 (포트는 무시)"""
+    if not host:
+        return False
+    name = host.strip().lower()
+    if name.startswith("["):
+        name = name[:name.find("]") + 1]
+    else:
+        name = name.split(":", 1)[0]
+    return name in LOCAL_HOSTS
+
+
+def resolve_index_dir(index_dir: Optional[str], index_root: Optional[Path]) -> Optional[str]:
+    """요청의 index_dir → 절대경로. --index-root 밖이거나 root 없이 지정하면 RequestError."""
+    if index_dir is None:
+        return None
+    if index_root is None:
+        raise RequestError("index_dir는 서버를 --index-root로 실행했을 때만 지정할 수 있습니다")
+    path = Path(index_dir).resolve()
+    if path != index_root and index_root not in path.parents:
+        raise RequestError(f"index_dir가 --index-root({index_root}) 밖입니다: {path}")
+    return str(path)
+
+
+def source_snapshot(src_paths: List[Path], glob: str) -> list:
+    """
+    변경 감지용 스냅샷 (파일 내용은 읽지 않음).
+    manifest.json(create_manifest.py가 갱신) mtime + 소스 파일 (크기, mtime).
+    """
+    snap = []
+    for d in src_paths:
+        manifest = d.parent / "rag" / "manifest.json"
+        try:
+            manifest_mtime = manifest.stat().st_mtime_ns
+        except OSError:
+            manifest_mtime = None
+        snap.append((str(d), manifest_mtime, scan_files(d, glob)))
+    return snap
+
+
+class IndexCache:
+    """
+    최근 사용한 인덱스를 LRU로 보관.
+
+    락은 두 단계: self.lock은 entries(LRU 순서·추가·제거)만 보호하고, 스냅샷 비교·인덱스 로드·검색 구조 구성은
+    항목별 락 안에서 수행 → 한 토픽을 처음 로드하는 동안에도 다른 토픽의 요청은 기다리지 않음.
+    검색 구조(역색인·희소 행렬·BM25F·위치 색인·임베딩)는 _prepare()가 항목 락 안에서 모두 만들어 두므로
+    answer()는 공유 인덱스를 읽기만 함. 다시 로드하면 새 인덱스 dict로 바꿔 끼우므로 진행 중인 검색은 이전 것을 그대로 씀.
+    """
+
+    def __init__(self, max_indexes: int):
+        self.max_indexes = max_indexes
+        self.entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(
+        self,
+        src_paths: List[Path],
+        params: dict,
+        index_dir: Optional[str],
+        rebuild: bool,
+        engine: str = "auto",
+        dense_model: Optional[str] = None,
+        field_weights: Optional[Dict[str, float]] = None,
+        use_positions: bool = False,
+        rerank_model: Optional[str] = None,
+    ) -> Tuple[dict, str]:
+        key = (tuple(str(p.resolve()) for p in src_paths), params_key(params), index_dir,
+               params["max_link_ratio"], params["near_dup_bits"])
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {
+                    "lock":      threading.Lock(),
+                    "index":     None,
+                    "snapshot":  None,
+                    "prepared":  set(),
+                    "hits":      0,
+                    "loaded_at": None,
+                }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_indexes:
+                self.entries.popitem(last=False)
+
+        with entry["lock"]:
+            snap = source_snapshot(src_paths, params["glob"])
+            if entry["index"] is not None and not rebuild and entry["snapshot"] == snap:
+                entry["hits"] += 1
+                status = "hit"
+            else:
+                status = "load" if entry["index"] is None else "reload"
+                index = open_index(src_paths, params, index_dir, rebuild)
+                # 로드 전 스냅샷을 저장: 로드 도중 바뀐 파일은 다음 요청에서 다시 감지됨
+                entry.update(index=index, snapshot=snap, prepared=set(),
+                             loaded_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+            self._prepare(entry, engine, dense_model, field_weights, use_positions, rerank_model)
+            return entry["index"], status
+
+    @staticmethod
+    def _prepare(entry: dict, engine: str, dense_model: Optional[str],
+                 field_weights: Optional[Dict[str, float]] = None, use_positions: bool = False,
+                 rerank_model: Optional[str] = None) -> None:
+        """
+        요청 설정에 필요한 검색 구조를 항목 락 안에서 미리 구성 (설정 조합마다 한 번):
+        역색인/희소 행렬(BM25F 가중치), 위치 색인, 청크 임베딩, 재순위 모델.
+        구조는 다 만든 뒤 인덱스 dict에 새 키로 붙으므로 같은 인덱스를 읽는 다른 검색 스레드와 겹쳐도 안전
+        """
+        weights = tuple(sorted(field_weights.items())) if field_weights else None
+        setting = (engine, weights, use_positions, dense_model, rerank_model)
+        if setting in entry["prepared"]:
+            return
+        index = entry["index"]
+        prepare_search(index, engine, field_weights)
+        if use_positions:
+            positional.chunk_positions(index)
+        if dense_model:
+            dense.chunk_embeddings(index, dense_model)
+        if rerank_model:
+            reranker.load_model(rerank_model)
+        entry["prepared"].add(setting)
+
+    def stats(self) -> List[dict]:
+        with self.lock:
+            items = list(self.entries.items())
+        return [
+            {
+                "sources_dirs": list(key[0]),
+                "params_key":   key[1],
+                "chunks":       len(entry["index"]["chunks"]),
+                "hits":         entry["hits"],
+                "loaded_at":    entry["loaded_at"],
+            }
+            for key, entry in items if entry["index"] is not None
+        ]
+
+
+def handle_retrieve(cache: IndexCache, req: Dict, index_root: Optional[Path] = None) -> Dict:
+    start = time.perf_counter()
+    index_dir = resolve_index_dir(req.get("index_dir"), index_root)
+    src_paths = existing_dirs(req["sources_dirs"])
+    params = index_params(
+        req.get("chunk_size", 800),
+        req.get("overlap", 100),
+        req.get("max_link_ratio", 0.03),
+        req.get("glob", "*.md"),
+        req.get("include_summary", True),
+        req.get("near_dup_bits", NEAR_DUP_BITS),
+        req.get("chunker", "paragraph"),
+    )
+    engine = req.get("engine", "auto")
+    dense_model = dense_model_for(req.get("hybrid", False), req.get("embed_model", dense.DEFAULT_MODEL))
+    field_weights = req.get("field_weights")
+    if field_weights:
+        field_weights = {**bm25f.DEFAULT_WEIGHTS, **field_weights}
+    use_positions = req.get("use_positions", False)
+    rerank_model = rerank_model_for(req.get("rerank", False), req.get("rerank_model", reranker.DEFAULT_MODEL))
+    index, status = cache.get(
+        src_paths, params, index_dir, req.get("rebuild_index", False), engine, dense_model,
+        field_weights, use_positions, rerank_model,
+    )
+    output = answer(
+        req["query"], index, req.get("top_k", 5), len(src_paths), engine, dense_model, req.get("max_tokens"),
+        field_weights=field_weights, use_positions=use_positions, output_format=req.get("output_format", "markdown"),
+        rerank_model=rerank_model, rerank_depth=req.get("rerank_depth", reranker.RERANK_DEPTH),
+        snippet_chars=req.get("snippet_chars"),
+    )
+    return {
+        "output":     output,
+        "cache":      status,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def make_handler(cache: IndexCache, token: str, index_root: Optional[Path] = None):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: Dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _allowed(self) -> bool:
+            """루프백 Host 헤더만 허용 (거부 시 403 응답까지 보냄)"""
+            if is_local_host(self.headers.get("Host")):
+                return True
+            self._send(403, {"error": "localhost 외 Host 헤더는 허용하지 않습니다"})
+            return False
+
+        def do_GET(self):
+            if not self._allowed():
+                return
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "indexes": len(cache.entries)})
+            elif self.path == "/stats":
+                self._send(200, {"indexes": cache.stats()})
+            else:
+                self._send(404, {"error": f"unknown path: {self.path}"})
+
+        def do_POST(self):
+            if not self._allowed():
+                return
+            if self.path == "/shutdown":
+                if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+                    self._send(403, {"error": f"{TOKEN_HEADER} 헤더가 없거나 맞지 않습니다 (rag_server.py --stop 사용)"})
+                    return
+                self._send(200, {"status": "bye"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            if self.path != "/retrieve":
+                self._send(404, {"error": f"unknown path: {self.path}"})
+                return
+            if self.headers.get_content_type() != "application/json":
+                self._send(415, {"error": "Content-Type: application/json 요청만 받습니다"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                req = json.loads(self.rfile.read(length).decode("utf-8"))
+                resp = handle_retrieve(cache, req, index_root)
+                print(f"[rag_server] {resp['cache']:<6} {resp['elapsed_ms']:8.2f} ms  {req['query'][:60]}",
+                      file=sys.stderr)
+                self._send(200, resp)
+            except (RequestError, ValueError, KeyError) as e:
+                self._send(400, {"error": f"{type(e).__name__}: {e}"})
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):  # 기본 접근 로그 생략 (검색 로그만 출력)
+            pass
+
+    return Handler
+
+
+def stop_server(port: int, timeout: float = 5.0) -> int:
+    """토큰 파일을 읽어 같은 머신의 서버에 /shutdown 요청"""
+    import urllib.error
+    import urllib.request
+
+    try:
+        token = token_path(port).read_text(encoding="utf-8").strip()
+    except OSError:
+        print(f"[ERROR] 토큰 파일이 없습니다: {token_path(port)} (서버가 실행 중인지 확인)", file=sys.stderr)
+        return 1
+    req = urllib.request.Request(f"http://{HOST}:{port}/shutdown", data=b"", headers={TOKEN_HEADER: token},
+                                 method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout):
+            pass
+    except (urllib.error.URLError, OSError) as e:
+        print(f"[ERROR] 서버 종료 요청 실패 (port {port}): {e}", file=sys.stderr)
+        return 1
+    print(f"✅ RAG 서버 종료 (port {port})", file=sys.stderr)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="RAG Retriever 상주 서버 (웜 인덱스, 127.0.0.1 HTTP)")
+    parser.add_argument("--port",        type=int, default=DEFAULT_PORT, help="포트 (기본 8765)")
+    parser.add_argument("--max-indexes", type=int, default=8,            help="메모리에 유지할 인덱스 수 (LRU, 기본 8)")
+    parser.add_argument("--index-root",  default=None,
+                        help="요청의 index_dir(--index-dir)를 허용할 상위 폴더 (미지정 시 index_dir 요청은 거부)")
+    parser.add_argument("--stop",        action="store_true",            help="실행 중인 서버 종료 (토큰 파일 사용)")
+    args = parser.parse_args()
+
+    if args.stop:
+        return stop_server(args.port)
+
+    cache = IndexCache(args.max_indexes)
+    index_root = Path(args.index_root).resolve() if args.index_root else None
+    server = ThreadingHTTPServer((HOST, args.port), make_handler(cache, write_token(args.port), index_root))
+    print(f"✅ RAG 서버 시작: http://{HOST}:{args.port}  (max_indexes={args.max_indexes}, "
+          f"종료 토큰: {token_path(args.port)})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        token_path(args.port).unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
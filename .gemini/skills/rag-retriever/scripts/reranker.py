@@ -0,0 +1,165 @@
+"""
+reranker.py — 로컬 cross-encoder 재순위 (선택 의존성: sentence-transformers)
+
+BM25 top-5에 답이 든 청크가 빠져 --top-k 8처럼 k를 늘리면 컨텍스트 토큰이 그만큼 늘어납니다.
+--rerank를 주면 1단계 검색(BM25 / BM25F / 위치 색인 / 하이브리드) 상위 N개(--rerank-depth)를
+질문과 청크 본문을 함께 읽는 작은 cross-encoder(로컬 CPU)로 다시 채점해 top_k만 반환합니다.
+
+    점수 = sigmoid(cross-encoder 로짓)   (0~1 관련도, 동점은 1단계 순위)
+
+기본 모델 cross-encoder/mmarco-mMiniLMv2-L12-H384-v1 은 다국어(mMARCO) MiniLM으로 한글 질문·청크를
+함께 채점합니다. 영문 소스만 있으면 cross-encoder/ms-marco-MiniLM-L-6-v2 가 더 빠릅니다.
+
+점수 캐시 (같은 질문을 다시 물으면 모델을 부르지 않음):
+    {topic}/rag/index/rerank_{model}_{key}.json   (첫 번째 소스 디렉토리의 인덱스 옆)
+    {"version", "model", "queries": {정규화 질문: {chunk_hash: 점수}}}
+질문은 result_cache와 같이 정규화(소문자·공백)하고, 청크는 본문 해시(rag_index.chunk_hash)로 조회하므로
+소스가 바뀌면 내용이 바뀐 청크만 다시 채점합니다. 최근 MAX_QUERIES개 질문만 유지합니다.
+상주 서버에서는 모델과 캐시가 프로세스 메모리에 남아 세션 중 반복 질문 비용이 없습니다.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from rag_index import chunk_hash, index_path
+from result_cache import normalize_query
+import profiling
+
+
+DEFAULT_MODEL  = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+RERANK_DEPTH   = 20     # 재채점할 1단계 후보 수 (top_k가 더 크면 top_k)
+MAX_LENGTH     = 512    # 질문 + 청크 토큰 상한 (모델 입력 길이)
+PREDICT_BATCH  = 16
+MAX_QUERIES    = 1000   # 캐시에 남길 질문 수 (최근 사용 순)
+RERANK_VERSION = 1
+
+_models: Dict[str, object] = {}
+_caches: Dict[str, "OrderedDict[str, Dict[str, float]]"] = {}
+_lock = threading.Lock()
+
+
+def available() -> bool:
+    """sentence-transformers 설치 여부 (모듈을 실제로 import하지 않고 확인)"""
+    import importlib.util
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+def load_model(model_name: str):
+    """cross-encoder 로드 (프로세스당 한 번, 상주 서버에서는 계속 재사용). 출력은 sigmoid 확률."""
+    model = _models.get(model_name)
+    if model is None:
+        import torch
+        from sentence_transformers import CrossEncoder
+        try:
+            model = CrossEncoder(model_name, device="cpu", max_length=MAX_LENGTH, activation_fn=torch.nn.Sigmoid())
+        except TypeError:   # sentence-transformers < 4
+            model = CrossEncoder(model_name, device="cpu", max_length=MAX_LENGTH,
+                                 default_activation_function=torch.nn.Sigmoid())
+        _models[model_name] = model
+    return model
+
+
+def predict(model_name: str, query: str, texts: List[str]) -> List[float]:
+    scores = load_model(model_name).predict(
+        [(query, text) for text in texts],
+        batch_size=PREDICT_BATCH,
+        show_progress_bar=False,
+    )
+    return [float(s) for s in scores]
+
+
+# ────────────────────────── 점수 캐시 ──────────────────────────
+
+def cache_path(index: dict, model_name: str) -> Optional[Path]:
+    """첫 번째 소스 디렉토리의 인덱스 옆 (메모리 인덱스는 None → 프로세스 메모리에만)"""
+    if not index["parts"]:
+        return None
+    part = index["parts"][0]
+    model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:8]
+    return index_path(part["sources_dir"], index["params"], part["index_dir"], prefix=f"rerank_{model_key}")
+
+
+def load_cache(path: Optional[Path], model_name: str) -> "OrderedDict[str, Dict[str, float]]":
+    if path is None:
+        return OrderedDict()
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return OrderedDict()
+    if data.get("version") != RERANK_VERSION or data.get("model") != model_name:
+        return OrderedDict()
+    return OrderedDict(data.get("queries", {}))
+
+
+def save_cache(path: Path, model_name: str, queries: "OrderedDict[str, Dict[str, float]]") -> None:
+    """임시 파일에 쓴 뒤 교체 (rag_index.save_index와 같은 방식)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    data = {"version": RERANK_VERSION, "model": model_name, "queries": queries}
+    tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _scores_for(path: Optional[Path], model_name: str) -> "OrderedDict[str, Dict[str, float]]":
+    """프로세스 메모리의 캐시 (처음 요청 시 디스크에서 로드)"""
+    key = f"{model_name}\0{path}"
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = load_cache(path, model_name)
+    return cache
+
+
+# ────────────────────────── 재순위 ──────────────────────────
+
+def pool_size(top_k: int, depth: int = RERANK_DEPTH) -> int:
+    return max(depth, top_k)
+
+
+def rerank(
+    index: dict,
+    query: str,
+    results: List[Tuple[float, str, str, int]],
+    model_name: str = DEFAULT_MODEL,
+    top_k: Optional[int] = None,
+    stats_out: Optional[dict] = None,
+) -> List[Tuple[float, str, str, int]]:
+    """
+    1단계 후보 [(score, source, text, chunk_idx), ...] → cross-encoder 점수 내림차순 상위 top_k (None이면 전부).
+    캐시에 없는 (질문, 청크 해시)만 모델로 채점하고 캐시에 기록.
+    stats_out: 전달하면 {"candidates": 후보 수, "cached": 캐시에서 찾은 수, "scored": 모델로 채점한 수}를 채움
+    """
+    hashes = [chunk_hash(r[2]) for r in results]
+    key = normalize_query(query)
+    path = cache_path(index, model_name)
+    with _lock:
+        cache = _scores_for(path, model_name)
+        scores = dict(cache.get(key, {}))
+        missing = {h: r[2] for h, r in zip(hashes, results) if h not in scores}
+        with profiling.stage("rerank") as st:
+            st.update(candidates=len(results), scored=len(missing))
+            if missing:
+                new = predict(model_name, query, list(missing.values()))
+                scores.update(zip(missing, new))
+        if results:
+            cache[key] = scores
+            cache.move_to_end(key)
+            while len(cache) > MAX_QUERIES:
+                cache.popitem(last=False)
+        if missing and path is not None:
+            try:
+                save_cache(path, model_name, cache)
+            except OSError as e:
+                print(f"  [warn] 재순위 캐시 저장 실패 ({path}): {e}", file=sys.stderr)
+
+    if stats_out is not None:
+        stats_out.update(candidates=len(results), cached=len(set(hashes)) - len(missing), scored=len(missing))
+    order = sorted(range(len(results)), key=lambda j: (-scores[hashes[j]], j))
+    if top_k is not None:
+        order = order[:top_k]
+    return [(scores[hashes[j]],) + tuple(results[j][1:]) for j in order]
@@ -0,0 +1,128 @@
+"""
+result_cache.py — retrieve() 출력 디스크 LRU 캐시
+
+튜터링 중에는 같은(또는 띄어쓰기·대소문자만 다른) 질문이 반복됩니다 (Step 2-3 확신도 재확인,
+Garbage Cleanup 후 재검색). 포맷된 검색 결과 문자열을 파일 하나씩 저장해 두고,
+같은 질문이면 인덱스를 로드하지 않고 바로 반환합니다.
+
+    {index_dir}/results/{key}.json   {"query": 원래 질문, "output": retrieve() 출력, "stats": 토큰 통계}
+
+key = sha1(정규화 질문, top_k, 인덱스 파라미터(max_link_ratio 포함), 엔진, 임베딩 모델,
+           토큰 예산, BM25F 필드 가중치, 위치 색인 사용 여부, 재순위 모델·후보 수, 발췌 길이, 출력 형식,
+           소스 디렉토리, 인덱스 버전 해시, CACHE_VERSION)
+인덱스 버전 해시는 소스 파일 stat(크기, mtime)과 INDEX_VERSION으로 만들므로
+소스가 추가·변경·삭제되면 key가 바뀌어 이전 결과는 자동으로 무효화됩니다.
+접근 시 파일 mtime을 갱신하고, 전체 크기가 MAX_BYTES를 넘으면 오래된 파일부터 지웁니다.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from rag_index import INDEX_VERSION, default_index_dir, scan_files
+
+
+MAX_BYTES = 4 * 1024 * 1024   # 캐시 폴더 전체 크기 상한
+CACHE_VERSION = 3             # 출력 형식이 바뀌면 올림 (2: 토큰 예산 모드 결과를 점수 순으로 출력, 3: 근접 중복을 순위 후보에서 통합)
+
+
+def normalize_query(query: str) -> str:
+    """소문자화 + 공백 정리 (토크나이저가 소문자화하므로 BM25 점수는 그대로)"""
+    return " ".join(query.lower().split())
+
+
+def index_version(src_paths: List[Path], glob: str) -> str:
+    """소스 파일 stat으로 만든 인덱스 버전 해시 (파일 내용은 읽지 않음)"""
+    state = [(str(d.resolve()), scan_files(d, glob)) for d in src_paths]
+    raw = json.dumps([INDEX_VERSION, state], sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_dir(src_paths: List[Path], index_dir: Optional[str] = None) -> Path:
+    """결과 캐시 폴더: 인덱스 폴더(첫 번째 소스 디렉토리 기준) 아래 results/"""
+    base = Path(index_dir) if index_dir else default_index_dir(src_paths[0])
+    return base / "results"
+
+
+def cache_key(query: str, top_k: int, params: dict, src_paths: List[Path],
+              engine: str, dense_model: Optional[str], max_tokens: Optional[int] = None,
+              field_weights: Optional[dict] = None, use_positions: bool = False,
+              output_format: str = "markdown", rerank: Optional[tuple] = None,
+              snippet_chars: Optional[int] = None) -> str:
+    raw = json.dumps(
+        {
+            "query":       normalize_query(query),
+            "top_k":       top_k,
+            "params":      params,
+            "engine":      engine,
+            "dense_model": dense_model,
+            "max_tokens":  max_tokens,
+            "fields":      field_weights,
+            "positional":  use_positions,
+            "format":      output_format,
+            "rerank":      list(rerank) if rerank else None,
+            "snippets":    snippet_chars,
+            "dirs":        [str(d.resolve()) for d in src_paths],
+            "version":     index_version(src_paths, params["glob"]),
+            "cache":       CACHE_VERSION,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(directory: Path, key: str, query: str, stats_out: Optional[dict] = None) -> Optional[str]:
+    """
+    캐시된 출력 (없으면 None). 헤더(JSON 출력은 "query" 항목)의 질문은 이번 질문 원문으로 바꿔 반환.
+    stats_out: 전달하면 저장해 둔 토큰 통계를 채움
+    """
+    path = directory / f"{key}.json"
+    try:
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    if stats_out is not None:
+        stats_out.update(entry.get("stats", {}))
+    output = entry["output"]
+    if output.startswith("{"):   # --format json: 첫 항목이 "query"
+        old = '{"query": ' + json.dumps(entry["query"], ensure_ascii=False)
+        return output.replace(old, '{"query": ' + json.dumps(query, ensure_ascii=False), 1)
+    return output.replace(f'Query: "{entry["query"]}"', f'Query: "{query}"', 1)
+
+
+def store(directory: Path, key: str, query: str, output: str,
+          stats: Optional[dict] = None, max_bytes: int = MAX_BYTES) -> None:
+    """출력 저장 후 크기 상한 초과분을 오래된 순으로 삭제. 쓰기 실패(읽기 전용 vault 등)는 무시."""
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f"{key}.json.tmp{os.getpid()}"
+        entry = {"query": query, "output": output, "stats": stats or {}}
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, directory / f"{key}.json")
+        evict(directory, max_bytes)
+    except OSError:
+        pass
+
+
+def evict(directory: Path, max_bytes: int = MAX_BYTES) -> None:
+    """최근 접근(mtime) 순으로 max_bytes까지만 남김"""
+    entries = []
+    for path in directory.glob("*.json"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
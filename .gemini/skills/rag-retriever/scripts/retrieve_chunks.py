@@ -15,168 +15,139 @@ Usage:
       --top-k 5 \
       --chunk-size 800
 
+    # 여러 디렉토리 / 토픽을 하나의 인덱스로 통합 검색 (전역 IDF, 전역 top-k)
+    python scripts/retrieve_chunks.py \
+      --query "Selection Mechanism과 Tensor Core" \
+      --topics "AI/mamba_ssm_tech,NVIDIA/nvidia_gpu_h100"
+
+    # 상주 서버(rag_server.py)에 질의 — 인덱스가 메모리에 올라가 있어 수 ms 내 응답
+    python scripts/retrieve_chunks.py --server \
+      --query "MIG 파티셔닝 원리" \
+      --sources-dir "./sources/h100"
+
+    # 배치 검색: 인덱스를 한 번만 로드하고 여러 질문을 채점 → JSONL 출력
+    python scripts/retrieve_chunks.py \
+      --queries-file probes.txt \
+      --sources-dir "./sources/h100" > probes.jsonl
+
     # 목차 필터 강도 조절 (기본 0.03: 청크 100자당 링크 3개 이상이면 노이즈)
     python scripts/retrieve_chunks.py \
       --query "FP8 동작 방식" \
       --sources-dir "./sources/h100" \
       --max-link-ratio 0.02
 
+    # 구조화 출력: 출처·문자 구간·점수·정규화 점수·목차 통계 + 신뢰도(최고점 차이, 평균)를 JSON으로
+    python scripts/retrieve_chunks.py \
+      --query "FP8 동작 방식" \
+      --sources-dir "./sources/h100" \
+      --format json
+
+    # 질문 중심 발췌: 결과 청크마다 질문 토큰 점수가 가장 높은 문장 구간(≤400자)만
+    python scripts/retrieve_chunks.py \
+      --query "FP8 동작 방식" \
+      --sources-dir "./sources/h100" \
+      --snippets
+
 Output:
-    stdout으로 관련 청크를 출력 → LLM이 컨텍스트로 사용
+    stdout으로 관련 청크를 출력 → LLM이 컨텍스트로 사용 (--format json이면 JSON 한 줄)
 """
 
+import os
 import sys
-import re
+import json
 import argparse
 from pathlib import Path
-from typing import List, Tuple
-
-
-# ────────────────────────── 청크 분할 ──────────────────────────
-
-def split_into_chunks(text: str, chunk_size: int, overlap: int) -> List[str]:
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from chunking import CHUNKERS  # noqa: E402
+import bm25f  # noqa: E402
+import dense  # noqa: E402
+import packing  # noqa: E402
+import profiling  # noqa: E402
+import reranker  # noqa: E402
+import result_cache  # noqa: E402
+import snippets  # noqa: E402
+from simhash import NEAR_DUP_BITS  # noqa: E402
+from rag_index import (  # noqa: E402
+    ENGINES, get_combined_index, index_from_chunks, index_params, materialize, prepare_search, rank_unique,
+    resolve_engine, result_ids, search_index, search_many,
+)
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+# ────────────────────────── 소스 로드 ──────────────────────────
+
+def manifest_source_dirs(manifest_path: Path) -> List[Path]:
+    """manifest.json의 source_dirs를 절대경로로 변환 (vault_path 기준 상대경로 허용)"""
+    m = json.loads(manifest_path.read_text(encoding="utf-8"))
+    vault = m.get("vault_path") or os.environ.get("OBSIDIAN_VAULT_PATH", "")
+    return [Path(d) if os.path.isabs(d) else Path(vault) / d for d in m.get("source_dirs", [])]
+
+
+def resolve_source_dirs(
+    sources_dirs: Sequence[str] = (),
+    manifests: Sequence[str] = (),
+    topics: Sequence[str] = (),
+    vault_path: Optional[str] = None,
+) -> List[Path]:
     """
-    텍스트를 chunk_size 단위로 분할. overlap으로 문맥 연속성 보장.
-    - 문단(빈 줄) 경계를 우선 존중
-    - 불가피할 경우 문자 단위로 자름
+    검색 대상 소스 디렉토리 목록 결정 (입력 순서 유지, 중복 제거).
+    - sources_dirs: .md 파일 디렉토리
+    - manifests:    manifest.json 경로
+    - topics:       "Category/safe_topic" 식별자 (쉼표 구분 가능)
+                    → {vault}/Agent/Category/safe_topic/rag/manifest.json
     """
-    # frontmatter 제거 (--- ... --- 사이)
-    text = re.sub(r'^---[\s\S]*?---\n', '', text, count=1).strip()
-
-    paragraphs = re.split(r'\n{2,}', text)
-
-    chunks: List[str] = []
-    current = ""
-
-    for para in paragraphs:
-        para = para.strip()
-        if not para:
-            continue
-
-        if len(current) + len(para) + 2 <= chunk_size:
-            current = (current + "\n\n" + para).strip()
-        else:
-            if current:
-                chunks.append(current)
-            # 단락 자체가 chunk_size보다 크면 강제 분할
-            if len(para) > chunk_size:
-                for i in range(0, len(para), chunk_size - overlap):
-                    sub = para[i:i + chunk_size]
-                    if sub.strip():
-                        chunks.append(sub.strip())
-                current = ""
-            else:
-                current = para
-
-    if current:
-        chunks.append(current)
-
-    return chunks
-
-
-def is_toc_chunk(chunk: str, max_link_ratio: float, min_text_length: int = 80) -> bool:
-    """
-    목차/네비게이션/URL 잔재 청크 판별.
-
-    판별 기준 (하나라도 해당하면 필터):
-    1. min_text_length: URL·링크 제거 후 순수 텍스트가 너무 짧음
-       → 실질 내용 없는 URL 잔재 조각 제거
-    2. link_ratio: 마크다운 링크([text](url)) 밀도가 높음
-       → 100자당 링크 수가 max_link_ratio 초과
-    3. text_ratio: 링크 제거 후 순수 텍스트 비율이 30% 미만
-       → 링크가 청크 대부분을 차지하는 목차 블록
-    """
-    # 마크다운 링크 및 독립 URL 모두 수집
-    md_links  = re.findall(r'\[.*?\]\(https?://[^)]+\)', chunk)
-    raw_urls  = re.findall(r'(?<!\()\bhttps?://\S+', chunk)
-    link_count = len(md_links) + len(raw_urls)
-    chunk_len  = max(len(chunk), 1)
-
-    # 링크·URL 제거 후 순수 텍스트
-    text_only = re.sub(r'\[.*?\]\(https?://[^)]+\)', '', chunk)
-    text_only = re.sub(r'https?://\S+', '', text_only)
-    text_only = re.sub(r'\s+', ' ', text_only).strip()
-
-    # 조건 1: 순수 텍스트가 너무 짧음 (URL 잔재 조각)
-    if len(text_only) < min_text_length:
-        return True
-
-    # 조건 2: 링크 밀도 초과
-    link_ratio = link_count / (chunk_len / 100)
-    if link_ratio > max_link_ratio:
-        return True
-
-    # 조건 3: 링크가 내용 대부분을 차지
-    text_ratio = len(text_only) / chunk_len
-    if link_count > 2 and text_ratio < 0.30:
-        return True
-
-    return False
-
-
-def load_sources(sources_dir: Path, glob: str) -> List[Tuple[str, str]]:
-    """
-    sources_dir 내 .md 파일을 읽어 (파일명, 내용) 리스트 반환.
-    summary 파일은 별도로 항상 포함 (맥락 제공용).
-    """
-    docs = []
-    for path in sorted(sources_dir.glob(glob)):
-        try:
-            content = path.read_text(encoding="utf-8")
-            docs.append((path.name, content))
-        except Exception:
-            pass
-    return docs
+    dirs: List[Path] = [Path(d) for d in sources_dirs]
+    manifest_paths = [Path(m) for m in manifests]
+
+    idents = [t.strip() for item in topics for t in item.split(",") if t.strip()]
+    if idents:
+        vault = vault_path or os.environ.get("OBSIDIAN_VAULT_PATH", "")
+        if not vault:
+            raise ValueError("--topics 사용 시 --vault-path 또는 OBSIDIAN_VAULT_PATH 환경변수가 필요합니다.")
+        for ident in idents:
+            if "/" not in ident:
+                raise ValueError(f"식별자 형식 오류 (Category/safe_topic): {ident}")
+            category, safe_topic = ident.split("/", 1)
+            manifest_paths.append(Path(vault) / "Agent" / category / safe_topic / "rag" / "manifest.json")
+
+    for mp in manifest_paths:
+        if not mp.exists():
+            raise FileNotFoundError(f"manifest 없음: {mp}")
+        dirs.extend(manifest_source_dirs(mp))
+
+    unique: List[Path] = []
+    seen = set()
+    for d in dirs:
+        key = str(d.resolve())
+        if key not in seen:
+            seen.add(key)
+            unique.append(d)
+    return unique
 
 
 # ────────────────────────── BM25 검색 ──────────────────────────
 
-def tokenize(text: str) -> List[str]:
-    """
-    간단한 토크나이저.
-    - 소문자화
-    - 영문: 단어 단위
-    - 한글: 2-gram (형태소 분석기 없이 근사)
-    """
-    text = text.lower()
-    tokens = re.findall(r'[a-z0-9]+', text)
-
-    # 한글 2-gram
-    korean = re.findall(r'[\uac00-\ud7a3]+', text)
-    for word in korean:
-        tokens += [word[i:i+2] for i in range(len(word) - 1)]
-        tokens.append(word)  # 전체 단어도 포함
-
-    return tokens
-
-
 def bm25_search(
     query: str,
     chunks: List[Tuple[str, str, int]],  # (source_name, chunk_text, chunk_idx)
     top_k: int,
 ) -> List[Tuple[float, str, str, int]]:
     """
-    BM25로 쿼리와 관련된 청크 top_k개 반환.
+    BM25로 쿼리와 관련된 청크 top_k개 반환 (영속 인덱스 없이 메모리에서 바로 검색).
+    점수는 rank_bm25.BM25Okapi와 동일하며, 역색인 + MaxScore로 후보만 채점합니다.
     Returns: [(score, source_name, chunk_text, chunk_idx), ...]
     """
-    from rank_bm25 import BM25Okapi
-
     if not chunks:
         return []
-
-    tokenized_corpus = [tokenize(c[1]) for c in chunks]
-    tokenized_query  = tokenize(query)
-
-    bm25   = BM25Okapi(tokenized_corpus)
-    scores = bm25.get_scores(tokenized_query)
-
-    ranked = sorted(
-        zip(scores, [c[0] for c in chunks], [c[1] for c in chunks], [c[2] for c in chunks]),
-        key=lambda x: x[0],
-        reverse=True,
-    )
-    # 점수가 0인 청크는 제외
-    return [(s, src, txt, idx) for s, src, txt, idx in ranked[:top_k] if s > 0]
+    return search_index(index_from_chunks(chunks), query, top_k)
 
 
 # ────────────────────────── 출력 포맷 ──────────────────────────
@@ -187,8 +158,14 @@ def format_output(
     summary_text: str,
     total_chunks: int,
     top_k: int,
+    duplicates: Optional[dict] = None,
+    snippet_spans: Optional[dict] = None,
 ) -> str:
-    """LLM이 읽기 좋은 형태로 결과 포맷"""
+    """
+    LLM이 읽기 좋은 형태로 결과 포맷.
+    duplicates: {(source, chunk_idx): [(source, chunk_idx), ...]}  결과 청크에 합쳐진 근접 중복 출처
+    snippet_spans: {(source, chunk_idx): (start, end, 청크 글자 수)}  발췌 결과의 청크 안 문자 구간 (snippets.extract)
+    """
     lines = []
     lines.append(f"# RAG Context — Query: \"{query}\"")
     lines.append(f"# (전체 {total_chunks}개 청크 중 상위 {len(results)}개 / top_k={top_k})")
@@ -205,83 +182,715 @@ def format_output(
 
     lines.append("## [Related Chunks]")
     for rank, (score, source, text, chunk_idx) in enumerate(results, 1):
-        lines.append(f"\n### [{rank}] {source} (chunk #{chunk_idx}, score={score:.3f})")
+        span = (snippet_spans or {}).get((source, chunk_idx))
+        where = f", 발췌 {span[0]}-{span[1]}/{span[2]}자" if span else ""
+        lines.append(f"\n### [{rank}] {source} (chunk #{chunk_idx}, score={score:.3f}{where})")
+        same = (duplicates or {}).get((source, chunk_idx))
+        if same:
+            lines.append("(동일 내용: " + ", ".join(f"{s} #{i}" for s, i in same) + ")")
         lines.append(text)
 
     return "\n".join(lines)
 
 
+OUTPUT_FORMATS = ("markdown", "json")
+
+# 워크플로 Step 2-3의 신뢰도 배지 (하한 %, 배지)
+CONFIDENCE_BADGES = ((80, "🟢 높음"), (50, "🟡 보통"), (20, "🟠 낮음"), (0, "🔴 매우 낮음"))
+
+
+def score_grade(max_score: float) -> float:
+    """최고 BM25 점수 → 신뢰도 % (knowledge_query / knowledge_tutor 워크플로 Step 2-3 공식)"""
+    if max_score <= 0:
+        return 0.0
+    if max_score < 0.5:
+        return max_score / 0.5 * 25
+    if max_score < 2.0:
+        return 25 + (max_score - 0.5) / 1.5 * 30
+    if max_score < 4.0:
+        return 55 + (max_score - 2.0) / 2.0 * 25
+    return min(95.0, 80 + (max_score - 4.0) * 5)
+
+
+def confidence(scores: List[float], graded: bool = True) -> dict:
+    """
+    결과 점수 목록 → 신뢰도 지표.
+        max_score / mean_score / avg_top3   최고점, 전체 평균, 상위 3개 평균
+        top_gap / top_gap_ratio             1위와 2위 점수 차이 (결과가 하나면 1위 점수), 1위 대비 비율
+        percent / badge                     score_grade() 신뢰도 (graded=False면 None: RRF 점수 등 BM25 척도가 아님)
+    """
+    ranked = sorted(scores, reverse=True)
+    if not ranked:
+        return {"percent": 0 if graded else None, "badge": CONFIDENCE_BADGES[-1][1] if graded else None,
+                "max_score": 0.0, "mean_score": 0.0, "avg_top3": 0.0, "top_gap": 0.0, "top_gap_ratio": 0.0}
+    top = ranked[0]
+    gap = top - (ranked[1] if len(ranked) > 1 else 0.0)
+    percent = int(score_grade(top)) if graded else None
+    return {
+        "percent":       percent,
+        "badge":         next(b for low, b in CONFIDENCE_BADGES if percent >= low) if graded else None,
+        "max_score":     round(top, 6),
+        "mean_score":    round(sum(ranked) / len(ranked), 6),
+        "avg_top3":      round(sum(ranked[:3]) / len(ranked[:3]), 6),
+        "top_gap":       round(gap, 6),
+        "top_gap_ratio": round(gap / top, 4) if top > 0 else 0.0,
+    }
+
+
+def format_json(
+    query: str,
+    results: List[Tuple[float, str, str, int]],
+    index: dict,
+    top_k: int,
+    search: Optional[dict] = None,
+    snippet_spans: Optional[dict] = None,
+    duplicates: Optional[dict] = None,
+) -> str:
+    """
+    format_output()의 구조화 판 (JSON 한 줄). LLM이 Markdown에서 score=를 다시 파싱하지 않도록
+    결과별 출처·문자 구간·점수·정규화 점수(1위 대비)·목차 통계와 신뢰도 지표를 함께 담음.
+    search: 검색 설정 (score_type, field_weights, dense_model, positional, packing ...)
+    snippet_spans: 발췌 모드면 결과별 "snippet": {"start", "end", "chunk_chars"} (청크 본문 안 문자 구간)
+    duplicates: 결과 청크에 합쳐진 근접 중복 (format_output() 참고) → 결과별 "duplicates"
+    """
+    search = dict(search or {})
+    duplicates = duplicates or {}
+    ids = result_ids(index, results)
+    spans = index.get("spans")
+    chunk_recs = index.get("records")
+    crumbs = index.get("breadcrumbs")
+    top = max((r[0] for r in results), default=0.0) or 1.0
+
+    records = []
+    for rank, (score, source, text, chunk_idx) in enumerate(results, 1):
+        i = ids.get((source, chunk_idx))
+        crumb = crumbs[i] if crumbs and i is not None else ""
+        # 문자 구간·목차 통계는 인덱스에 저장된 청크 값 (소스를 열지 않고, 발췌 모드에서도 청크 전체 기준)
+        rec = chunk_recs[i] if chunk_recs and i is not None else None
+        toc = None
+        if rec:
+            link_count, text_len, chunk_len = rec[3:6]
+            toc = {
+                "link_count": link_count,
+                "text_len":   text_len,
+                "chunk_len":  chunk_len,
+                "link_ratio": round(link_count / (max(chunk_len, 1) / 100), 4),
+            }
+        records.append({
+            "rank":             rank,
+            "source":           source,
+            "chunk_idx":        chunk_idx,
+            "path":             spans[i][0] if rec else None,
+            "start":            rec[9] if rec else None,
+            "end":              rec[10] if rec else None,
+            "section":          crumb or None,
+            "score":            round(score, 6),
+            "normalized_score": round(score / top, 4),
+            "toc":              toc,
+            "duplicates":       [{"source": s, "chunk_idx": n} for s, n in duplicates.get((source, chunk_idx), [])],
+            "text":             text,
+        })
+        span = (snippet_spans or {}).get((source, chunk_idx))
+        if span:
+            records[-1]["snippet"] = {"start": span[0], "end": span[1], "chunk_chars": span[2]}
+
+    record = {
+        "query":           query,
+        "top_k":           top_k,
+        "total_chunks":    len(index["chunks"]),
+        "returned":        len(results),
+        "toc_filter":      {"filtered": index.get("filtered_count", 0), "max_link_ratio": index.get("max_link_ratio")},
+        "near_duplicates": sum(len(same) for same in duplicates.values()),
+        "search":          search,
+        "confidence":      confidence([r[0] for r in results], graded=search.get("score_type") not in ("rrf", "rerank")),
+        "summary":         index.get("summary_text") or "",
+        "results":         records,
+    }
+    return json.dumps(record, ensure_ascii=False)
+
+
 # ────────────────────────── 메인 ──────────────────────────
 
+def existing_dirs(sources_dir: Union[str, Sequence[str]]) -> List[Path]:
+    """존재하는 소스 디렉토리만 남김 (없는 디렉토리는 경고). 하나도 없으면 FileNotFoundError."""
+    dirs = [sources_dir] if isinstance(sources_dir, (str, Path)) else list(sources_dir)
+    src_paths = []
+    for d in dirs:
+        if Path(d).exists():
+            src_paths.append(Path(d))
+        else:
+            print(f"  [warn] 소스 디렉토리 없음: {d}", file=sys.stderr)
+    if not src_paths:
+        raise FileNotFoundError(f"sources_dir 없음: {', '.join(str(d) for d in dirs)}")
+    return src_paths
+
+
+def open_index(
+    src_paths: List[Path],
+    params: dict,
+    index_dir: Optional[str] = None,
+    rebuild_index: bool = False,
+    jobs: int = 0,
+) -> dict:
+    """
+    검색용 인덱스 로드 (청크 생성 + 목차 필터링 + 토큰화는 인덱스 생성 시 한 번만 수행).
+    jobs: 변경 파일 인덱싱 프로세스 수 (0: 변경량이 크면 CPU 수, 1: 순차)
+    """
+    index = get_combined_index(
+        src_paths,
+        params,
+        index_dir=Path(index_dir) if index_dir else None,
+        rebuild=rebuild_index,
+        jobs=jobs,
+    )
+    if not index["files"]:
+        raise ValueError(f"{', '.join(str(d) for d in src_paths)} 에 .md 파일이 없습니다.")
+    return index
+
+
+def dense_model_for(hybrid: bool, embed_model: str) -> Optional[str]:
+    """하이브리드 검색에 쓸 임베딩 모델 (미요청 또는 sentence-transformers 미설치 시 None → BM25만)"""
+    if not hybrid:
+        return None
+    if not dense.available():
+        print("  [warn] sentence-transformers 미설치 → BM25만 사용 (pip install sentence-transformers)",
+              file=sys.stderr)
+        return None
+    return embed_model
+
+
+def rerank_model_for(rerank: bool, rerank_model: str) -> Optional[str]:
+    """재순위에 쓸 cross-encoder (미요청 또는 sentence-transformers 미설치 시 None → 1단계 순위 그대로)"""
+    if not rerank:
+        return None
+    if not reranker.available():
+        print("  [warn] sentence-transformers 미설치 → 재순위 생략 (pip install sentence-transformers)",
+              file=sys.stderr)
+        return None
+    return rerank_model
+
+
+def answer(
+    query: str,
+    index: dict,
+    top_k: int,
+    n_dirs: int = 1,
+    engine: str = "auto",
+    dense_model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    stats_out: Optional[dict] = None,
+    field_weights: Optional[Dict[str, float]] = None,
+    use_positions: bool = False,
+    output_format: str = "markdown",
+    rerank_model: Optional[str] = None,
+    rerank_depth: int = reranker.RERANK_DEPTH,
+    snippet_chars: Optional[int] = None,
+) -> str:
+    """
+    로드된 인덱스로 검색 후 LLM 컨텍스트 문자열 생성 (dense_model이 있으면 BM25 + dense 융합).
+    field_weights가 있으면 BM25 대신 필드 가중 BM25F (bm25f.py).
+    use_positions면 따옴표 구절 필터 + 근접도 가중 (positional.py, 하이브리드 검색에는 적용하지 않음).
+    rerank_model이 있으면 위 검색의 상위 rerank_depth개를 cross-encoder로 다시 채점 (reranker.py).
+    snippet_chars가 있으면 결과 청크마다 질문 토큰 점수가 가장 높은 문장 창(최대 snippet_chars자)만 남김 (snippets.py).
+    max_tokens가 있으면 후보 풀에서 MMR + 중복 제거로 예산만큼 채움 (packing.pack, 재순위 시 재순위 후보가 풀,
+    발췌 모드면 발췌가 풀).
+    근접 중복(rag_index.collapse)은 1단계 순위에서 합침 — 그룹마다 점수가 가장 높은 청크만 남고 나머지는 출처로 표시.
+    stats_out: 전달하면 예산 모드에서 {"topk_tokens", "packed_tokens", "candidates", "duplicates"},
+               발췌 모드에서 {"chunk_chars", "snippet_chars"}(발췌 전후 결과 본문 글자 수),
+               항상 "near_duplicates"(최종 결과에 합쳐진 근접 중복 청크 수)를 채움
+    output_format: "markdown" (format_output) | "json" (format_json, 헤더 주석 대신 "search" 항목)
+    """
+    total_chunks   = len(index["chunks"])
+    filtered_count = index["filtered_count"]
+    duplicates: dict = {}
+
+    depth = packing.pool_size(top_k) if max_tokens else top_k
+    if rerank_model:
+        depth = reranker.pool_size(top_k, rerank_depth)
+    positional_note = ""
+    pos_stats: dict = {}
+    if dense_model:
+        results = dense.hybrid_search(index, query, depth, dense_model, engine, field_weights, duplicates)
+    elif use_positions:
+        import positional
+        ranked = rank_unique(
+            index, lambda d: positional.search(index, query, d, engine, field_weights, pos_stats), depth, duplicates,
+        )
+        results = materialize(index, ranked)
+        positional_note = "# (위치 색인: 근접도 가중"
+        if pos_stats["phrases"]:
+            positional_note += f", 따옴표 구절 {pos_stats['phrases']}개 불일치 청크 {pos_stats['phrase_rejected']}개 제외"
+        positional_note += ")\n"
+    else:
+        # BM25 검색 (저장된 통계로 점수만 계산)
+        results = search_index(index, query, depth, engine=engine, field_weights=field_weights, dups_out=duplicates)
+
+    rerank_note = ""
+    rerank_stats: dict = {}
+    if rerank_model:
+        results = reranker.rerank(index, query, results, rerank_model, None if max_tokens else top_k, rerank_stats)
+        rerank_note = (
+            f"# (재순위: cross-encoder {rerank_model}, 후보 {rerank_stats['candidates']}개 "
+            f"중 캐시 {rerank_stats['cached']}개 / 새로 채점 {rerank_stats['scored']}개)\n"
+        )
+
+    # 예산 통계의 기준은 발췌 전 top_k 청크
+    topk_tokens = sum(packing.estimate_tokens(r[2]) for r in results[:top_k]) if max_tokens else 0
+    snippet_note = ""
+    spans: dict = {}
+    if snippet_chars:
+        full = {(r[1], r[3]): len(r[2]) for r in results}
+        with profiling.stage("snippets") as st:
+            results = snippets.extract(index, query, results, snippet_chars, spans)
+            st["results"] = len(results)
+
+    pack_note = ""
+    info: dict = {}
+    if max_tokens:
+        with profiling.stage("pack") as st:
+            results, info = packing.pack(results, max_tokens)
+            # 예산 모드는 top_k가 아니라 예산이 개수를 정함 (top_k보다 많이 선택될 수 있음)
+            info.update(top_k=top_k, beyond_top_k=max(0, len(results) - top_k))
+            st.update(candidates=info["candidates"], results=len(results))
+        pack_note = (
+            f"# (토큰 예산 {max_tokens}: 후보 {info['candidates']}개 중 {len(results)}개 선택, "
+            f"중복 {info['duplicates']}개 제외, ~{info['tokens']} tokens)\n"
+        )
+        if stats_out is not None:
+            stats_out.update(
+                topk_tokens=topk_tokens,
+                packed_tokens=info["tokens"],
+                candidates=info["candidates"],
+                duplicates=info["duplicates"],
+            )
+
+    snippet_info: dict = {}
+    if snippet_chars:
+        # 최종 결과 기준 발췌 전후 본문 글자 수 (예산 모드면 선택된 청크만)
+        snippet_info = {
+            "chunk_chars":   sum(full[(r[1], r[3])] for r in results),
+            "snippet_chars": sum(len(r[2]) for r in results),
+        }
+        snippet_note = (
+            f"# (발췌: 결과 청크마다 질문 토큰 점수가 가장 높은 문장 구간 ≤{snippet_chars}자, "
+            f"본문 {snippet_info['chunk_chars']:,}자 → {snippet_info['snippet_chars']:,}자)\n"
+        )
+        if stats_out is not None:
+            stats_out.update(snippet_info)
+
+    # 재순위·예산 선택으로 빠진 대표의 근접 중복은 표시하지 않음
+    shown = {(r[1], r[3]) for r in results}
+    duplicates = {key: same for key, same in duplicates.items() if key in shown}
+    if stats_out is not None:
+        stats_out["near_duplicates"] = sum(len(same) for same in duplicates.values())
+
+    if output_format == "json":
+        search = {
+            "score_type":    "rerank" if rerank_model else ("rrf" if dense_model else ("bm25f" if field_weights else "bm25")),
+            "engine":        engine,
+            "field_weights": field_weights,
+            "dense_model":   dense_model,
+            "dirs":          n_dirs,
+        }
+        if use_positions and not dense_model:
+            search["positional"] = {k: pos_stats[k] for k in ("phrases", "phrase_rejected", "depth")}
+        if rerank_model:
+            search["rerank"] = dict(rerank_stats, model=rerank_model, depth=rerank_depth)
+        if snippet_chars:
+            search["snippets"] = dict(snippet_info, max_chars=snippet_chars)
+        if max_tokens:
+            search["packing"] = dict(info, max_tokens=max_tokens)
+        with profiling.stage("format") as st:
+            st["results"] = len(results)
+            return format_json(query, results, index, top_k, search, spans, duplicates)
+
+    with profiling.stage("format") as st:
+        output = format_output(
+            query=query,
+            results=results,
+            summary_text=index["summary_text"],
+            total_chunks=total_chunks,
+            top_k=top_k,
+            duplicates=duplicates,
+            snippet_spans=spans,
+        )
+        st["results"] = len(results)
+
+    # 필터 통계를 헤더에 추가
+    if filtered_count > 0:
+        header_note = f"# (목차/링크 청크 {filtered_count}개 필터됨)\n"
+        output = output.replace(
+            f"# (전체 {total_chunks}개 청크 중",
+            f"# (목차 필터 후 {total_chunks}개 청크 중",
+        )
+        output = header_note + output
+    if duplicates:
+        n_dups = sum(len(same) for same in duplicates.values())
+        output = f"# (근접 중복 청크 {n_dups}개를 대표 청크 {len(duplicates)}개에 통합)\n" + output
+    output = positional_note + rerank_note + snippet_note + pack_note + output
+    if field_weights:
+        weights = ", ".join(f"{f} {field_weights[f]:g}" for f in bm25f.FIELDS)
+        output = f"# (BM25F 필드 가중 검색: {weights})\n" + output
+    if dense_model:
+        output = f"# (하이브리드 검색: BM25 + dense {dense_model}, RRF 점수)\n" + output
+    if n_dirs > 1:
+        output = f"# (소스 디렉토리 {n_dirs}개 통합 검색)\n" + output
+
+    return output
+
+
 def retrieve(
     query: str,
-    sources_dir: str,
+    sources_dir: Union[str, Sequence[str]],
     top_k: int = 5,
     chunk_size: int = 800,
     overlap: int = 100,
     glob: str = "*.md",
     include_summary: bool = True,
     max_link_ratio: float = 0.03,
+    index_dir: Optional[str] = None,
+    rebuild_index: bool = False,
+    near_dup_bits: int = NEAR_DUP_BITS,
+    chunker: str = "paragraph",
+    engine: str = "auto",
+    hybrid: bool = False,
+    embed_model: str = dense.DEFAULT_MODEL,
+    jobs: int = 0,
+    use_cache: bool = True,
+    max_tokens: Optional[int] = None,
+    stats_out: Optional[dict] = None,
+    field_weights: Optional[Dict[str, float]] = None,
+    use_positions: bool = False,
+    profile: Optional[str] = None,
+    output_format: str = "markdown",
+    rerank: bool = False,
+    rerank_model: str = reranker.DEFAULT_MODEL,
+    rerank_depth: int = reranker.RERANK_DEPTH,
+    snippet_chars: Optional[int] = None,
 ) -> str:
     """
     메인 검색 함수.
 
     Args:
+        sources_dir:    소스 디렉토리 하나 또는 여러 개.
+                        여러 개면 하나의 인덱스로 합쳐 전역 IDF로 top_k를 고름.
         max_link_ratio: 목차 청크 필터 임계값 (100자당 링크 수, 기본 0.03)
                         낮출수록 필터가 강해짐. 0.0이면 필터 비활성화.
+        index_dir:      영속 인덱스 저장 폴더 (기본: {topic}/rag/index 또는 {sources_dir}/.rag_index)
+        rebuild_index:  저장된 인덱스를 무시하고 다시 생성
+        near_dup_bits:  SimHash 해밍 거리가 이 값 이하인 결과 후보를 점수가 가장 높은 청크 하나로 합침
+                        (기본 3, 음수면 비활성화, 채점·IDF에는 영향 없음)
+        chunker:        "paragraph" (문단 경계) | "heading" (제목 구간 안에서만 분할, 결과에 "§ 제목 경로" 표시)
+        engine:         "auto" | "sparse" (numpy/scipy 희소 행렬) | "python" (역색인 + MaxScore)
+        hybrid:         BM25에 임베딩 검색을 더해 RRF로 융합 (sentence-transformers 필요, 없으면 BM25만)
+        embed_model:    하이브리드 검색용 임베딩 모델 (기본 all-MiniLM-L6-v2, 로컬 CPU)
+        jobs:           인덱스 생성 프로세스 수 (0: 변경량이 크면 CPU 수, 1: 순차)
+        use_cache:      같은 질문·설정·소스 상태의 이전 출력을 재사용 (result_cache, 인덱스 로드 생략)
+        max_tokens:     청크 본문 토큰 예산. 주면 top_k 대신 MMR + 중복 제거로 예산만큼 채움
+        stats_out:      전달하면 예산 모드의 토큰 통계(answer() 참고)와 "source_chars"(인덱스에 기록된
+                        소스 파일 글자 수 합), "near_duplicates"(이 질문의 결과에 합쳐진 근접 중복 청크 수)를 채움 (--show-stats용)
+        field_weights:  {"title", "heading", "body", "domain"} 가중치 (bm25f.parse_weights()).
+                        주면 frontmatter 제목·제목 경로·출처 도메인을 필드로 보는 BM25F로 채점
+        use_positions:  "따옴표 구절" 일치 필터 + 단어 근접도 가중 (위치 색인은 처음 요청 시 생성)
+        profile:        단계별 시간·메모리 JSON 기록 대상 ("-": stderr, 그 외: JSONL 파일 경로).
+                        생략하면 RAG_PROFILE 환경 변수, 둘 다 없으면 계측하지 않음 (profiling.py)
+        output_format:  "markdown" (기본) | "json" (format_json(): 문자 구간·정규화 점수·목차 통계·신뢰도)
+        rerank:         1단계 검색 상위 rerank_depth개를 로컬 cross-encoder로 다시 채점해 top_k 선택
+                        (sentence-transformers 필요, 없으면 1단계 순위 그대로). 점수는 (질문, 청크 해시)별 캐시
+        rerank_model:   재순위 cross-encoder (기본 다국어 mMiniLMv2, 로컬 CPU)
+        rerank_depth:   재순위 후보 수 (기본 20, top_k가 더 크면 top_k)
+        snippet_chars:  주면 결과 청크마다 질문 토큰 점수(인덱스 IDF)가 가장 높은 문장 구간(최대 이 글자 수)만
+                        반환 (snippets.py, 모델 호출 없음). 결과별 청크 안 문자 구간을 헤더 / "snippet"에 표시
 
     Returns:
         LLM 컨텍스트용 문자열 (stdout 출력 또는 직접 사용)
     """
-    src_path = Path(sources_dir)
-    if not src_path.exists():
-        raise FileNotFoundError(f"sources_dir 없음: {sources_dir}")
-
-    docs = load_sources(src_path, glob)
-    if not docs:
-        raise ValueError(f"{sources_dir} 에 .md 파일이 없습니다.")
-
-    # summary 파일 분리
-    summary_text = ""
-    content_docs = []
-    for name, content in docs:
-        if "summary" in name.lower() and include_summary:
-            summary_text = re.sub(r'^---[\s\S]*?---\n', '', content, count=1).strip()
-        else:
-            content_docs.append((name, content))
-
-    # 청크 생성 + 목차 필터링
-    all_chunks: List[Tuple[str, str, int]] = []
-    filtered_count = 0
-    for name, content in content_docs:
-        chunks = split_into_chunks(content, chunk_size, overlap)
-        for idx, chunk in enumerate(chunks):
-            if max_link_ratio > 0 and is_toc_chunk(chunk, max_link_ratio):
-                filtered_count += 1
-                continue
-            all_chunks.append((name, chunk, idx))
-
-    # BM25 검색
-    results = bm25_search(query, all_chunks, top_k)
-
-    output = format_output(
-        query=query,
-        results=results,
-        summary_text=summary_text,
-        total_chunks=len(all_chunks),
-        top_k=top_k,
+    src_paths = existing_dirs(sources_dir)
+    params = index_params(chunk_size, overlap, max_link_ratio, glob, include_summary, near_dup_bits, chunker)
+    dense_model = dense_model_for(hybrid, embed_model)
+    rerank_with = rerank_model_for(rerank, rerank_model)
+
+    with profiling.session(profile, query=query, top_k=top_k, engine=engine, dirs=len(src_paths)):
+        cache_dir = key = None
+        if use_cache:
+            with profiling.stage("cache_lookup") as st:
+                cache_dir = result_cache.cache_dir(src_paths, index_dir)
+                key = result_cache.cache_key(query, top_k, params, src_paths, engine, dense_model, max_tokens,
+                                             field_weights, use_positions, output_format,
+                                             (rerank_with, rerank_depth) if rerank_with else None, snippet_chars)
+                cached = None if rebuild_index else result_cache.lookup(cache_dir, key, query, stats_out)
+                st["hit"] = int(cached is not None)
+            if cached is not None:
+                return cached
+
+        stats: dict = {}
+        index = open_index(src_paths, params, index_dir, rebuild_index, jobs)
+        output = answer(query, index, top_k, len(src_paths), engine, dense_model, max_tokens, stats, field_weights,
+                        use_positions, output_format, rerank_with, rerank_depth, snippet_chars)
+        stats["source_chars"] = index.get("source_chars")
+        if use_cache:
+            with profiling.stage("cache_store"):
+                result_cache.store(cache_dir, key, query, output, stats)
+        if stats_out is not None:
+            stats_out.update(stats)
+        return output
+
+
+# ────────────────────────── 서버 클라이언트 ──────────────────────────
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+
+class ServerRejected(RuntimeError):
+    """서버가 요청을 거부함 (HTTP 4xx — 예: --index-root 없이 실행한 서버에 index_dir 전달) → 로컬 검색으로 대체"""
+
+
+def retrieve_via_server(server_url: str, payload: dict, timeout: float = 30.0) -> str:
+    """
+    rag_server.py에 검색 요청. 서버에 연결할 수 없으면 ConnectionError, 요청을 거부하면(4xx) ServerRejected
+    (둘 다 main()이 로컬 검색으로 대체), 서버 내부 오류(5xx)는 RuntimeError.
+    payload의 키는 retrieve() 인자와 같음 (sources_dir → sources_dirs, 절대경로).
+    index_dir가 None(기본 위치)이면 보내지 않음.
+    """
+    import urllib.request
+    import urllib.error
+
+    if payload.get("index_dir") is None:
+        payload = {k: v for k, v in payload.items() if k != "index_dir"}
+    req = urllib.request.Request(
+        server_url.rstrip("/") + "/retrieve",
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
     )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        try:
+            error = json.loads(e.read().decode("utf-8")).get("error", e)
+        except ValueError:
+            error = e
+        if 400 <= e.code < 500:
+            raise ServerRejected(f"RAG 서버가 요청을 거부 ({e.code}): {error}")
+        raise RuntimeError(f"서버 오류: {error}")
+    except (urllib.error.URLError, OSError) as e:
+        raise ConnectionError(f"RAG 서버 연결 실패 ({server_url}): {e}")
+    return body["output"]
 
-    # 필터 통계를 헤더에 추가
-    if filtered_count > 0:
-        header_note = f"# (목차/링크 청크 {filtered_count}개 필터됨)\n"
-        output = output.replace(
-            f"# (전체 {len(all_chunks)}개 청크 중",
-            f"# (목차 필터 후 {len(all_chunks)}개 청크 중",
-        )
-        output = header_note + output
 
-    return output
+# ────────────────────────── 배치 검색 ──────────────────────────
+
+# 이 개수 이상이면 --jobs 미지정(0) 시 프로세스 풀 사용
+POOL_MIN_QUERIES = 32
+
+_batch_index: Optional[dict] = None
+_batch_weights: Optional[Dict[str, float]] = None
+
+
+def load_queries(path: str, default_top_k: int) -> List[dict]:
+    """
+    질문 파일 읽기.
+    - 일반 텍스트: 한 줄에 질문 하나
+    - JSONL: {"query": "...", "top_k": 3, "id": "..."} (top_k, id 생략 가능)
+    빈 줄은 무시.
+    """
+    queries = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            item = json.loads(line)
+            item.setdefault("top_k", default_top_k)
+        else:
+            item = {"query": line, "top_k": default_top_k}
+        queries.append(item)
+    return queries
+
+
+def batch_record(item: dict, results: list, total_chunks: int, duplicates: Optional[dict] = None) -> dict:
+    """질문 하나의 검색 결과를 JSONL 레코드로 변환 (duplicates: 결과별 합쳐진 근접 중복, format_output() 참고)"""
+    record = {k: v for k, v in item.items()}
+    record.update({
+        "total_chunks": total_chunks,
+        "results": [
+            {"rank": rank, "source": source, "chunk_idx": chunk_idx, "score": round(score, 6),
+             "duplicates": [{"source": s, "chunk_idx": n} for s, n in (duplicates or {}).get((source, chunk_idx), [])],
+             "text": text}
+            for rank, (score, source, text, chunk_idx) in enumerate(results, 1)
+        ],
+    })
+    return record
+
+
+def _batch_init(src_paths: List[Path], params: dict, index_dir: Optional[str],
+                field_weights: Optional[Dict[str, float]] = None) -> None:
+    """풀 워커 초기화: 저장된 인덱스를 워커마다 한 번 로드 (디스크 인덱스는 이미 최신)"""
+    global _batch_index, _batch_weights
+    _batch_index = prepare_search(open_index(src_paths, params, index_dir), "python", field_weights)
+    _batch_weights = field_weights
+
+
+def _batch_search(item: dict) -> dict:
+    dups: dict = {}
+    results = search_index(_batch_index, item["query"], item["top_k"], engine="python", field_weights=_batch_weights,
+                           dups_out=dups)
+    return batch_record(item, results, len(_batch_index["chunks"]), dups)
+
+
+def retrieve_batch(
+    queries: List[dict],
+    sources_dir: Union[str, Sequence[str]],
+    chunk_size: int = 800,
+    overlap: int = 100,
+    glob: str = "*.md",
+    include_summary: bool = True,
+    max_link_ratio: float = 0.03,
+    index_dir: Optional[str] = None,
+    rebuild_index: bool = False,
+    near_dup_bits: int = NEAR_DUP_BITS,
+    chunker: str = "paragraph",
+    jobs: int = 0,
+    engine: str = "auto",
+    hybrid: bool = False,
+    embed_model: str = dense.DEFAULT_MODEL,
+    field_weights: Optional[Dict[str, float]] = None,
+    use_positions: bool = False,
+    profile: Optional[str] = None,
+    rerank: bool = False,
+    rerank_model: str = reranker.DEFAULT_MODEL,
+    rerank_depth: int = reranker.RERANK_DEPTH,
+    snippet_chars: Optional[int] = None,
+) -> List[dict]:
+    """
+    인덱스를 한 번만 로드(필요 시 증분 갱신)한 뒤 모든 질문을 채점.
+
+    Args:
+        queries: load_queries() 형식 [{"query", "top_k", ...}, ...]
+        jobs:    인덱스 생성 + python 엔진 채점 프로세스 수. 0이면 각각 변경량이 크거나
+                 질문이 POOL_MIN_QUERIES개 이상일 때 CPU 수만큼, 1이면 현재 프로세스에서 순차 처리.
+        engine:  sparse 엔진이면 모든 질문을 희소 행렬 곱으로 한 번에 채점 (jobs 무시)
+        hybrid:  BM25 + dense RRF 융합 (질문 임베딩은 한 번에 계산, jobs 무시)
+        field_weights: 주면 BM25F로 채점 (retrieve() 참고)
+        use_positions: 구절 필터 + 근접도 가중 (질문마다 현재 프로세스에서 채점, jobs 무시)
+        profile: 배치 전체를 한 레코드로 계측 (retrieve() 참고, 풀 워커 안의 채점은 기록되지 않음)
+        rerank:  질문마다 상위 rerank_depth개를 cross-encoder로 다시 채점 (retrieve() 참고, 현재 프로세스에서)
+        snippet_chars: 결과 본문을 질문 중심 발췌로 바꾸고 결과마다 "snippet" 구간 기록 (retrieve() 참고)
+
+    Returns:
+        질문 순서대로 [{"query", "top_k", "total_chunks", "results": [...]}, ...]
+    """
+    src_paths = existing_dirs(sources_dir)
+    params = index_params(chunk_size, overlap, max_link_ratio, glob, include_summary, near_dup_bits, chunker)
+    rerank_with = rerank_model_for(rerank, rerank_model)
+    with profiling.session(profile, queries=len(queries), engine=engine, dirs=len(src_paths)):
+        index = open_index(src_paths, params, index_dir, rebuild_index, jobs)
+        total_chunks = len(index["chunks"])
+        if rerank_with:
+            # 1단계는 후보 수만큼 검색한 뒤 질문마다 재순위 (질문별 top_k는 레코드에 그대로 남김)
+            deep = [dict(item, top_k=reranker.pool_size(item["top_k"], rerank_depth)) for item in queries]
+            records = _batch_records(deep, index, src_paths, params, index_dir, jobs, engine, hybrid, embed_model,
+                                     field_weights, use_positions)
+            reranked = []
+            for item, record in zip(queries, records):
+                candidates = [(r["score"], r["source"], r["text"], r["chunk_idx"]) for r in record["results"]]
+                dups = {(r["source"], r["chunk_idx"]): [(d["source"], d["chunk_idx"]) for d in r["duplicates"]]
+                        for r in record["results"]}
+                results = reranker.rerank(index, item["query"], candidates, rerank_with, item["top_k"])
+                reranked.append(batch_record(item, results, total_chunks, dups))
+            records = reranked
+        else:
+            records = _batch_records(queries, index, src_paths, params, index_dir, jobs, engine, hybrid,
+                                     embed_model, field_weights, use_positions)
+        if snippet_chars:
+            with profiling.stage("snippets") as st:
+                for record in records:
+                    _snippet_record(index, record, snippet_chars)
+                st["results"] = sum(len(record["results"]) for record in records)
+        return records
+
+
+def _snippet_record(index: dict, record: dict, snippet_chars: int) -> None:
+    """배치 레코드의 결과 본문을 발췌로 바꾸고 "snippet": {"start", "end", "chunk_chars"} 기록"""
+    spans: dict = {}
+    results = [(r["score"], r["source"], r["text"], r["chunk_idx"]) for r in record["results"]]
+    extracted = snippets.extract(index, record["query"], results, snippet_chars, spans)
+    for r, (_, source, text, chunk_idx) in zip(record["results"], extracted):
+        start, end, chunk_chars = spans[(source, chunk_idx)]
+        r["text"] = text
+        r["snippet"] = {"start": start, "end": end, "chunk_chars": chunk_chars}
+
+
+def _batch_records(
+    queries: List[dict],
+    index: dict,
+    src_paths: List[Path],
+    params: dict,
+    index_dir: Optional[str],
+    jobs: int,
+    engine: str,
+    hybrid: bool,
+    embed_model: str,
+    field_weights: Optional[Dict[str, float]],
+    use_positions: bool,
+) -> List[dict]:
+    """retrieve_batch()의 1단계 검색: 엔진·옵션에 맞는 방식으로 모든 질문을 채점해 레코드 생성"""
+    total_chunks = len(index["chunks"])
+
+    dense_model = dense_model_for(hybrid, embed_model)
+    all_dups: List[dict] = []
+    if dense_model:
+        all_results = dense.hybrid_search_many(
+            index, [q["query"] for q in queries], [q["top_k"] for q in queries], dense_model, engine,
+            field_weights=field_weights, dups_out=all_dups,
+        )
+        return [batch_record(item, results, total_chunks, dups)
+                for item, results, dups in zip(queries, all_results, all_dups)]
+
+    if use_positions:
+        import positional
+        records = []
+        for item in queries:
+            dups: dict = {}
+            ranked = rank_unique(
+                index, lambda d, q=item["query"]: positional.search(index, q, d, engine, field_weights),
+                item["top_k"], dups,
+            )
+            records.append(batch_record(item, materialize(index, ranked), total_chunks, dups))
+        return records
+
+    if resolve_engine(engine) == "sparse":
+        all_results = search_many(index, [q["query"] for q in queries], [q["top_k"] for q in queries],
+                                  engine="sparse", field_weights=field_weights, dups_out=all_dups)
+        return [batch_record(item, results, total_chunks, dups)
+                for item, results, dups in zip(queries, all_results, all_dups)]
+
+    if jobs == 0:
+        jobs = (os.cpu_count() or 1) if len(queries) >= POOL_MIN_QUERIES else 1
+    jobs = min(jobs, len(queries))
+
+    if jobs <= 1:
+        # 역색인을 한 번 만들어 모든 질문에 재사용 (질문 하나용 훑기·저장 게시 목록 경로를 타지 않도록)
+        prepare_search(index, "python", field_weights)
+        records = []
+        for item in queries:
+            dups = {}
+            results = search_index(index, item["query"], item["top_k"], engine="python", field_weights=field_weights,
+                                   dups_out=dups)
+            records.append(batch_record(item, results, total_chunks, dups))
+        return records
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # 워커는 open_index()로 디스크 인덱스를 로드 (위에서 이미 갱신·저장됨)
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_batch_init,
+        initargs=(src_paths, params, index_dir, field_weights),
+    ) as pool:
+        chunksize = max(1, len(queries) // (jobs * 4))
+        return list(pool.map(_batch_search, queries, chunksize=chunksize))
 
 
 # ────────────────────────── CLI ──────────────────────────
@@ -290,46 +899,182 @@ def main() -> int:
     parser = argparse.ArgumentParser(
         description="RAG Retriever — BM25 기반 청크 검색 (토큰 절감)"
     )
-    parser.add_argument("--query",          required=True,      help="검색 쿼리 (사용자 질문)")
-    parser.add_argument("--sources-dir",    required=True,      help="수집된 .md 파일 디렉토리")
+    parser.add_argument("--query",          default=None,       help="검색 쿼리 (사용자 질문)")
+    parser.add_argument("--queries-file",   default=None,
+                        help="배치 검색: 한 줄에 질문 하나 또는 JSONL({query, top_k}). 결과는 JSONL로 출력")
+    parser.add_argument("--jobs",           type=int, default=0,
+                        help="인덱스 생성·배치 채점(python 엔진) 프로세스 수 "
+                             f"(기본 0: 변경 파일이 크거나 질문 {POOL_MIN_QUERIES}개 이상이면 CPU 수, 1이면 순차)")
+    parser.add_argument("--sources-dir",    nargs="+", default=[],  help="수집된 .md 파일 디렉토리 (복수 가능)")
+    parser.add_argument("--manifest",       nargs="+", default=[],  help="manifest.json 경로 (복수 가능, source_dirs 사용)")
+    parser.add_argument("--topics",         nargs="+", default=[],
+                        help="Category/safe_topic 식별자 (복수 또는 쉼표 구분, OBSIDIAN_VAULT_PATH 필요)")
+    parser.add_argument("--vault-path",     default=None,           help="Obsidian vault 루트 (미지정 시 OBSIDIAN_VAULT_PATH)")
     parser.add_argument("--top-k",          type=int, default=5,    help="반환할 청크 수 (기본 5)")
     parser.add_argument("--chunk-size",     type=int, default=800,  help="청크 크기 (기본 800자)")
     parser.add_argument("--overlap",        type=int, default=100,  help="청크 간 겹침 (기본 100자)")
+    parser.add_argument("--chunker",        choices=CHUNKERS, default="paragraph",
+                        help="청크 분할 방식 (기본 paragraph: 문단 경계, heading: 마크다운 제목 구간 안에서만 분할)")
     parser.add_argument("--no-summary",     action="store_true",    help="summary 파일 제외")
     parser.add_argument("--glob",           default="*.md",         help="파일 패턴 (기본 *.md)")
     parser.add_argument("--show-stats",     action="store_true",    help="토큰 절감 통계 출력")
+    parser.add_argument("--format",         choices=OUTPUT_FORMATS, default="markdown",
+                        help="출력 형식 (기본 markdown, json: 결과별 문자 구간·정규화 점수·목차 통계 + 신뢰도 지표)")
+    parser.add_argument("--max-tokens",     type=int, default=None,
+                        help="청크 본문 토큰 예산: MMR + 중복 청크 제거로 예산만큼 채움 "
+                             "(top-k 대신, 결과가 top-k보다 많을 수 있음, 점수 순 출력)")
     parser.add_argument("--max-link-ratio", type=float, default=0.03,
                         help="목차 청크 필터 임계값: 100자당 링크 수 (기본 0.03). 0.0이면 필터 비활성화")
+    parser.add_argument("--near-dup-bits",  type=int, default=NEAR_DUP_BITS,
+                        help=f"근접 중복 청크 통합: SimHash 해밍 거리 임계값 (기본 {NEAR_DUP_BITS}, -1이면 비활성화). "
+                             "순위 후보에서 점수가 가장 높은 청크만 남기고 나머지는 출처로 표시 (점수·IDF는 그대로)")
+    parser.add_argument("--index-dir",      default=None,
+                        help="영속 인덱스 저장 폴더 (기본: {topic}/rag/index 또는 {sources-dir}/.rag_index)")
+    parser.add_argument("--rebuild-index",  action="store_true",    help="저장된 인덱스를 무시하고 다시 생성")
+    parser.add_argument("--engine",         choices=ENGINES, default="auto",
+                        help="점수 계산 엔진 (기본 auto: numpy/scipy 있으면 sparse, 없으면 python)")
+    parser.add_argument("--bm25f",          action="store_true",
+                        help="필드 가중 BM25F: frontmatter 제목·제목 경로·본문·출처 도메인을 필드별로 채점")
+    parser.add_argument("--field-weights",  default=None,
+                        help="BM25F 필드 가중치 (--bm25f 포함, 기본 title=2,heading=1.5,body=1,domain=0.5)")
+    parser.add_argument("--positional",     action="store_true",
+                        help='위치 색인 사용: "따옴표 구절" 일치 필터 + 단어 근접도 가중 (색인은 처음 요청 시 생성)')
+    parser.add_argument("--hybrid",         action="store_true",
+                        help="BM25 + 임베딩(dense) 검색을 RRF로 융합 (sentence-transformers 필요)")
+    parser.add_argument("--embed-model",    default=dense.DEFAULT_MODEL,
+                        help="하이브리드 검색 임베딩 모델 (기본 all-MiniLM-L6-v2)")
+    parser.add_argument("--rerank",         action="store_true",
+                        help="상위 후보를 로컬 cross-encoder로 다시 채점해 top-k 선택 (sentence-transformers 필요)")
+    parser.add_argument("--rerank-model",   default=reranker.DEFAULT_MODEL,
+                        help="재순위 cross-encoder (기본 mmarco-mMiniLMv2-L12-H384-v1, 다국어)")
+    parser.add_argument("--rerank-depth",   type=int, default=reranker.RERANK_DEPTH,
+                        help=f"재순위할 1단계 후보 수 (기본 {reranker.RERANK_DEPTH})")
+    parser.add_argument("--snippets",       nargs="?", type=int, const=snippets.SNIPPET_CHARS, default=None,
+                        metavar="CHARS",
+                        help="결과 청크마다 질문 토큰 점수가 가장 높은 문장 구간만 반환 "
+                             f"(CHARS 생략: {snippets.SNIPPET_CHARS}자, 청크 안 문자 구간 표시)")
+    parser.add_argument("--no-cache",       action="store_true",
+                        help="검색 결과 캐시(같은 질문·소스 상태의 이전 출력 재사용)를 쓰지 않음")
+    parser.add_argument("--profile",        nargs="?", const="-", default=None, metavar="PATH",
+                        help="단계별 시간·메모리를 JSON으로 기록 (경로 생략: stderr, 경로: JSONL 추가). "
+                             f"{profiling.PROFILE_ENV} 환경 변수와 같음")
+    parser.add_argument("--server",         nargs="?", const=DEFAULT_SERVER_URL, default=None,
+                        help=f"상주 서버(rag_server.py)에 질의 (기본 {DEFAULT_SERVER_URL}). 연결 실패 시 로컬 검색")
 
     args = parser.parse_args()
+    if not (args.sources_dir or args.manifest or args.topics):
+        parser.error("--sources-dir / --manifest / --topics 중 하나 이상 필요합니다.")
+    if not (args.query or args.queries_file):
+        parser.error("--query 또는 --queries-file 이 필요합니다.")
+    field_weights = None
+    if args.bm25f or args.field_weights:
+        try:
+            field_weights = bm25f.parse_weights(args.field_weights)
+        except ValueError as e:
+            parser.error(str(e))
 
     try:
-        result = retrieve(
+        source_dirs = resolve_source_dirs(args.sources_dir, args.manifest, args.topics, args.vault_path)
+
+        if args.queries_file:
+            records = retrieve_batch(
+                load_queries(args.queries_file, args.top_k),
+                sources_dir=[str(d) for d in source_dirs],
+                chunk_size=args.chunk_size,
+                overlap=args.overlap,
+                glob=args.glob,
+                include_summary=not args.no_summary,
+                max_link_ratio=args.max_link_ratio,
+                index_dir=args.index_dir,
+                rebuild_index=args.rebuild_index,
+                near_dup_bits=args.near_dup_bits,
+                chunker=args.chunker,
+                jobs=args.jobs,
+                engine=args.engine,
+                hybrid=args.hybrid,
+                embed_model=args.embed_model,
+                field_weights=field_weights,
+                use_positions=args.positional,
+                profile=args.profile,
+                rerank=args.rerank,
+                rerank_model=args.rerank_model,
+                rerank_depth=args.rerank_depth,
+                snippet_chars=args.snippets,
+            )
+            sys.stdout.reconfigure(encoding="utf-8")
+            for record in records:
+                print(json.dumps(record, ensure_ascii=False))
+            return 0
+
+        kwargs = dict(
             query=args.query,
-            sources_dir=args.sources_dir,
             top_k=args.top_k,
             chunk_size=args.chunk_size,
             overlap=args.overlap,
             glob=args.glob,
             include_summary=not args.no_summary,
             max_link_ratio=args.max_link_ratio,
+            index_dir=str(Path(args.index_dir).resolve()) if args.index_dir else None,
+            rebuild_index=args.rebuild_index,
+            near_dup_bits=args.near_dup_bits,
+            chunker=args.chunker,
+            engine=args.engine,
+            hybrid=args.hybrid,
+            embed_model=args.embed_model,
+            max_tokens=args.max_tokens,
+            field_weights=field_weights,
+            use_positions=args.positional,
+            output_format=args.format,
+            rerank=args.rerank,
+            rerank_model=args.rerank_model,
+            rerank_depth=args.rerank_depth,
+            snippet_chars=args.snippets,
         )
+        result = None
+        pack_stats: dict = {}
+        if args.server:
+            try:
+                result = retrieve_via_server(
+                    args.server,
+                    dict(kwargs, sources_dirs=[str(d.resolve()) for d in source_dirs]),
+                )
+            except (ConnectionError, ServerRejected) as e:
+                print(f"  [warn] {e} → 로컬 검색으로 진행", file=sys.stderr)
+        if result is None:
+            result = retrieve(sources_dir=[str(d) for d in source_dirs], jobs=args.jobs, use_cache=not args.no_cache,
+                              stats_out=pack_stats, profile=args.profile, **kwargs)
 
         sys.stdout.reconfigure(encoding="utf-8")
         print(result)
 
         if args.show_stats:
-            # 전체 파일 크기 vs 반환된 청크 크기 비교
-            src_path = Path(args.sources_dir)
-            total_chars = sum(
-                len(p.read_text(encoding="utf-8"))
-                for p in src_path.glob(args.glob)
-            )
+            # 전체 파일 크기 vs 반환된 청크 크기 비교 (인덱스에 기록된 글자 수, 서버 경로에서만 파일을 읽음)
+            total_chars = pack_stats.get("source_chars")
+            if total_chars is None:
+                total_chars = sum(
+                    len(p.read_text(encoding="utf-8"))
+                    for d in source_dirs if d.exists()
+                    for p in d.glob(args.glob)
+                )
             result_chars = len(result)
             print("\n" + "="*50, file=sys.stderr)
             print(f"[통계] 전체 소스: {total_chars:,}자 (~{total_chars//4:,} tokens)", file=sys.stderr)
             print(f"[통계] RAG 출력:  {result_chars:,}자 (~{result_chars//4:,} tokens)", file=sys.stderr)
-            print(f"[통계] 절감률:    {(1 - result_chars/total_chars)*100:.1f}%", file=sys.stderr)
+            if total_chars:
+                print(f"[통계] 절감률:    {(1 - result_chars/total_chars)*100:.1f}%", file=sys.stderr)
+            if pack_stats.get("near_duplicates"):
+                print(f"[통계] 근접 중복: 후보 청크 {pack_stats['near_duplicates']:,}개를 점수가 가장 높은 대표 청크에 통합 "
+                      f"(--near-dup-bits {args.near_dup_bits}, -1이면 비활성화)", file=sys.stderr)
+            if "topk_tokens" in pack_stats:
+                topk, packed = pack_stats["topk_tokens"], pack_stats["packed_tokens"]
+                saved = (1 - packed / topk) * 100 if topk else 0.0
+                print(f"[통계] 토큰 예산: top-{args.top_k} 청크 ~{topk:,} tokens → 선택 청크 ~{packed:,} tokens "
+                      f"({saved:.1f}% 절감, 중복 {pack_stats['duplicates']}개 제외)", file=sys.stderr)
+            if "snippet_chars" in pack_stats:
+                full, kept = pack_stats["chunk_chars"], pack_stats["snippet_chars"]
+                saved = (1 - kept / full) * 100 if full else 0.0
+                print(f"[통계] 발췌:      결과 청크 본문 {full:,}자 → 발췌 {kept:,}자 ({saved:.1f}% 절감)",
+                      file=sys.stderr)
             print("="*50, file=sys.stderr)
 
         return 0
@@ -0,0 +1,88 @@
+"""
+simhash.py — 청크 SimHash 서명 / 근접 중복 탐지 (순수 Python)
+
+search_tavily.py는 같은 글을 미러, Medium 재게시, arXiv abs/html/pdf 판본으로 여러 번 수집합니다.
+normalize_url()은 URL이 같은 경우만 잡으므로, 인덱스 생성 시 청크마다 64비트 SimHash를 계산해 두고
+검색 시 순위가 매겨진 후보(rag_index.collapse)에서 해밍 거리 NEAR_DUP_BITS 이하인 청크를 하나로 합칩니다.
+코퍼스에서는 아무것도 빼지 않으므로 IDF·N은 통합과 무관합니다.
+
+    simhash(tokens) — 청크의 서로 다른 토큰 집합에 대한 비트별 다수결 (빈도 가중치 없음:
+        자주 나오는 단어가 서명을 지배해 무관한 청크가 겹치는 것을 막음)
+        비트 64개 카운터를 32비트 lane 64개로 나란히 담은 큰 정수 하나에 더해서
+        토큰당 Python 연산을 한 번으로 줄임
+
+    collapse_ranked(ids, ...) — 점수 순 후보를 앞에서부터 훑으며 이미 남긴 대표와만 비교
+        (대표 = 그룹에서 점수가 가장 높은 청크, 연쇄 병합 없음). 비교는 후보 × 남긴 대표 수만큼
+"""
+
+import hashlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+NEAR_DUP_BITS = 3     # 이 해밍 거리 이하면 근접 중복
+MIN_TOKENS    = 20    # 이보다 짧은 청크는 서명이 불안정하므로 합치지 않음
+
+_LANE   = 32
+_REP    = sum(1 << (_LANE * i) for i in range(64))       # 모든 lane에 1
+_SPREAD = [sum(((b >> i) & 1) << (_LANE * i) for i in range(8)) for b in range(256)]
+_BITS   = bytes.maketrans(b"\x00\x80", b"01")
+
+
+@lru_cache(maxsize=1 << 17)
+def _token_lanes(tok: str) -> int:
+    """토큰 64비트 해시의 각 비트를 lane i(32비트)에 펼친 정수"""
+    h = hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest()
+    out = 0
+    for k, byte in enumerate(h):
+        out |= _SPREAD[byte] << (_LANE * 8 * k)
+    return out
+
+
+def simhash(tokens: Iterable[str]) -> int:
+    """서로 다른 토큰 목록 → 64비트 SimHash (비트 i = 과반 토큰의 해시가 비트 i를 가짐)"""
+    acc = total = 0
+    for tok in tokens:
+        acc += _token_lanes(tok)
+        total += 1
+    if not total:
+        return 0
+    # lane마다 2·count > total 이면 lane 최상위 비트가 서도록 오프셋을 더함 (lane 간 자리올림 없음)
+    acc = 2 * acc + (2 ** (_LANE - 1) - total - 1) * _REP
+    top = acc.to_bytes(_LANE * 8 + 1, "little")[_LANE // 8 - 1:_LANE * 8:_LANE // 8]
+    bits = bytes(b & 0x80 for b in top).translate(_BITS)
+    return int(bits[::-1], 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def collapse_ranked(
+    ids: Iterable[int],
+    signatures: Sequence[int],
+    lengths: Sequence[int],
+    max_bits: int = NEAR_DUP_BITS,
+    limit: Optional[int] = None,
+) -> Tuple[List[int], Dict[int, List[int]]]:
+    """
+    점수 내림차순 청크 id → (남긴 id 목록, {대표 id: [합쳐진 id, ...]}).
+    먼저 나온(점수가 높은) 청크가 대표가 되고, 대표와 해밍 거리 max_bits 이하인 뒤 청크는 그 아래로 합쳐짐.
+    lengths(토큰 수)가 MIN_TOKENS 미만인 청크는 대표도 중복도 되지 않음.
+    limit개를 남기면 종료 (그 뒤 후보는 보지 않음).
+    """
+    kept: List[int] = []
+    reps: List[Tuple[int, int]] = []
+    groups: Dict[int, List[int]] = {}
+    for i in ids:
+        if limit is not None and len(kept) >= limit:
+            break
+        if lengths[i] >= MIN_TOKENS:
+            sig = signatures[i]
+            rep = next((j for j, other in reps if hamming(sig, other) <= max_bits), None)
+            if rep is not None:
+                groups.setdefault(rep, []).append(i)
+                continue
+            reps.append((i, sig))
+        kept.append(i)
+    return kept, groups
@@ -0,0 +1,136 @@
+"""
+snippets.py — 질문 중심 발췌 (반환 청크 안에서 가장 관련 있는 문장 구간만)
+
+knowledge_query 기본값(청크 1200자)으로 반환된 청크에 정작 관련 있는 문장은 한두 개인 경우가 많습니다.
+--snippets를 주면 결과 청크마다 문장 창(연속된 문장, 최대 --snippet-chars자)을 인덱스의 IDF로 채점해
+가장 높은 창만 반환합니다. 추가 모델 호출 없이 질문당 컨텍스트가 크게 줄어듭니다.
+
+    창 점수 = Σ_{질문 토큰 t}  idf(t) · tf(t, 창) · (k1 + 1) / (tf(t, 창) + k1)
+
+- idf는 검색과 같은 값 (rag_index.query_idf, 질문 토큰이 중복되면 중복만큼 합산)
+- 창은 문장 i부터 --snippet-chars를 넘지 않을 때까지 이어 붙인 최대 구간. 동점이면 앞쪽 창
+- 문장 경계: 문장 부호(. ! ? 。) 뒤 공백, 줄바꿈. 한 문장이 --snippet-chars보다 길면 공백 경계로 자름
+- 제목 경로("§ 개요 > 구조", chunker="heading")는 발췌 앞에 그대로 남김 (청크별 제목 경로로 판별 — 본문이
+  "§ "로 시작하는 문단 청크를 제목 경로로 오인하지 않음)
+- 질문 토큰이 하나도 없는 청크(하이브리드·재순위 결과)는 청크 앞부분 창
+- 앞뒤가 잘린 쪽에 "…"를 붙이고, 청크 본문 안의 문자 구간 [start, end)를 함께 반환
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from chunking import tokenize, with_breadcrumb
+from rag_index import BM25_K1, query_idf, result_ids
+
+
+SNIPPET_CHARS = 400
+ELLIPSIS = "…"
+
+SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?。！？])\s+|\n+')
+
+
+def sentence_spans(text: str, start: int = 0, max_chars: int = SNIPPET_CHARS) -> List[Tuple[int, int]]:
+    """text[start:]의 문장 구간 [(start, end), ...]  (max_chars보다 긴 문장은 공백 경계로 나눔)"""
+    spans: List[Tuple[int, int]] = []
+    pos = start
+    for m in SENTENCE_BREAK_RE.finditer(text, start):
+        if m.start() > pos:
+            spans.extend(_split_long(text, pos, m.start(), max_chars))
+        pos = m.end()
+    if pos < len(text):
+        spans.extend(_split_long(text, pos, len(text), max_chars))
+    return spans
+
+
+def _split_long(text: str, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+    out = []
+    while end - start > max_chars:
+        cut = text.rfind(" ", start + 1, start + max_chars + 1)
+        if cut <= start:
+            cut = start + max_chars
+        out.append((start, cut))
+        start = cut
+        while start < end and text[start] == " ":
+            start += 1
+    if start < end:
+        out.append((start, end))
+    return out
+
+
+def _body_start(text: str, crumb: str) -> int:
+    """청크의 제목 경로 줄 다음 위치 (chunking.with_breadcrumb 형식, 제목 경로가 없으면 0)"""
+    prefix = with_breadcrumb(crumb, "")
+    return len(prefix) if crumb and text.startswith(prefix) else 0
+
+
+def best_window(
+    text: str,
+    idf: Dict[str, float],
+    q_tokens: List[str],
+    max_chars: int = SNIPPET_CHARS,
+    body_start: int = 0,
+) -> Tuple[int, int, float]:
+    """청크 본문에서 점수가 가장 높은 문장 창 → (start, end, score)  (text 안의 문자 구간)"""
+    spans = sentence_spans(text, body_start, max_chars)
+    if not spans:
+        return body_start, len(text), 0.0
+    terms = [q for q in q_tokens if q in idf]
+    sent_tf: List[Dict[str, int]] = []
+    for s, e in spans:
+        tf: Dict[str, int] = {}
+        for tok in tokenize(text[s:e]):
+            if tok in idf:
+                tf[tok] = tf.get(tok, 0) + 1
+        sent_tf.append(tf)
+
+    best: Optional[Tuple[int, int, float]] = None
+    for i in range(len(spans)):
+        # 문장 하나는 max_chars 이하(_split_long)이므로 창에는 항상 문장 i가 들어감
+        window: Dict[str, int] = {}
+        j = i
+        while j < len(spans) and spans[j][1] - spans[i][0] <= max_chars:
+            for tok, n in sent_tf[j].items():
+                window[tok] = window.get(tok, 0) + n
+            j += 1
+        score = 0.0
+        for q in terms:
+            tf = window.get(q, 0)
+            if tf:
+                score += idf[q] * (tf * (BM25_K1 + 1) / (tf + BM25_K1))
+        if best is None or score > best[2]:
+            best = (spans[i][0], spans[j - 1][1], score)
+    return best
+
+
+def extract(
+    index: dict,
+    query: str,
+    results: List[Tuple[float, str, str, int]],
+    max_chars: int = SNIPPET_CHARS,
+    offsets_out: Optional[Dict[Tuple[str, int], Tuple[int, int, int]]] = None,
+) -> List[Tuple[float, str, str, int]]:
+    """
+    결과 [(score, source, text, chunk_idx), ...] → 본문을 발췌로 바꾼 같은 형식의 목록.
+    offsets_out: 전달하면 {(source, chunk_idx): (start, end, 청크 글자 수)}를 채움 (발췌의 청크 안 문자 구간)
+    """
+    q_tokens = tokenize(query)
+    idf = query_idf(index, q_tokens)
+    crumbs = index.get("breadcrumbs")
+    ids = result_ids(index, results) if crumbs else {}
+    out = []
+    for score, source, text, chunk_idx in results:
+        i = ids.get((source, chunk_idx))
+        body = _body_start(text, crumbs[i] if i is not None else "")
+        start, end, _ = best_window(text, idf, q_tokens, max_chars, body)
+        if offsets_out is not None:
+            offsets_out[(source, chunk_idx)] = (start, end, len(text))
+        if start == body and end >= len(text.rstrip()):
+            out.append((score, source, text, chunk_idx))
+            continue
+        snippet = text[start:end]
+        if start > body:
+            snippet = ELLIPSIS + " " + snippet
+        if end < len(text.rstrip()):
+            snippet = snippet + " " + ELLIPSIS
+        out.append((score, source, text[:body] + snippet, chunk_idx))
+    return out
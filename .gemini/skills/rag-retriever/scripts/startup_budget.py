@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+startup_budget.py — 웜 경로 시작 시간 예산 확인 (python -X importtime)
+
+저장 인덱스가 최신일 때 retrieve_chunks.py 한 번 실행(질문 하나, --no-cache)이 출력 방식마다
+아래 예산을 지키는지 확인합니다. 하나라도 넘으면 종료 코드 1.
+
+    markdown    --show-stats (기본 출력 + 토큰 절감 통계)
+    json        --format json (문자 구간·목차 통계는 인덱스 값)
+    snippets    --snippets (질문 중심 발췌)
+    max_tokens  --max-tokens 1500 (토큰 예산 패킹)
+
+    import_ms      python -X importtime의 최상위 import 누적 시간 합 (빈 인터프리터(-c pass)도 import하는
+                   site / encodings 등은 제외 — 스크립트가 더하는 import만)
+    heavy_modules  import되면 안 되는 모듈 (numpy / scipy / rank_bm25 / sentence_transformers / torch)
+    source_opens   실행 중 연 소스 .md 파일 수 (audit hook, 0이어야 함 — 결과 본문은 chunk_store에서)
+    wall_ms        프로세스 기동부터 종료까지 p50 (인터프리터 기동 포함)
+
+기본 예산은 1코어 샌드박스의 200파일 합성 코퍼스(bench_retrieval.py) 측정값에 여유를 둔 값입니다.
+    측정: import ~20-35ms, 웜 실행 ~340ms (빈 인터프리터 ~65ms)
+    이전: 웜 실행 ~720ms (auto 엔진이 NumPy/SciPy를 import하고 희소 행렬 구성, --show-stats가 소스 재읽기)
+
+Usage:
+    python scripts/startup_budget.py                                  # 합성 코퍼스 200파일
+    python scripts/startup_budget.py --size 1000 --max-wall-ms 1500
+    python scripts/startup_budget.py --sources-dir Agent/AI/Mamba/sources --query "selection mechanism"
+    python scripts/startup_budget.py --modes json snippets
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_retrieval import ensure_corpus, percentile  # noqa: E402
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+RETRIEVE = SCRIPT_DIR / "retrieve_chunks.py"
+
+HEAVY_MODULES = ("numpy", "scipy", "rank_bm25", "sentence_transformers", "torch")
+DEFAULT_MAX_IMPORT_MS = 60
+DEFAULT_MAX_WALL_MS   = 600
+
+# 출력 방식별 추가 인자 (모두 같은 audit·import·실행 시간 예산)
+MODES = {
+    "markdown":   ["--show-stats"],
+    "json":       ["--format", "json"],
+    "snippets":   ["--snippets"],
+    "max_tokens": ["--max-tokens", "1500"],
+}
+
+# 소스 .md 열기를 기록하고 retrieve_chunks.py를 __main__으로 실행하는 자식 프로세스 코드
+WATCH_CODE = """
+import json, os, runpy, sys
+out_path, root, script = sys.argv[1:4]
+opened = []
+def hook(event, args):
+    if event == "open" and isinstance(args[0], (str, bytes, os.PathLike)):
+        path = os.path.abspath(os.fsdecode(args[0]))
+        if path.endswith(".md") and path.startswith(root):
+            opened.append(path)
+sys.addaudithook(hook)
+sys.argv = [script] + sys.argv[4:]
+code = 0
+try:
+    runpy.run_path(script, run_name="__main__")
+except SystemExit as e:
+    code = e.code or 0
+with open(out_path, "w", encoding="utf-8") as f:
+    json.dump({"opened": opened, "modules": sorted(sys.modules), "code": code}, f)
+"""
+
+
+# ────────────────────────── 측정 ──────────────────────────
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """-X importtime 출력 → [(모듈, 누적 μs, 깊이), ...]  (깊이 0 = 최상위 import)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        rows.append((stripped, int(cumulative), (len(name) - len(stripped) - 1) // 2))
+    return rows
+
+
+def import_rows(cmd: List[str]) -> List[Tuple[str, int, int]]:
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + cmd, capture_output=True, text=True,
+                          encoding="utf-8")
+    return parse_importtime(proc.stderr)
+
+
+def watch(args: List[str], sources_dir: Path) -> dict:
+    """audit hook을 건 자식 프로세스로 한 번 실행 → {"opened", "modules", "code"}"""
+    fd, out_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        subprocess.run([sys.executable, "-c", WATCH_CODE, out_path, str(sources_dir.resolve()), str(RETRIEVE)] + args,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return json.loads(Path(out_path).read_text(encoding="utf-8"))
+    finally:
+        os.unlink(out_path)
+
+
+def wall_ms(cmd: List[str], runs: int) -> Optional[float]:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable] + cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(percentile(times, 50), 1) if times else None
+
+
+def check_mode(base: List[str], extra: List[str], sources_dir: Path, runs: int, startup: set,
+               max_import: float, max_wall: float) -> dict:
+    """출력 방식 하나 → import·무거운 모듈·소스 열기·실행 시간과 예산 위반 목록"""
+    args = base + extra
+    cmd = [str(RETRIEVE)] + args
+    rows = import_rows(cmd)
+    added = [r for r in rows if r[2] == 0 and r[0] not in startup]
+    script_ms = round(sum(c for _, c, _ in added) / 1000, 1)
+    top = sorted(added, key=lambda r: -r[1])[:5]
+    watched = watch(args, sources_dir)
+    heavy = sorted({m.split(".")[0] for m in watched["modules"] + [r[0] for r in rows]} & set(HEAVY_MODULES))
+    wall = wall_ms(cmd, runs)
+
+    violations = []
+    if watched["code"]:
+        violations.append(f"retrieve_chunks.py 종료 코드 {watched['code']}")
+    if script_ms > max_import:
+        violations.append(f"import {script_ms}ms > 예산 {max_import}ms")
+    if heavy:
+        violations.append(f"무거운 모듈 import: {', '.join(heavy)}")
+    if watched["opened"]:
+        violations.append(f"소스 .md {len(watched['opened'])}개 열림 (예: {watched['opened'][0]})")
+    if wall is not None and wall > max_wall:
+        violations.append(f"실행 {wall}ms > 예산 {max_wall}ms")
+    return {
+        "args":           extra,
+        "import_ms":      script_ms,
+        "top_imports":    [{"module": m, "ms": round(c / 1000, 1)} for m, c, _ in top],
+        "heavy_modules":  heavy,
+        "source_opens":   len(watched["opened"]),
+        "wall_ms_p50":    wall,
+        "violations":     violations,
+    }
+
+
+def check(sources_dir: Path, query: str, engine: str, runs: int, max_import: float, max_wall: float,
+          modes: Optional[List[str]] = None) -> dict:
+    base = ["--sources-dir", str(sources_dir), "--query", query, "--engine", engine, "--no-cache"]
+
+    # 인덱스·본문 저장소를 최신으로 (첫 실행은 생성 비용이라 측정에서 제외)
+    subprocess.run([sys.executable, str(RETRIEVE)] + base, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   check=True)
+
+    startup = {name for name, _, _ in import_rows(["-c", "pass"])}
+    results = {
+        name: check_mode(base, MODES[name], sources_dir, runs, startup, max_import, max_wall)
+        for name in (modes or list(MODES))
+    }
+    return {
+        "sources_dir":    str(sources_dir),
+        "query":          query,
+        "engine":         engine,
+        "import_ms":      max(r["import_ms"] for r in results.values()),
+        "wall_ms_p50":    max((r["wall_ms_p50"] for r in results.values() if r["wall_ms_p50"] is not None),
+                              default=None),
+        "budget":         {"import_ms": max_import, "wall_ms": max_wall},
+        "modes":          results,
+        "violations":     [f"[{name}] {v}" for name, r in results.items() for v in r["violations"]],
+    }
+
+
+# ────────────────────────── CLI ──────────────────────────
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="RAG Retriever 웜 경로 시작 시간 예산 확인 (-X importtime)")
+    parser.add_argument("--sources-dir",  default=None,
+                        help="확인할 소스 디렉토리 (기본: 합성 코퍼스를 임시 폴더에 생성)")
+    parser.add_argument("--query",        default=None,  help="질문 (기본: 합성 코퍼스의 첫 라벨 질문)")
+    parser.add_argument("--size",         type=int, default=200, help="합성 코퍼스 파일 수 (기본 200)")
+    parser.add_argument("--engine",       default="auto", help="점수 계산 엔진 (기본 auto)")
+    parser.add_argument("--runs",         type=int, default=5, help="실행 시간 측정 횟수 (기본 5, p50)")
+    parser.add_argument("--modes",        nargs="+", choices=list(MODES), default=None,
+                        help="확인할 출력 방식 (기본: 전부)")
+    parser.add_argument("--max-import-ms", type=float, default=DEFAULT_MAX_IMPORT_MS,
+                        help=f"import 시간 예산 (기본 {DEFAULT_MAX_IMPORT_MS}ms)")
+    parser.add_argument("--max-wall-ms",  type=float, default=DEFAULT_MAX_WALL_MS,
+                        help=f"실행 시간 예산 (기본 {DEFAULT_MAX_WALL_MS}ms)")
+    args = parser.parse_args()
+
+    corpus_dir = None
+    try:
+        if args.sources_dir:
+            sources_dir = Path(args.sources_dir)
+            query = args.query or "memory bandwidth"
+        else:
+            corpus_dir = Path(tempfile.mkdtemp(prefix="rag_budget_"))
+            queries = ensure_corpus(corpus_dir, args.size, 1, seed=1)
+            sources_dir = corpus_dir / "sources"
+            query = args.query or queries[0]["query"]
+        report = check(sources_dir, query, args.engine, args.runs, args.max_import_ms, args.max_wall_ms, args.modes)
+    finally:
+        if corpus_dir is not None:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    for line in report["violations"]:
+        print(f"  [budget] 초과: {line}", file=sys.stderr)
+    if not report["violations"]:
+        print(f"  [budget] 통과 ({', '.join(report['modes'])}): import 최대 {report['import_ms']}ms, "
+              f"실행 최대 {report['wall_ms_p50']}ms", file=sys.stderr)
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+vault_search.py — vault 전체 의미(semantic) 검색 (토픽을 몰라도 질문 하나로 검색)
+
+$OBSIDIAN_VAULT_PATH/Agent/*/*/rag/manifest.json 의 모든 토픽을 대상으로,
+청크 임베딩(all-MiniLM-L6-v2)에 대한 IVF 근사 최근접 이웃 검색을 수행합니다.
+결과에는 청크와 함께 어느 토픽(Category/safe_topic)에서 나왔는지가 표시되므로
+knowledge_query에서 식별자를 고르기 전에 "어디에 있는지"부터 찾을 수 있습니다.
+
+토픽별 샤드 (rag/ 옆 index 폴더):
+    {topic}/rag/index/ivf_{model}.npz       centroids, offsets, 청크 메타데이터 (군집 순 정렬)
+    {topic}/rag/index/ivf_{model}.f16.npy   float16 임베딩 (군집 순 정렬, mmap으로 필요한 군집만 읽음)
+
+- 결과 청크 본문은 토픽 인덱스 옆 청크 본문 저장소(chunk_store.py, mmap)에서 top-k만 디코딩하고,
+  저장소가 최신이 아닐 때만 소스 .md 구간을 읽음 → 질의 중 메모리는 centroid·청크 메타데이터 크기를 따름
+
+- 샤드는 소스 파일 스냅샷(크기·mtime)과 인덱스 파라미터 지문이 바뀌었을 때만 다시 만듭니다.
+  임베딩은 retrieve_chunks --hybrid와 같은 청크 해시 캐시(emb_*.npz)를 재사용하므로 바뀐 청크만 계산
+- 질의: 선택된 샤드들의 centroid를 모아 한 번에 비교 → 가까운 군집 --nprobe개만 채점 → 전역 top-k
+  (샤드에 저장된 SimHash로 유사도가 가장 높은 청크만 남기고 근접 중복을 합침, 토픽이 달라도 합침)
+- --category / --topics 로 검색 범위를 샤드 단위로 제한
+
+Usage:
+    python scripts/vault_search.py --query "MIG 파티셔닝은 어떻게 동작하나"
+
+    # 카테고리 제한 + 더 정확하게 (군집을 더 많이 탐색)
+    python scripts/vault_search.py --query "selective scan" --category AI_Architecture --nprobe 256
+
+    # 전수 검색 (근사 없음)
+    python scripts/vault_search.py --query "..." --exact
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import ann  # noqa: E402
+import chunk_store  # noqa: E402
+import dense  # noqa: E402
+from chunking import chunk_text, with_breadcrumb  # noqa: E402
+from rag_index import get_combined_index, index_params, scan_files  # noqa: E402
+from retrieve_chunks import format_output, manifest_source_dirs  # noqa: E402
+from simhash import NEAR_DUP_BITS, collapse_ranked  # noqa: E402
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+DEFAULT_NPROBE = 64
+SHARD_VERSION  = 3   # 2: 청크별 본문 저장소 위치 (store_id, slot), 3: 근접 중복 서명 (simhashes, lengths)
+
+
+# ────────────────────────── 토픽 / 샤드 경로 ──────────────────────────
+
+def find_manifests(vault: Path, categories: Sequence[str] = (), topics: Sequence[str] = ()) -> List[Path]:
+    """Agent/{Category}/{safe_topic}/rag/manifest.json 목록 (카테고리·식별자로 필터)"""
+    idents = {t.strip() for item in topics for t in item.split(",") if t.strip()}
+    cats = {c.strip() for item in categories for c in item.split(",") if c.strip()}
+    found = []
+    for mp in sorted((vault / "Agent").glob("*/*/rag/manifest.json")):
+        category, safe_topic = mp.parent.parent.parent.name, mp.parent.parent.name
+        if cats and category not in cats:
+            continue
+        if idents and f"{category}/{safe_topic}" not in idents:
+            continue
+        found.append(mp)
+    return found
+
+
+def manifest_params(manifest: dict) -> dict:
+    """manifest에 기록된 인덱스 파라미터 (create_manifest.py --chunk-size 등), 없으면 기본값"""
+    p = (manifest.get("index") or {}).get("params") or {}
+    return index_params(
+        p.get("chunk_size", 800),
+        p.get("overlap", 100),
+        p.get("max_link_ratio", 0.03),
+        p.get("glob", "*.md"),
+        p.get("include_summary", True),
+        p.get("near_dup_bits", NEAR_DUP_BITS),
+        p.get("chunker", "paragraph"),
+    )
+
+
+def shard_paths(manifest_path: Path, model_name: str):
+    model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:8]
+    base = manifest_path.parent / "index" / f"ivf_{model_key}"
+    return base.with_suffix(".npz"), base.with_name(base.name + ".f16.npy")
+
+
+def shard_fingerprint(src_dirs: List[Path], params: dict) -> str:
+    """샤드 재생성 여부 판단용 지문: 소스 파일 (크기, mtime) + 파라미터 (파일 내용은 읽지 않음)"""
+    h = hashlib.sha1(json.dumps([SHARD_VERSION, params], sort_keys=True).encode("utf-8"))
+    for d in src_dirs:
+        h.update(str(d.resolve()).encode("utf-8"))
+        for name, (size, mtime_ns) in sorted(scan_files(d, params["glob"]).items()):
+            h.update(f"{name}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+# ────────────────────────── 샤드 생성 / 로드 ──────────────────────────
+
+def build_shard(manifest_path: Path, vault: Path, model_name: str, fingerprint: str, src_dirs: List[Path], params: dict) -> None:
+    """토픽 하나의 IVF 샤드 생성 (BM25 인덱스·임베딩 캐시를 증분 갱신해 재사용)"""
+    import numpy as np
+    npz_path, vec_path = shard_paths(manifest_path, model_name)
+    dirs = [d for d in src_dirs if d.exists()]
+    index = get_combined_index(dirs, params) if dirs else None
+
+    if index is None or not index["chunks"]:
+        vectors = np.zeros((0, 0), dtype=np.float16)
+        ivf = ann.build_ivf(np.zeros((0, 1), dtype=np.float32))
+        spans, paths, crumbs, stores, digests, sigs, lengths = [], [], [], [], [], [], []
+    else:
+        embeddings = dense.chunk_embeddings(index, model_name)
+        ivf = ann.build_ivf(embeddings)
+        order = ivf["order"]
+        vectors = embeddings[order].astype(np.float16)
+        path_ids: Dict[str, int] = {}
+        crumb_ids: Dict[str, int] = {}
+        # 디렉토리별 본문 저장소 (최신이 아니면 store_id -1 → 소스 구간에서 읽음)
+        stores, digests, part_store = [], [], []
+        for part in index["parts"]:
+            digest = part["stored"].get("text_store")
+            if digest is None:
+                part_store.append(-1)
+                continue
+            bin_path, off_path = chunk_store.store_paths(part["sources_dir"], params, part["index_dir"])
+            part_store.append(len(stores))
+            stores.append((os.path.relpath(bin_path, vault), os.path.relpath(off_path, vault)))
+            digests.append(digest)
+        ends = [part["end"] for part in index["parts"]]
+        spans = []
+        for i in order:
+            path, start, end = index["spans"][i]
+            rel = os.path.relpath(path, vault)
+            pid = path_ids.setdefault(rel, len(path_ids))
+            crumb = index["breadcrumbs"][i]
+            cid = crumb_ids.setdefault(crumb, len(crumb_ids)) if crumb else -1
+            sid = part_store[bisect_right(ends, i)]
+            spans.append((pid, start, end, index["chunks"][i][1], cid, sid, index["slots"][i]))
+        paths = list(path_ids)
+        crumbs = list(crumb_ids)
+        sigs = [index["simhashes"][i] for i in order]
+        lengths = [index["doc_len"][i] for i in order]
+
+    npz_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_vec = vec_path.with_name(vec_path.name + f".tmp{os.getpid()}")
+    with open(tmp_vec, "wb") as f:
+        np.save(f, vectors)
+    tmp_npz = npz_path.with_name(npz_path.name + f".tmp{os.getpid()}")
+    with open(tmp_npz, "wb") as f:
+        np.savez(
+            f,
+            centroids=ivf["centroids"],
+            offsets=ivf["offsets"],
+            # (path_id, byte_start, byte_end, chunk_idx, crumb_id, store_id, slot)
+            spans=np.asarray(spans, dtype=np.int64).reshape(-1, 7),
+            paths=np.asarray(paths, dtype=str),
+            crumbs=np.asarray(crumbs, dtype=str),
+            stores=np.asarray(stores, dtype=str).reshape(-1, 2),     # (본문 .bin, 위치표 .off) vault 상대 경로
+            digests=np.asarray(digests, dtype=np.int64),
+            simhashes=np.asarray(sigs, dtype=np.uint64),                # 군집 순 정렬 행별 SimHash / 토큰 수
+            lengths=np.asarray(lengths, dtype=np.int64),
+            fingerprint=np.asarray(fingerprint),
+            model=np.asarray(model_name),
+        )
+    os.replace(tmp_vec, vec_path)
+    os.replace(tmp_npz, npz_path)
+
+
+def load_shard(manifest_path: Path, model_name: str) -> Optional[dict]:
+    import numpy as np
+    npz_path, vec_path = shard_paths(manifest_path, model_name)
+    if not (npz_path.exists() and vec_path.exists()):
+        return None
+    try:
+        with np.load(npz_path, allow_pickle=False) as data:
+            shard = {k: data[k] for k in data.files}
+        shard["fingerprint"] = str(shard["fingerprint"])
+        shard["vectors"] = np.load(vec_path, mmap_mode="r")
+    except Exception:
+        return None
+    return shard
+
+
+def open_shards(manifests: List[Path], vault: Path, model_name: str, rebuild: bool = False) -> List[dict]:
+    """샤드 로드 (없거나 지문이 다르면 다시 생성)"""
+    shards = []
+    for mp in manifests:
+        manifest = json.loads(mp.read_text(encoding="utf-8"))
+        src_dirs = manifest_source_dirs(mp)
+        params = manifest_params(manifest)
+        fingerprint = shard_fingerprint([d for d in src_dirs if d.exists()], params)
+
+        shard = None if rebuild else load_shard(mp, model_name)
+        if shard is None or shard["fingerprint"] != fingerprint:
+            label = f"{mp.parent.parent.parent.name}/{mp.parent.parent.name}"
+            print(f"  [vault] 샤드 생성: {label}", file=sys.stderr)
+            build_shard(mp, vault, model_name, fingerprint, src_dirs, params)
+            shard = load_shard(mp, model_name)
+            if shard is None:
+                continue
+        shard["category"] = mp.parent.parent.parent.name
+        shard["safe_topic"] = mp.parent.parent.name
+        shard["topic"] = manifest.get("topic", shard["safe_topic"])
+        shards.append(shard)
+    return shards
+
+
+# ────────────────────────── 검색 ──────────────────────────
+
+def search_shards(shards: List[dict], query_vec, top_k: int, nprobe: int) -> List[tuple]:
+    """
+    모든 샤드의 centroid를 모아 가까운 군집 nprobe개만 채점 → 전역 top_k.
+    Returns: [(similarity, shard_no, row), ...]  (row = 샤드 내 군집 순 정렬 행)
+    """
+    import numpy as np
+    live = [j for j, s in enumerate(shards) if len(s["vectors"])]
+    if not live:
+        return []
+    centroids = np.vstack([shards[j]["centroids"] for j in live])
+    owner = np.concatenate([np.full(len(shards[j]["centroids"]), j) for j in live])
+    local = np.concatenate([np.arange(len(shards[j]["centroids"])) for j in live])
+
+    by_shard: Dict[int, List[int]] = {}
+    for g in ann.probe(centroids, query_vec, nprobe):
+        by_shard.setdefault(int(owner[g]), []).append(int(local[g]))
+
+    owners, rows, scores = [], [], []
+    for j, lists in sorted(by_shard.items()):
+        r, s = ann.search_lists(shards[j]["vectors"], shards[j]["offsets"], lists, query_vec)
+        owners.append(np.full(len(r), j))
+        rows.append(r)
+        scores.append(s)
+    owners, rows, scores = np.concatenate(owners), np.concatenate(rows), np.concatenate(scores)
+    if len(scores) > top_k:
+        kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+        keep = scores >= kth
+        owners, rows, scores = owners[keep], rows[keep], scores[keep]
+    order = np.lexsort((rows, owners, -scores))[:top_k]
+    return [(float(scores[i]), int(owners[i]), int(rows[i])) for i in order]
+
+
+def collapse_hits(
+    shards: List[dict],
+    hits: List[tuple],
+    top_k: int,
+    max_bits: int = NEAR_DUP_BITS,
+) -> Tuple[List[tuple], Dict[int, List[int]]]:
+    """
+    유사도 순 hits → (근접 중복을 합친 상위 top_k, {남긴 hit 위치: [합쳐진 hit 위치, ...]}).
+    rag_index.collapse()의 샤드 판 (행별 SimHash·토큰 수는 샤드에 저장, 샤드를 넘어 합침)
+    """
+    if max_bits < 0:
+        return hits[:top_k], {}
+    sigs = [int(shards[j]["simhashes"][row]) for _, j, row in hits]
+    lengths = [int(shards[j]["lengths"][row]) for _, j, row in hits]
+    kept, groups = collapse_ranked(range(len(hits)), sigs, lengths, max_bits, top_k)
+    return [hits[n] for n in kept], {kept.index(rep): same for rep, same in groups.items()}
+
+
+def hit_label(shards: List[dict], hit: tuple) -> Tuple[str, int]:
+    """hit → (출처 "Category/topic/파일명", chunk_idx)  본문을 읽지 않음"""
+    _, j, row = hit
+    shard = shards[j]
+    pid, chunk_idx = int(shard["spans"][row][0]), int(shard["spans"][row][3])
+    return f"{shard['category']}/{shard['safe_topic']}/{Path(str(shard['paths'][pid])).name}", chunk_idx
+
+
+def materialize(shards: List[dict], vault: Path, hits: List[tuple]) -> List[tuple]:
+    """
+    (similarity, shard_no, row) → (score, "Category/topic/파일명", chunk_text, chunk_idx).
+    본문은 저장소에서 (샤드·저장소별 한 번에), 저장소가 샤드 생성 이후 바뀌었으면 소스 구간에서 읽음.
+    """
+    rows = [tuple(int(x) for x in shards[j]["spans"][row]) for _, j, row in hits]
+    wanted: Dict[tuple, List[int]] = {}
+    for (_, j, _), span in zip(hits, rows):
+        if span[5] >= 0:
+            wanted.setdefault((j, span[5]), []).append(span[6])
+    stored: Dict[tuple, str] = {}
+    for (j, sid), slots in wanted.items():
+        bin_rel, off_rel = (str(p) for p in shards[j]["stores"][sid])
+        texts = chunk_store.read_slots(vault / bin_rel, vault / off_rel, int(shards[j]["digests"][sid]), slots)
+        stored.update({(j, sid, slot): text for slot, text in texts.items()})
+
+    results = []
+    for (score, j, _), (pid, start, end, chunk_idx, cid, sid, slot) in zip(hits, rows):
+        shard = shards[j]
+        rel = str(shard["paths"][pid])
+        text = stored.get((j, sid, slot))
+        if text is None:
+            with open(vault / rel, "rb") as f:
+                f.seek(start)
+                text = chunk_text(f.read(end - start).decode("utf-8"))
+            if cid >= 0:
+                text = with_breadcrumb(str(shard["crumbs"][cid]), text)
+        results.append((score, f"{shard['category']}/{shard['safe_topic']}/{Path(rel).name}", text, chunk_idx))
+    return results
+
+
+def vault_search(
+    query: str,
+    vault_path: Optional[str] = None,
+    categories: Sequence[str] = (),
+    topics: Sequence[str] = (),
+    top_k: int = 5,
+    nprobe: int = DEFAULT_NPROBE,
+    exact: bool = False,
+    embed_model: str = dense.DEFAULT_MODEL,
+    rebuild: bool = False,
+    near_dup_bits: int = NEAR_DUP_BITS,
+) -> str:
+    """
+    vault 전체(또는 카테고리·토픽 부분집합) 의미 검색.
+
+    Args:
+        nprobe: 탐색할 군집 수 (클수록 정확·느림)
+        exact:  모든 군집 탐색 (근사 없음)
+        near_dup_bits: 결과 후보에서 SimHash 해밍 거리가 이 값 이하인 청크를 유사도가 가장 높은 청크로 합침
+                       (음수면 비활성화)
+
+    Returns:
+        LLM 컨텍스트용 문자열 (토픽별 적중 수 포함)
+    """
+    if not dense.available():
+        raise RuntimeError("vault 의미 검색에는 sentence-transformers가 필요합니다: pip install sentence-transformers")
+    vault = Path(vault_path or os.environ.get("OBSIDIAN_VAULT_PATH", ""))
+    if not str(vault) or not (vault / "Agent").is_dir():
+        raise FileNotFoundError(f"Agent 폴더 없음: {vault / 'Agent'} (--vault-path 또는 OBSIDIAN_VAULT_PATH 확인)")
+
+    manifests = find_manifests(vault, categories, topics)
+    if not manifests:
+        raise ValueError("조건에 맞는 RAG manifest가 없습니다.")
+
+    shards = open_shards(manifests, vault, embed_model, rebuild)
+    total_chunks = sum(len(s["vectors"]) for s in shards)
+
+    query_vec = dense.encode(embed_model, [query])[0]
+    start = time.perf_counter()
+    n_lists = sum(len(s["centroids"]) for s in shards)
+    depth = top_k * 2 if near_dup_bits >= 0 else top_k
+    while True:
+        found = search_shards(shards, query_vec, depth, n_lists if exact else nprobe)
+        hits, groups = collapse_hits(shards, found, top_k, near_dup_bits)
+        if len(hits) >= top_k or len(found) < depth:
+            break
+        depth *= 2
+    results = materialize(shards, vault, hits)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    duplicates = {
+        hit_label(shards, hits[n]): [hit_label(shards, found[m]) for m in same] for n, same in groups.items()
+    }
+    output = format_output(query=query, results=results, summary_text="", total_chunks=total_chunks, top_k=top_k,
+                           duplicates=duplicates)
+
+    counts: Dict[str, int] = {}
+    for _, j, _ in hits:
+        ident = f"{shards[j]['category']}/{shards[j]['safe_topic']}"
+        counts[ident] = counts.get(ident, 0) + 1
+    lines = [
+        f"# (vault 의미 검색: 토픽 {len(shards)}개, 군집 {n_lists}개 중 "
+        f"{n_lists if exact else min(nprobe, n_lists)}개 탐색, {elapsed_ms:.1f} ms)",
+    ]
+    if counts:
+        lines.append("# 적중 토픽: " + ", ".join(f"{ident} ({n})" for ident, n in counts.items()))
+    return "\n".join(lines) + "\n" + output
+
+
+# ────────────────────────── CLI ──────────────────────────
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="vault 전체 의미 검색 (토픽별 IVF 샤드)")
+    parser.add_argument("--query",       required=True,                  help="검색 쿼리 (사용자 질문)")
+    parser.add_argument("--vault-path",  default=None,                   help="Obsidian vault 루트 (미지정 시 OBSIDIAN_VAULT_PATH)")
+    parser.add_argument("--category",    nargs="+", default=[],          help="검색할 카테고리 (복수 또는 쉼표 구분)")
+    parser.add_argument("--topics",      nargs="+", default=[],          help="검색할 Category/safe_topic 식별자 (복수 또는 쉼표 구분)")
+    parser.add_argument("--top-k",       type=int, default=5,            help="반환할 청크 수 (기본 5)")
+    parser.add_argument("--nprobe",      type=int, default=DEFAULT_NPROBE,
+                        help=f"탐색할 군집 수 (기본 {DEFAULT_NPROBE}, 클수록 정확·느림)")
+    parser.add_argument("--exact",       action="store_true",            help="모든 군집 탐색 (근사 없음)")
+    parser.add_argument("--embed-model", default=dense.DEFAULT_MODEL,    help="임베딩 모델 (기본 all-MiniLM-L6-v2)")
+    parser.add_argument("--rebuild",     action="store_true",            help="샤드를 모두 다시 생성")
+    parser.add_argument("--near-dup-bits", type=int, default=NEAR_DUP_BITS,
+                        help=f"근접 중복 결과 통합 SimHash 해밍 거리 (기본 {NEAR_DUP_BITS}, -1이면 비활성화)")
+    args = parser.parse_args()
+
+    try:
+        result = vault_search(
+            query=args.query,
+            vault_path=args.vault_path,
+            categories=args.category,
+            topics=args.topics,
+            top_k=args.top_k,
+            nprobe=args.nprobe,
+            exact=args.exact,
+            embed_model=args.embed_model,
+            rebuild=args.rebuild,
+            near_dup_bits=args.near_dup_bits,
+        )
+        sys.stdout.reconfigure(encoding="utf-8")
+        print(result)
+        return 0
+    except Exception as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
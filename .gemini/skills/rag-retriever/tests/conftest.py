@@ -0,0 +1,71 @@
+"""
+conftest.py — rag-retriever 테스트 공용 설정
+
+- scripts/ 를 import 경로에 추가 (스크립트는 패키지가 아니라 파일 단위 모듈)
+- corpus: bench_retrieval.generate_corpus()로 만든 합성 코퍼스 (세션당 한 번)
+- source_texts(): 저장소 없이 소스 구간에서 계산한 청크 본문 (비교 기준)
+- embedder: 토큰 해시 임베더를 dense 모델 캐시에 등록 (모델 다운로드 없이 dense / vault 검색 테스트)
+"""
+
+import hashlib
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+import bench_retrieval  # noqa: E402
+import dense  # noqa: E402
+from chunking import chunk_text, tokenize, with_breadcrumb  # noqa: E402
+
+
+N_FILES     = 30
+N_QUERIES   = 12
+EMBED_MODEL = "test/hash-embedder"
+EMBED_DIM   = 64
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """합성 코퍼스 → (소스 디렉토리, 라벨된 질문 목록)"""
+    root = tmp_path_factory.mktemp("corpus")
+    queries = bench_retrieval.generate_corpus(root, N_FILES, N_QUERIES)
+    return root / "sources", [q["query"] for q in queries]
+
+
+def source_texts(index: dict) -> List[str]:
+    """청크 본문을 저장소 없이 소스 구간에서 직접 계산 (rag_index._read_chunks의 소스 경로와 같은 방식)"""
+    out = []
+    for (path, start, end), crumb in zip(index["spans"], index["breadcrumbs"]):
+        data = Path(path).read_bytes()[start:end].decode("utf-8")
+        out.append(with_breadcrumb(crumb, chunk_text(data)))
+    return out
+
+
+class HashEmbedder:
+    """토큰 해시 bag-of-words 임베더 (SentenceTransformer.encode와 같은 호출 형태, 호출별 텍스트 수 기록)"""
+
+    def __init__(self):
+        self.calls: List[int] = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False):
+        import numpy as np
+        self.calls.append(len(texts))
+        vectors = np.zeros((len(texts), EMBED_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for tok in tokenize(text):
+                vectors[row, int(hashlib.sha1(tok.encode("utf-8")).hexdigest()[:8], 16) % EMBED_DIM] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    """dense.load_model(EMBED_MODEL)이 HashEmbedder를 돌려주도록 프로세스 모델 캐시에 등록"""
+    pytest.importorskip("numpy")
+    model = HashEmbedder()
+    monkeypatch.setitem(dense._models, EMBED_MODEL, model)
+    return model
@@ -0,0 +1,89 @@
+"""
+test_batch.py — 배치 검색 (retrieve_chunks.retrieve_batch, --queries-file)
+
+- 질문 파일: 한 줄 텍스트 / JSONL 혼합, 빈 줄 무시, top_k·id 유지
+- 배치 결과가 질문마다 따로 검색한 결과와 같은지 (순차 / 프로세스 풀 / sparse, BM25F, 위치 색인)
+- CLI가 질문 순서대로 JSONL 한 줄씩 출력하는지
+"""
+
+import json
+
+import pytest
+
+import bm25f
+import positional
+import retrieve_chunks
+from rag_index import get_combined_index, index_params, materialize, rank_unique, search_index
+from retrieve_chunks import load_queries, retrieve_batch
+
+
+def items(corpus) -> list:
+    return [{"query": q, "top_k": k} for q, k in zip(corpus[1], [3, 5, 8] * len(corpus[1]))]
+
+
+def expected(corpus, index_dir, top_ks, field_weights=None, use_positions=False) -> list:
+    """질문마다 따로 검색한 결과 [(source, chunk_idx, 반올림 점수), ...]"""
+    params = index_params(800, 100, 0.03, "*.md", True)
+    index = get_combined_index([corpus[0]], params, index_dir)
+    out = []
+    for item in top_ks:
+        if use_positions:
+            ranked = rank_unique(index, lambda d: positional.search(index, item["query"], d, "python"), item["top_k"])
+            results = materialize(index, ranked)
+        else:
+            results = search_index(dict(index), item["query"], item["top_k"], engine="python",
+                                   field_weights=field_weights)
+        out.append([(src, idx, round(score, 6)) for score, src, _, idx in results])
+    return out
+
+
+def summary(records: list) -> list:
+    return [[(r["source"], r["chunk_idx"], r["score"]) for r in record["results"]] for record in records]
+
+
+def test_load_queries(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text('첫 질문 fp8\n\n{"query": "두 번째", "top_k": 2, "id": "q2"}\n  세 번째  \n', encoding="utf-8")
+    assert load_queries(str(path), 5) == [
+        {"query": "첫 질문 fp8", "top_k": 5},
+        {"query": "두 번째", "top_k": 2, "id": "q2"},
+        {"query": "세 번째", "top_k": 5},
+    ]
+
+
+@pytest.mark.parametrize("engine, jobs", [("python", 1), ("python", 2), ("sparse", 1)])
+def test_batch_matches_single_queries(corpus, tmp_path, engine, jobs):
+    queries = items(corpus)
+    records = retrieve_batch(queries, str(corpus[0]), index_dir=str(tmp_path), engine=engine, jobs=jobs)
+    assert [r["query"] for r in records] == [q["query"] for q in queries]
+    assert all(r["total_chunks"] > 0 for r in records)
+    got = summary(records)
+    want = expected(corpus, tmp_path, queries)
+    for query, g, w in zip(queries, got, want):
+        assert [(s, i) for s, i, _ in g] == [(s, i) for s, i, _ in w], query
+        assert [x for *_, x in g] == pytest.approx([x for *_, x in w], abs=1e-6)
+
+
+def test_batch_bm25f_and_positional(corpus, tmp_path):
+    queries = items(corpus)
+    weights = bm25f.DEFAULT_WEIGHTS
+    records = retrieve_batch(queries, str(corpus[0]), index_dir=str(tmp_path), engine="python", jobs=1,
+                             field_weights=weights)
+    assert summary(records) == expected(corpus, tmp_path, queries, field_weights=weights)
+    records = retrieve_batch(queries, str(corpus[0]), index_dir=str(tmp_path), engine="python", use_positions=True)
+    assert summary(records) == expected(corpus, tmp_path, queries, use_positions=True)
+
+
+def test_cli_writes_jsonl(corpus, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "queries.jsonl"
+    path.write_text("\n".join(json.dumps({"query": q, "id": f"q{n}"}, ensure_ascii=False)
+                              for n, q in enumerate(corpus[1][:4])), encoding="utf-8")
+    argv = ["retrieve_chunks.py", "--queries-file", str(path), "--sources-dir", str(corpus[0]),
+            "--index-dir", str(tmp_path / "index"), "--top-k", "2", "--jobs", "1"]
+    monkeypatch.setattr("sys.argv", argv)
+    assert retrieve_chunks.main() == 0
+    lines = capsys.readouterr().out.strip().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["id"] for r in records] == ["q0", "q1", "q2", "q3"]
+    assert all(len(r["results"]) == 2 and r["top_k"] == 2 for r in records)
+    assert all({"rank", "source", "chunk_idx", "score", "duplicates", "text"} <= set(r["results"][0]) for r in records)
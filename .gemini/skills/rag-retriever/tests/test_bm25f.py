@@ -0,0 +1,107 @@
+"""
+test_bm25f.py — 필드 가중 BM25F (bm25f.py)
+
+- index_file()이 저장한 필드 빈도·길이(field_tf / field_len)가 제목 경로·frontmatter를 토큰화한 값과 같은지
+- 질문 하나의 구성 없는 채점(bm25f.topk — doc_tf 훑기 / 저장 게시 목록)이 build()한 가중 게시 목록
+  채점과 같은 점수·순위인지 (음수 IDF 토큰이 섞이면 build()로 대체)
+- sparse 엔진(bm25_sparse 행렬 곱)이 python 엔진과 같은 순위인지
+"""
+
+import pytest
+
+import bm25f
+import postings_store
+from chunking import frontmatter_fields, source_domain, tokenize
+from rag_index import get_combined_index, index_params, rank_many, scan_postings
+
+
+WEIGHTS = [
+    bm25f.DEFAULT_WEIGHTS,
+    {"title": 3.0, "heading": 2.0, "body": 1.0, "domain": 1.0},
+    {"title": 0.0, "heading": 1.5, "body": 0.5, "domain": 0.0},
+]
+
+
+def counts(text: str) -> dict:
+    tf: dict = {}
+    for tok in tokenize(text):
+        tf[tok] = tf.get(tok, 0) + 1
+    return tf
+
+
+@pytest.fixture(scope="module", params=["paragraph", "heading"])
+def index(request, corpus, tmp_path_factory):
+    params = index_params(800, 100, 0.03, "*.md", True, near_dup_bits=-1, chunker=request.param)
+    return get_combined_index([corpus[0]], params, tmp_path_factory.mktemp("index"))
+
+
+def queries(corpus) -> list:
+    # 라벨된 질문 + 그 질문의 드문 단어만 + 도메인에만 있는 단어 + 모든 제목·도메인에 있는 단어(음수 IDF)
+    rare = [" ".join(w for w in q.split() if w.startswith("needle")) for q in corpus[1]]
+    return corpus[1] + rare + ["site3", "site5 " + rare[0], "synthetic", "example com"]
+
+
+def reference(index: dict, weights: dict):
+    """build()한 가중 게시 목록으로 채점하는 함수 (비교 기준)"""
+    prepared = bm25f.build(dict(index), weights)
+    stats = {"postings": 0, "scored": 0, "total_postings": 0}
+    return lambda query, top_k: bm25f._topk_python(prepared, query, top_k, stats)
+
+
+def test_stored_fields_match_tokenized(index):
+    read = bm25f._field_reader(index)
+    for i, (path, _, _) in enumerate(index["spans"]):
+        fm = frontmatter_fields(open(path, encoding="utf-8").read())
+        title, head, domain, title_len, head_len, domain_len = read(i)
+        assert title == counts(fm.get("title", ""))
+        assert domain == counts(source_domain(fm.get("source_url", "")))
+        assert head == counts(index["breadcrumbs"][i])
+        assert (title_len, head_len, domain_len) == (sum(title.values()), sum(head.values()), sum(domain.values()))
+
+
+def field_df(index: dict) -> dict:
+    """build()의 df (어느 필드에든 토큰이 있는 청크 수)"""
+    return {tok: len(ids) for tok, (ids, _) in bm25f.build(dict(index), bm25f.DEFAULT_WEIGHTS)["postings"].items()}
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_single_query_matches_build(index, corpus, weights):
+    df = field_df(index)
+    want_of = reference(index, weights)
+    n_docs = len(index["doc_len"])
+    fast_count = 0
+    for query in queries(corpus):
+        stats = {"postings": 0, "scored": 0, "total_postings": 0}
+        fast = bm25f.topk(index, query, 10, weights, stats, scan_postings(index, set(tokenize(query))))
+        fresh = dict(index)
+        got = rank_many(fresh, [query], [10], engine="python", field_weights=weights)[0]
+        want = want_of(query, 10)
+        assert got == want, query
+        if any(df.get(q, 0) > n_docs / 2 for q in tokenize(query)):
+            assert fast is None and "bm25f" in fresh, query      # 음수 IDF → build()로 대체
+        else:
+            assert fast == want and "bm25f" not in fresh, query
+            fast_count += 1
+    assert fast_count > len(corpus[1])
+    assert "site3" in df and "site3" not in index["df"]     # 도메인에만 있는 토큰
+
+
+def test_single_query_from_postings_store(corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(postings_store, "POSTINGS_MIN_CHUNKS", 1)
+    monkeypatch.setattr(postings_store.open_stores, "__defaults__", (1,))
+    params = index_params(800, 100, 0.03, "*.md", True, near_dup_bits=-1, chunker="heading")
+    index = get_combined_index([corpus[0]], params, tmp_path / "index")
+    assert postings_store.open_stores(index) is not None
+    want_of = reference(index, bm25f.DEFAULT_WEIGHTS)
+    for query in queries(corpus):
+        got = rank_many(dict(index), [query], [10], engine="python", field_weights=bm25f.DEFAULT_WEIGHTS)[0]
+        assert got == want_of(query, 10), query
+
+
+def test_sparse_engine_matches_python(index, corpus):
+    qs = queries(corpus)
+    sparse = rank_many(dict(index), qs, [10] * len(qs), engine="sparse", field_weights=bm25f.DEFAULT_WEIGHTS)
+    python = rank_many(dict(index), qs, [10] * len(qs), engine="python", field_weights=bm25f.DEFAULT_WEIGHTS)
+    for query, got, want in zip(qs, sparse, python):
+        assert [i for _, i in got] == [i for _, i in want], query
+        assert [s for s, _ in got] == pytest.approx([s for s, _ in want]), query
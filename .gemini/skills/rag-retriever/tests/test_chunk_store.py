@@ -0,0 +1,70 @@
+"""
+test_chunk_store.py — 청크 본문 저장소 (chunk_store.py) / 저장 게시 목록의 검색 시 구조 (postings_store.py)
+
+- 저장소가 소스 구간과 같은 본문을 돌려주고, 소스가 바뀌면 새 청크 순서에 다시 맞춰지는지
+- 저장 게시 목록의 순서 번호 → 청크 id 표가 인덱스에 캐시되어 같은 인덱스의 다음 질문에서 재사용되는지
+"""
+
+import pytest
+
+import chunk_store
+import postings_store
+from conftest import source_texts
+from rag_index import _topk_scan, get_combined_index, index_params
+
+
+@pytest.fixture
+def sources(corpus, tmp_path):
+    """쓰기 가능한 코퍼스 사본"""
+    sources_dir = tmp_path / "sources"
+    sources_dir.mkdir()
+    for path in corpus[0].glob("*.md"):
+        (sources_dir / path.name).write_bytes(path.read_bytes())
+    return sources_dir
+
+
+@pytest.mark.parametrize("chunker", ["paragraph", "heading"])
+def test_chunk_store_round_trip_and_sync(sources, tmp_path, chunker):
+    params = index_params(800, 100, 0.03, "*.md", True, chunker=chunker)
+    index_dir = tmp_path / "index"
+
+    def check() -> dict:
+        index = get_combined_index([sources], params, index_dir)
+        ids = list(range(len(index["chunks"])))
+        stored = chunk_store.read_chunks(index, ids)
+        assert len(stored) == len(ids)
+        assert [stored[i] for i in ids] == source_texts(index)
+        return index
+
+    index = check()
+    # 최신이면 sync는 위치표 머리만 확인하고 아무것도 바꾸지 않음
+    part = index["parts"][0]
+    assert not chunk_store.sync(part["stored"], dict(part["stored"]["files"]), sources, params, index_dir)
+
+    # 수정·추가·삭제 후 다시 로드하면 저장소가 새 청크 순서에 맞춰짐
+    names = sorted(p.name for p in sources.glob("*.md"))
+    with open(sources / names[0], "a", encoding="utf-8") as f:
+        f.write("\n\n## 추가 절\n\nappended paragraph about fp8 tensor core 메모리 대역폭\n")
+    (sources / names[1]).unlink()
+    body = "brand new document body about nvlink partition 새로운 본문 문단입니다. " * 4
+    (sources / "zz_new.md").write_text(f"# 새 문서\n\n{body}\n", encoding="utf-8")
+    index = check()
+    assert any(p.endswith("zz_new.md") for p, _, _ in index["spans"])
+
+
+def test_postings_inverse_map_is_cached(sources, corpus, tmp_path):
+    params = index_params(800, 100, 0.03, "*.md", True, near_dup_bits=-1)
+    index_dir = tmp_path / "index"
+    index = get_combined_index([sources], params, index_dir)
+    postings_store.sync(index["parts"][0]["stored"], sources, params, index_dir)
+    stores = postings_store.open_stores(index, min_chunks=0)
+    assert stores is not None
+
+    inverse = postings_store.inverse_maps(index, stores)
+    stats = {"postings": 0, "scored": 0, "total_postings": 0}
+    for query in corpus[1]:
+        got = postings_store.topk(index, stores, query, 10, stats)
+        assert [i for _, i in got] == [i for _, i in _topk_scan(index, query, 10, dict(stats))], query
+        assert postings_store.inverse_maps(index, stores) is inverse
+    # 목차 필터로 빠진 청크는 -1, 나머지는 검색용 청크 id와 일대일
+    assert sorted(i for i in inverse[0] if i >= 0) == list(range(len(index["chunks"])))
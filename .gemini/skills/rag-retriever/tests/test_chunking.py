@@ -0,0 +1,170 @@
+"""
+test_chunking.py — 구간 기반 청크 분할과 파일 단위 증분 인덱싱 (chunking.iter_chunk_spans, rag_index.update_index)
+
+- iter_chunk_spans 구간의 본문이 이전 문자열 분할기(split_into_chunks 원본)와 같은지
+- 제목 청커: 제목 경로(ATX / Setext, 코드 블록 안 # 제외), 청크가 제목 경계를 넘지 않는지, 제목 경로가 색인되는지
+- 바뀐 파일을 읽을 수 없으면 (UTF-8 아님) 이전 레코드를 남기지 않고, 다시 읽을 수 있게 되면 복구되는지
+"""
+
+import random
+import re
+from typing import List
+
+from chunking import chunk_text, iter_chunk_spans, iter_heading_chunk_spans, iter_sections, split_into_chunks
+from rag_index import chunk_texts, get_index, index_params, search_index
+
+
+# ────────────────────────── 청크 분할 ──────────────────────────
+
+def reference_chunks(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """구간 기반으로 바꾸기 전의 문자열 분할기 (비교 기준)"""
+    text = re.sub(r'^---[\s\S]*?---\n', '', text, count=1).strip()
+    chunks: List[str] = []
+    current = ""
+    for para in re.split(r'\n{2,}', text):
+        para = para.strip()
+        if not para:
+            continue
+        if len(current) + len(para) + 2 <= chunk_size:
+            current = (current + "\n\n" + para).strip()
+        else:
+            if current:
+                chunks.append(current)
+            if len(para) > chunk_size:
+                for i in range(0, len(para), chunk_size - overlap):
+                    sub = para[i:i + chunk_size]
+                    if sub.strip():
+                        chunks.append(sub.strip())
+                current = ""
+            else:
+                current = para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def test_chunk_spans_match_reference_on_random_text():
+    rng = random.Random(3)
+    parts = ["\n", "\n\n", "\n\n\n", " \n\n ", "  ", "\t", "abc", "가나다라", "x" * 50, "word " * 40, "\n \n"]
+    for _ in range(3000):
+        text = "".join(rng.choice(parts) for _ in range(rng.randint(0, 60)))
+        if rng.random() < 0.3:
+            text = "---\ntitle: x\n---\n" + text
+        chunk_size, overlap = rng.choice([20, 50, 80, 200]), rng.choice([0, 5, 10])
+        spans = [chunk_text(text, s, e) for _, _, s, e in iter_chunk_spans(text, chunk_size, overlap)]
+        assert spans == reference_chunks(text, chunk_size, overlap), (text, chunk_size, overlap)
+        assert split_into_chunks(text, chunk_size, overlap) == spans
+
+
+def test_chunk_spans_match_reference_on_corpus(corpus):
+    sources_dir, _ = corpus
+    for path in sorted(sources_dir.glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        for chunk_size, overlap in ((800, 100), (300, 50)):
+            spans = iter_chunk_spans(text, chunk_size, overlap, path.name)
+            assert [chunk_text(text, s, e) for _, _, s, e in spans] == reference_chunks(text, chunk_size, overlap)
+
+
+# ────────────────────────── 제목 청커 ──────────────────────────
+
+HEADED = """---
+title: doc
+---
+앞 문단.
+
+# 개요
+
+개요 본문.
+
+```python
+# 코드 주석은 제목 아님
+```
+
+## 구조
+
+구조 본문.
+
+### MIG
+
+MIG 본문.
+
+## 메모리
+
+메모리 본문.
+
+Setext 제목
+===========
+
+마지막 본문.
+"""
+
+
+def test_sections_breadcrumbs():
+    sections = [(crumb, HEADED[s:e].strip()) for crumb, s, e in iter_sections(HEADED)]
+    assert [c for c, _ in sections] == ["", "개요", "개요 > 구조", "개요 > 구조 > MIG", "개요 > 메모리", "Setext 제목"]
+    assert sections[0][1] == "앞 문단."
+    assert "# 코드 주석은 제목 아님" in sections[1][1]
+    assert sections[-1][1] == "마지막 본문."
+
+
+def test_heading_chunks_stay_inside_sections():
+    bounds = [(s, e) for _, s, e in iter_sections(HEADED)]
+    for chunk_size, overlap in ((800, 100), (20, 5)):
+        spans = list(iter_heading_chunk_spans(HEADED, chunk_size, overlap))
+        assert [idx for _, idx, _, _ in spans] == list(range(len(spans)))
+        for crumb, _, s, e in spans:
+            assert any(lo <= s <= e <= hi for lo, hi in bounds), (crumb, HEADED[s:e])
+    # 제목이 없으면 문단 청커와 같음
+    text = "첫 문단.\n\n둘째 문단입니다.\n\n" + "word " * 100
+    assert [(s, e) for _, _, s, e in iter_heading_chunk_spans(text, 80, 10)] == \
+           [(s, e) for _, _, s, e in iter_chunk_spans(text, 80, 10)]
+
+
+def test_heading_index_stores_sections(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    body = " ".join(f"sentence {n} about tensor scheduling." for n in range(12))
+    (sources / "a.md").write_text(f"# Hopper\n\n## Memory\n\n{body}\n\n## Interconnect\n\n{body}\n", encoding="utf-8")
+    (sources / "b.md").write_text(f"# Ampere\n\n{body}\n", encoding="utf-8")
+    params = index_params(800, 100, 0.03, "*.md", True, chunker="heading")
+    index = get_index(sources, params, tmp_path / "index")
+
+    record = index["files"]["a.md"]
+    assert record["sections"] == ["Hopper > Memory", "Hopper > Interconnect"]
+    assert [c[8] for c in record["chunks"]] == [0, 1]
+    texts = chunk_texts(index, list(range(len(index["chunks"]))))
+    for i, crumb in enumerate(index["breadcrumbs"]):
+        assert texts[i].startswith(f"§ {crumb}\n\n")
+    # 본문에 없는 제목 단어로도 검색됨
+    results = search_index(index, "interconnect", 1)
+    assert results[0][1] == "a.md" and results[0][2].startswith("§ Hopper > Interconnect\n\n")
+
+
+# ────────────────────────── 증분 인덱싱 ──────────────────────────
+
+def test_unreadable_changed_file_drops_stale_record(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    body = " ".join(f"hopper nvlink sentence {n} about memory bandwidth." for n in range(20))
+    (sources / "a.md").write_text(f"# A\n\n{body}\n", encoding="utf-8")
+    (sources / "b.md").write_text(f"# B\n\n{body} 추가 문단 fp8 transformer engine.\n", encoding="utf-8")
+    params = index_params(800, 100, 0.03, "*.md", True)
+    index_dir = tmp_path / "index"
+    assert "b.md" in get_index(sources, params, index_dir)["files"]
+
+    # b.md가 UTF-8이 아닌 내용으로 바뀜 → 이전 구간·df 기여분이 남으면 안 됨
+    (sources / "b.md").write_bytes(b"\xff\xfe broken \x80 bytes" * 10)
+    stats: dict = {}
+    index = get_index(sources, params, index_dir, stats_out=stats)
+    assert stats["removed"] == ["b.md"]
+    assert "b.md" not in index["files"]
+    assert {src for src, _ in index["chunks"]} == {"a.md"}
+    assert "fp8" not in index["df"]
+    assert all(src == "a.md" for _, src, _, _ in search_index(index, "hopper fp8", 5))
+
+    # 다시 읽을 수 있게 되면 추가로 복구
+    (sources / "b.md").write_text(f"# B\n\n{body} 추가 문단 fp8 transformer engine.\n", encoding="utf-8")
+    stats = {}
+    index = get_index(sources, params, index_dir, stats_out=stats)
+    assert stats["added"] == ["b.md"]
+    assert index["df"]["fp8"] == 1
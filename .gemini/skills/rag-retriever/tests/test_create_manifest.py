@@ -0,0 +1,74 @@
+"""
+test_create_manifest.py — manifest 생성과 인덱스 증분 갱신 통계 (create_manifest.py, rag_index.update_index)
+
+- 첫 실행은 모든 파일을 추가로, 재실행은 추가·변경·삭제·유지 파일 수를 정확히 보고하는지
+  (mtime만 바뀐 파일은 sha256이 같아 유지)
+- manifest의 파일별 청크·토큰 수 합계가 인덱스와 같은지
+- --show-stats가 빈 소스 파일만 있는 디렉토리(전체 소스 0자)에서도 실패하지 않는지
+"""
+
+import json
+import os
+
+import create_manifest
+import retrieve_chunks
+from rag_index import get_index, index_params
+
+
+def write_sources(sources, names):
+    for name in names:
+        body = " ".join(f"{name} paragraph {n} about tensor core scheduling." for n in range(30))
+        (sources / f"{name}.md").write_text(f"# {name}\n\n{body}\n", encoding="utf-8")
+
+
+def run_manifest(monkeypatch, capsys, sources, out_dir) -> tuple:
+    argv = ["create_manifest.py", "--topic", "테스트 토픽", "--sources-dir", str(sources),
+            "--output-dir", str(out_dir), "--vault-path", str(sources.parent), "--jobs", "1"]
+    monkeypatch.setattr("sys.argv", argv)
+    assert create_manifest.main() == 0
+    out = capsys.readouterr().out
+    line = next(l for l in out.splitlines() if "index" in l and "추가" in l)
+    return json.loads((out_dir / "manifest.json").read_text(encoding="utf-8")), line
+
+
+def test_incremental_stats(tmp_path, monkeypatch, capsys):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    write_sources(sources, ["a", "b", "c", "d"])
+    out_dir = tmp_path / "rag"
+
+    manifest, line = run_manifest(monkeypatch, capsys, sources, out_dir)
+    assert "추가 4 / 변경 0 / 삭제 0 / 유지 0" in line
+    assert manifest["file_count"] == 4
+
+    # a 내용 변경, b 삭제, c는 mtime만 변경, e 추가, d 그대로
+    (sources / "a.md").write_text("# a\n\n완전히 새로운 본문입니다. fp8 transformer engine.\n", encoding="utf-8")
+    (sources / "b.md").unlink()
+    st = (sources / "c.md").stat()
+    os.utime(sources / "c.md", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    write_sources(sources, ["e"])
+
+    manifest, line = run_manifest(monkeypatch, capsys, sources, out_dir)
+    assert "추가 1 / 변경 1 / 삭제 1 / 유지 2" in line
+    assert [f["name"] for f in manifest["files"]] == ["a.md", "c.md", "d.md", "e.md"]
+
+    params = index_params(800, 100, 0.03, "*.md", True)
+    index = get_index(sources, params)
+    assert manifest["chunk_count"] == len(index["chunks"])
+    assert manifest["token_count"] == index["total_len"]
+
+    # 세 번째 실행: 바뀐 것 없음
+    _, line = run_manifest(monkeypatch, capsys, sources, out_dir)
+    assert "추가 0 / 변경 0 / 삭제 0 / 유지 4" in line
+
+
+def test_show_stats_on_empty_sources(tmp_path, monkeypatch, capsys):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    (sources / "empty.md").write_text("", encoding="utf-8")
+    argv = ["retrieve_chunks.py", "--query", "anything", "--sources-dir", str(sources), "--show-stats", "--no-cache"]
+    monkeypatch.setattr("sys.argv", argv)
+    assert retrieve_chunks.main() == 0
+    err = capsys.readouterr().err
+    assert "전체 소스: 0자" in err
+    assert "절감률" not in err
@@ -0,0 +1,96 @@
+"""
+test_dense.py — BM25 + 임베딩 하이브리드 검색 (dense.py, --hybrid)
+
+- RRF 융합 점수·순서 (동점은 chunk_id 오름차순)
+- 하이브리드 결과가 BM25 채널과 전수 코사인 채널을 따로 계산해 RRF로 합친 결과와 같은지
+  (임베딩 캐시 행이 검색용 청크 id에 맞게 정렬되는지)
+- 임베딩 캐시: 재로드 시 다시 임베딩하지 않고, 소스가 바뀌면 새 청크만 임베딩하며 사라진 청크는 정리
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import dense  # noqa: E402
+from conftest import EMBED_MODEL  # noqa: E402
+from rag_index import chunk_hash, chunk_texts, get_combined_index, index_params, rank_many  # noqa: E402
+
+
+PARAMS = index_params(800, 100, 0.03, "*.md", True, near_dup_bits=-1)
+
+
+@pytest.fixture
+def sources(corpus, tmp_path):
+    """쓰기 가능한 코퍼스 사본"""
+    sources_dir = tmp_path / "sources"
+    sources_dir.mkdir()
+    for path in corpus[0].glob("*.md"):
+        (sources_dir / path.name).write_bytes(path.read_bytes())
+    return sources_dir
+
+
+def test_rrf_fuse():
+    fused = dense.rrf_fuse([[(0.9, 1), (0.8, 2), (0.7, 3)], [(0.5, 3), (0.4, 1), (0.3, 4)]], 3, rrf_k=60)
+    assert [i for _, i in fused] == [1, 3, 2]
+    assert fused[0][0] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[2][0] == pytest.approx(1 / 62)
+    # 동점이면 chunk_id 오름차순
+    assert [i for _, i in dense.rrf_fuse([[(1.0, 7)], [(1.0, 5)]], 2)] == [5, 7]
+
+
+def test_hybrid_matches_independent_channels(corpus, sources, tmp_path, embedder):
+    index = get_combined_index([sources], PARAMS, tmp_path / "index")
+    queries = corpus[1]
+    results = dense.hybrid_search_many(index, queries, [5] * len(queries), EMBED_MODEL, "python")
+
+    ids = list(range(len(index["chunks"])))
+    texts = chunk_texts(index, ids)
+    matrix = embedder.encode([texts[i] for i in ids]).astype(np.float16).astype(np.float32)
+    depth = max(dense.FUSE_DEPTH, 5 * 5)
+    bm25 = rank_many(dict(index), queries, [depth] * len(queries), engine="python")
+    for query, got, lexical in zip(queries, results, bm25):
+        scores = matrix @ embedder.encode([query])[0]
+        semantic = sorted(((float(scores[i]), i) for i in ids), key=lambda x: (-x[0], x[1]))[:depth]
+        want = dense.rrf_fuse([[(s, i) for s, i in lexical if s > 0], semantic], 5)
+        assert [(index["chunks"][i][0], index["chunks"][i][1]) for _, i in want] == \
+               [(src, idx) for _, src, _, idx in got], query
+        assert [s for s, _ in want] == pytest.approx([s for s, *_ in got])
+
+
+def test_embedding_cache_reuse_and_prune(sources, tmp_path, embedder):
+    index_dir = tmp_path / "index"
+
+    def embeddings():
+        index = get_combined_index([sources], PARAMS, index_dir)
+        before = sum(embedder.calls)
+        matrix = dense.chunk_embeddings(index, EMBED_MODEL)
+        assert matrix.shape == (len(index["chunks"]), 64)
+        return index, matrix, sum(embedder.calls) - before
+
+    index, first, encoded = embeddings()
+    assert encoded == len(set(index["hashes"]))
+
+    # 다시 로드: 캐시에서 그대로
+    _, again, encoded = embeddings()
+    assert encoded == 0
+    assert np.array_equal(first, again)
+
+    # 파일 하나 수정 + 하나 삭제 → 새 청크만 임베딩, 캐시는 저장 인덱스에 남은 청크만 유지
+    names = sorted(p.name for p in sources.glob("*.md"))
+    with open(sources / names[0], "a", encoding="utf-8") as f:
+        f.write("\n\n## 추가 절\n\nappended paragraph about nvlink partition 메모리 대역폭 측정\n")
+    (sources / names[1]).unlink()
+    old = set(index["hashes"])
+    index, matrix, encoded = embeddings()
+    assert 0 < encoded == len(set(index["hashes"]) - old)
+
+    part = index["parts"][0]
+    hashes, _ = dense.load_cache(dense.cache_path(index, part, EMBED_MODEL))
+    live = {c[6] for record in part["stored"]["files"].values() for c in record["chunks"]}
+    # 목차 청크는 저장 인덱스에는 있지만 검색 대상이 아니므로 임베딩되지 않음
+    assert set(index["hashes"]) <= set(hashes) <= live
+    assert len(hashes) == len(set(hashes))
+    texts = chunk_texts(index, [0])
+    assert index["hashes"][0] == chunk_hash(texts[0])
+    assert matrix[0] == pytest.approx(embedder.encode([texts[0]])[0], abs=1e-3)
+
@@ -0,0 +1,67 @@
+"""
+test_engines.py — BM25 엔진 동등성 (rag_index MaxScore / _topk_scan, bm25_sparse, postings_store)
+
+근접 중복 통합을 끈(--near-dup-bits -1) 순위·점수가 엔진(python / sparse / auto)·저장 게시 목록과 무관하게
+rank_bm25.BM25Okapi로 모든 청크를 채점한 결과와 같은지. 질문 하나(CLI 1회 실행 경로)와
+여러 질문 한 번에(배치·서버 경로) 모두 확인.
+
+rank_bm25·numpy·scipy는 테스트 의존성 (requirements-test.txt) — 없으면 건너뛰지 않고 실패.
+"""
+
+import pytest
+import rank_bm25
+
+import postings_store
+from chunking import tokenize
+from conftest import source_texts
+from rag_index import get_combined_index, index_params, rank_many
+
+
+TOP_KS = (1, 5, 20)
+
+
+@pytest.fixture(scope="module")
+def baseline_index(corpus, tmp_path_factory):
+    """근접 중복 통합을 끈 인덱스 + BM25Okapi 기준 순위 {(질문, top_k): [(score, chunk_id), ...]}"""
+    sources_dir, queries = corpus
+    params = index_params(800, 100, 0.03, "*.md", True, near_dup_bits=-1)
+    index_dir = tmp_path_factory.mktemp("index")
+    index = get_combined_index([sources_dir], params, index_dir)
+    bm25 = rank_bm25.BM25Okapi([tokenize(t) for t in source_texts(index)])
+    expected = {}
+    for query in queries:
+        ranked = sorted(enumerate(bm25.get_scores(tokenize(query))), key=lambda x: -x[1])
+        for k in TOP_KS:
+            expected[query, k] = [(float(s), i) for i, s in ranked[:k] if s > 0]
+    return sources_dir, params, index_dir, queries, expected
+
+
+@pytest.mark.parametrize("engine", ["python", "sparse", "auto"])
+def test_ranking_matches_bm25okapi(baseline_index, engine):
+    sources_dir, params, index_dir, queries, expected = baseline_index
+    # 질문 하나씩 (CLI 1회 실행 경로) / 여러 질문 한 번에 (배치·서버 경로), 인덱스는 매번 새로 로드
+    for query in queries:
+        for k in TOP_KS:
+            index = get_combined_index([sources_dir], params, index_dir)
+            got = [(s, i) for s, i in rank_many(index, [query], [k], engine=engine)[0] if s > 0]
+            want = expected[query, k]
+            assert [i for _, i in got] == [i for _, i in want], (query, k)
+            assert [s for s, _ in got] == pytest.approx([s for s, _ in want], rel=1e-12)
+    index = get_combined_index([sources_dir], params, index_dir)
+    batch = rank_many(index, queries, [TOP_KS[-1]] * len(queries), engine=engine)
+    for query, ranked in zip(queries, batch):
+        assert [i for s, i in ranked if s > 0] == [i for _, i in expected[query, TOP_KS[-1]]], query
+
+
+def test_stored_postings_match_bm25okapi(baseline_index):
+    sources_dir, params, index_dir, queries, expected = baseline_index
+    index = get_combined_index([sources_dir], params, index_dir)
+    part = index["parts"][0]
+    postings_store.sync(part["stored"], sources_dir, params, index_dir)
+    stats = {"postings": 0, "scored": 0, "total_postings": 0}
+    for query in queries:
+        stores = postings_store.open_stores(index, min_chunks=0)
+        assert stores is not None
+        for k in TOP_KS:
+            got = postings_store.topk(index, stores, query, k, stats)
+            assert [i for s, i in got if s > 0] == [i for _, i in expected[query, k]], (query, k)
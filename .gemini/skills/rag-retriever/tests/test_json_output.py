@@ -0,0 +1,82 @@
+"""
+test_json_output.py — 구조화 출력 (retrieve_chunks.format_json, --format json)
+
+- 결과별 (path, start, end) 문자 구간의 소스 본문 = 결과 청크 본문 (제목 경로 줄 제외), 목차 통계 = 청크 본문 통계
+- 점수·순위 = search_index 결과, 정규화 점수는 1위 대비, 목차 필터 통계·전체 청크 수
+- 신뢰도 지표 (빈 결과, 결과 하나, BM25 척도가 아닌 점수)
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from chunking import chunk_text, toc_stats
+from rag_index import get_combined_index, index_params, search_index
+from retrieve_chunks import confidence, retrieve
+
+
+@pytest.fixture
+def sources(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    body = " ".join(f"Sentence {n} on hopper tensor core fp8 scheduling." for n in range(40))
+    for n in range(5):
+        (sources / f"doc{n}.md").write_text(
+            f"---\ntitle: doc {n}\n---\n# 문서 {n}\n\n## 세부\n\n{body} marker{n} 고유어\n", encoding="utf-8")
+    links = "\n".join(f"- [link {n}](https://example.com/{n})" for n in range(30))
+    (sources / "toc.md").write_text(f"# 목차\n\n{links}\n", encoding="utf-8")
+    return sources
+
+
+@pytest.mark.parametrize("chunker", ["paragraph", "heading"])
+def test_offsets_scores_and_stats(sources, tmp_path, chunker):
+    query = "hopper fp8 marker3"
+    out = json.loads(retrieve(query, str(sources), top_k=4, index_dir=str(tmp_path / "index"), use_cache=False,
+                              chunker=chunker, output_format="json"))
+    params = index_params(800, 100, 0.03, "*.md", True, chunker=chunker)
+    index = get_combined_index([sources], params, tmp_path / "index")
+    expected = search_index(index, query, 4)
+
+    assert out["query"] == query and out["top_k"] == 4
+    assert out["total_chunks"] == len(index["chunks"])
+    assert out["returned"] == len(out["results"]) == len(expected)
+    assert out["toc_filter"] == {"filtered": index["filtered_count"], "max_link_ratio": 0.03}
+    assert out["toc_filter"]["filtered"] > 0
+    assert out["search"]["score_type"] == "bm25"
+
+    top = expected[0][0]
+    for rank, (r, (score, src, text, idx)) in enumerate(zip(out["results"], expected), 1):
+        assert (r["rank"], r["source"], r["chunk_idx"], r["text"]) == (rank, src, idx, text)
+        assert r["score"] == round(score, 6)
+        assert r["normalized_score"] == round(score / top, 4)
+        content = Path(r["path"]).read_text(encoding="utf-8")
+        body = chunk_text(content, r["start"], r["end"])
+        if r["section"]:
+            assert chunker == "heading"
+            assert text == f"§ {r['section']}\n\n{body}"
+        else:
+            assert text == body
+        link_count, text_len, chunk_len = toc_stats(body)
+        assert r["toc"] == {"link_count": link_count, "text_len": text_len, "chunk_len": chunk_len,
+                            "link_ratio": round(link_count / (chunk_len / 100), 4)}
+    assert out["results"][0]["normalized_score"] == 1.0
+    assert out["results"][0]["source"] == "doc3.md"
+    assert out["confidence"]["max_score"] == round(top, 6)
+
+
+def test_confidence():
+    empty = confidence([])
+    assert empty["percent"] == 0 and empty["max_score"] == 0.0
+    assert confidence([], graded=False)["badge"] is None
+
+    one = confidence([4.0])
+    assert one["top_gap"] == 4.0 and one["top_gap_ratio"] == 1.0 and one["avg_top3"] == 4.0
+
+    many = confidence([2.0, 8.0, 6.0, 4.0])
+    assert many["max_score"] == 8.0 and many["mean_score"] == 5.0 and many["avg_top3"] == 6.0
+    assert many["top_gap"] == 2.0 and many["top_gap_ratio"] == 0.25
+    assert many["percent"] is not None and many["badge"]
+
+    rrf = confidence([0.03, 0.01], graded=False)
+    assert rrf["percent"] is None and rrf["badge"] is None and rrf["max_score"] == 0.03
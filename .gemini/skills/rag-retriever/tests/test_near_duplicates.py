@@ -0,0 +1,90 @@
+"""
+test_near_duplicates.py — 근접 중복 통합 (rag_index.collapse / simhash.collapse_ranked)
+
+- 코퍼스에서는 아무것도 빼지 않아 점수·IDF가 --near-dup-bits -1과 같은지
+- 그룹에서 점수가 가장 높은 청크가 대표로 남고 (파일 순서와 무관), 나머지는 duplicates에 기록되는지
+- 합쳐진 자리를 다음 순위 청크가 채워 top_k개가 유지되는지
+"""
+
+import json
+
+import pytest
+
+from rag_index import get_combined_index, index_params, rank_many, search_index
+from retrieve_chunks import retrieve
+from simhash import MIN_TOKENS, collapse_ranked
+
+
+BODY = ("hopper tensor core fp8 transformer engine 메모리 대역폭 nvlink 스위치 파티션 "
+        "sm 클러스터 warp 스케줄러 l2 캐시 hbm3 스택 mig 인스턴스 격리 보안 ")
+
+
+@pytest.fixture
+def mirrored(tmp_path):
+    """a_original.md와 그 미러(z_mirror.md, 같은 토큰 집합 + 질문 단어 반복) + 무관한 문서들"""
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    (sources / "a_original.md").write_text(f"# 원본\n\n{BODY} needle needle\n", encoding="utf-8")
+    # 토큰 집합이 같아 SimHash가 같지만 needle tf가 높아 점수는 미러가 더 높음
+    (sources / "z_mirror.md").write_text(f"# 원본\n\n{BODY} needle needle needle needle\n", encoding="utf-8")
+    for n in range(8):
+        words = " ".join(f"topic{n}w{j}" for j in range(120))   # 길어서 미러 쌍보다 낮은 점수
+        (sources / f"m_other{n}.md").write_text(f"# 문서 {n}\n\n{words}\n", encoding="utf-8")
+    return sources
+
+
+# 미러 쌍 + 무관한 문서마다 한 단어씩 (무관한 문서가 빈자리를 채움)
+QUERY = "needle " + " ".join(f"topic{n}w0" for n in range(8))
+
+
+def params(bits: int) -> dict:
+    return index_params(800, 100, 0.03, "*.md", True, near_dup_bits=bits)
+
+
+def test_highest_scoring_member_is_kept(mirrored, tmp_path):
+    on = get_combined_index([mirrored], params(3), tmp_path / "index")
+    off = get_combined_index([mirrored], params(-1), tmp_path / "index")
+    assert len(on["chunks"]) == len(off["chunks"])          # 코퍼스에서 빠지지 않음
+    assert on["df"] == off["df"]
+
+    dups: dict = {}
+    got = search_index(on, QUERY, 5, dups_out=dups)
+    want = search_index(off, QUERY, 6)
+    sources = [src for _, src, _, _ in got]
+    assert "z_mirror.md" in sources and "a_original.md" not in sources
+    assert dups == {("z_mirror.md", 0): [("a_original.md", 0)]}
+    # 점수는 통합을 끈 순위와 같고, 빠진 자리는 다음 순위가 채움
+    assert [(s, src) for s, src, _, _ in got] == [(s, src) for s, src, _, _ in want if src != "a_original.md"][:5]
+
+
+def test_collapse_off_keeps_raw_ranking(mirrored, tmp_path):
+    off = get_combined_index([mirrored], params(-1), tmp_path / "index")
+    dups: dict = {}
+    got = search_index(off, QUERY, 10, dups_out=dups)
+    raw = [(s, i) for s, i in rank_many(off, [QUERY], [10])[0] if s > 0]
+    assert dups == {}
+    assert [s for s, *_ in got] == [s for s, _ in raw]
+
+
+def test_collapse_ranked_groups_by_score_order():
+    sigs = [0b0, 0b1, 0b111111, 0b0]
+    lengths = [MIN_TOKENS] * 3 + [MIN_TOKENS - 1]
+    kept, groups = collapse_ranked([1, 0, 2, 3], sigs, lengths, max_bits=3)
+    assert kept == [1, 2, 3]                  # 짧은 청크(3)는 합치지 않음
+    assert groups == {1: [0]}
+    kept, _ = collapse_ranked([1, 0, 2, 3], sigs, lengths, max_bits=3, limit=1)
+    assert kept == [1]
+
+
+def test_outputs_report_merged_sources(mirrored, tmp_path):
+    stats: dict = {}
+    out = json.loads(retrieve(QUERY, str(mirrored), top_k=3, index_dir=str(tmp_path / "index"),
+                              use_cache=False, output_format="json", stats_out=stats))
+    assert out["near_duplicates"] == 1 == stats["near_duplicates"]
+    merged = {r["source"]: r["duplicates"] for r in out["results"]}
+    assert merged["z_mirror.md"] == [{"source": "a_original.md", "chunk_idx": 0}]
+    assert len(out["results"]) == 3
+
+    text = retrieve(QUERY, str(mirrored), top_k=3, index_dir=str(tmp_path / "index"), use_cache=False)
+    assert "(동일 내용: a_original.md #0)" in text
+    assert "# (근접 중복 청크 1개를 대표 청크 1개에 통합)" in text
@@ -0,0 +1,61 @@
+"""
+test_packing.py — 토큰 예산 채우기 (packing.py, --max-tokens)
+
+- 거의 같은 청크는 버리고, 비슷한 청크보다 새로운 내용의 청크를 먼저 고르며(MMR), 예산을 넘지 않는지
+- 선택 결과가 점수 순이고 통계(후보·중복·예산 초과·토큰 수)가 맞는지
+- retrieve(max_tokens=...)가 top_k보다 많이 고를 수 있고 JSON "packing"에 beyond_top_k를 기록하는지
+"""
+
+import json
+
+import packing
+from retrieve_chunks import retrieve
+
+
+def words(prefix: str, n: int, start: int = 0) -> str:
+    return " ".join(f"{prefix}{m}" for m in range(start, start + n))
+
+
+def test_mmr_prefers_novel_chunk_and_drops_duplicates():
+    a = words("alpha", 10)
+    similar = words("alpha", 7) + " " + words("other", 3)   # a와 포함도 0.7 (중복 임계값 미만)
+    novel = words("beta", 10)
+    results = [
+        (10.0, "a.md", a, 0),
+        (9.9, "copy.md", a, 0),        # a와 같은 본문 → 중복
+        (9.5, "a.md", similar, 1),
+        (9.0, "b.md", novel, 0),
+    ]
+    budget = packing.estimate_tokens(a) + packing.estimate_tokens(novel)
+    selected, info = packing.pack(results, budget)
+    assert [(r[1], r[3]) for r in selected] == [("a.md", 0), ("b.md", 0)]
+    assert info == {"candidates": 4, "duplicates": 1, "over_budget": 1, "tokens": budget}
+
+    # 예산이 넉넉하면 비슷한 청크도 들어가고, 결과는 점수 순
+    selected, info = packing.pack(results, 10 * budget)
+    assert [r[0] for r in selected] == [10.0, 9.5, 9.0]
+    assert info["duplicates"] == 1 and info["over_budget"] == 0
+    assert info["tokens"] == sum(packing.estimate_tokens(r[2]) for r in selected)
+
+
+def test_pack_respects_budget():
+    results = [(float(100 - n), f"{n}.md", words(f"w{n}x", 5 + n), 0) for n in range(30)]
+    for budget in (0, 7, 50, 200):
+        selected, info = packing.pack(results, budget)
+        assert info["tokens"] == sum(packing.estimate_tokens(r[2]) for r in selected) <= budget
+        assert [r[0] for r in selected] == sorted((r[0] for r in selected), reverse=True)
+    assert packing.pack([], 100) == ([], {"candidates": 0, "duplicates": 0, "over_budget": 0, "tokens": 0})
+
+
+def test_retrieve_budget_mode(corpus, tmp_path):
+    query = corpus[1][0]
+    out = json.loads(retrieve(query, str(corpus[0]), top_k=2, index_dir=str(tmp_path), use_cache=False,
+                              max_tokens=2000, output_format="json"))
+    results = out["results"]
+    info = out["search"]["packing"]
+    assert info["max_tokens"] == 2000 and info["top_k"] == 2
+    assert len(results) > 2
+    assert info["beyond_top_k"] == len(results) - 2
+    assert info["tokens"] <= 2000
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,96 @@
+"""
+test_positional.py — 따옴표 구절 일치 / 근접도 가중 (positional.py, --positional)
+
+- 질문 파싱, 한글 어절의 2-gram이 같은 위치에 놓이는지
+- 구절 단어가 연달아 나오는 청크만 남고, 같은 BM25 점수면 질문 단어가 가까운 청크가 앞서는지
+- 후보 수를 늘려 가는 구절 검색 = 점수 > 0인 모든 청크를 다시 채점한 결과
+- 위치 캐시: 재로드 시 다시 계산하지 않고, 바뀐 청크만 계산
+"""
+
+import random
+
+import pytest
+
+import positional
+from rag_index import chunk_texts, get_combined_index, index_from_chunks, index_params
+
+
+def test_parse_query_and_positions():
+    text, phrases = positional.parse_query('"Tensor Core" FP8 "single" "메모리 대역폭"')
+    assert phrases == [["tensor", "core"], ["메모리", "대역폭"]]
+    assert '"' not in text
+    assert positional.token_positions("메모리 대역폭 fp8 메모리") == {
+        "메모": [0, 3], "모리": [0, 3], "대역": [1], "역폭": [1], "fp8": [2],
+    }
+    assert positional.decode(positional.encode([3, 7, 8, 20])) == [3, 7, 8, 20]
+
+
+def test_phrase_filter_and_proximity():
+    filler = " ".join(f"filler{n}" for n in range(30))
+    index = index_from_chunks([
+        ("far.md", f"tensor {filler} core 메모리 {filler} 대역폭", 0),
+        ("near.md", f"core tensor {filler} 메모리 대역폭 {filler}", 0),
+        ("phrase.md", f"{filler} tensor core {filler} 대역폭 메모리", 0),
+    ] + [(f"other{n}.md", f"unrelated document {n} about scheduling", 0) for n in range(8)])
+    hits = positional.search(index, '"tensor core"', 5, "python")
+    assert [index["chunks"][i][0] for _, i in hits] == ["phrase.md"]
+    hits = positional.search(index, '"메모리 대역폭"', 5, "python")
+    assert [index["chunks"][i][0] for _, i in hits] == ["near.md"]
+
+    # 세 청크의 BM25 점수는 같고, 이웃한 질문 단어가 가까울수록 높음
+    stats: dict = {}
+    hits = positional.search(index, "tensor core", 5, "python", stats_out=stats)
+    assert [index["chunks"][i][0] for _, i in hits] == ["near.md", "phrase.md", "far.md"]
+    w = positional.PROXIMITY_WEIGHT
+    assert hits[0][0] / hits[2][0] == pytest.approx((1 + w) / (1 + w / 31 ** 2))   # 거리 1 대 31
+    assert stats["phrases"] == 0
+
+
+def test_phrase_growth_matches_full_rescoring(corpus, tmp_path, monkeypatch):
+    params = index_params(800, 100, 0.03, "*.md", True)
+    index = get_combined_index([corpus[0]], params, tmp_path)
+    texts = chunk_texts(index, list(range(len(index["chunks"]))))
+    rng = random.Random(5)
+    queries = []
+    for i in rng.sample(range(len(texts)), 8):
+        words = positional.WORD_RE.findall(texts[i].lower())
+        at = rng.randrange(len(words) - 2)
+        queries.append(f'"{words[at]} {words[at + 1]}" {words[at + 2]} {rng.choice(corpus[1])}')
+
+    def run(pool_min: int) -> list:
+        monkeypatch.setattr(positional, "POOL_MIN", pool_min)
+        return [positional.search(index, q, 5, "python") for q in queries]
+
+    full = run(10 ** 6)
+    assert all(full)
+    monkeypatch.setattr(positional, "PHRASE_GROWTH", 2)
+    assert run(1) == full
+
+
+def test_position_cache(corpus, tmp_path, capsys):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for path in corpus[0].glob("*.md"):
+        (sources / path.name).write_bytes(path.read_bytes())
+    params = index_params(800, 100, 0.03, "*.md", True)
+
+    def load() -> tuple:
+        index = get_combined_index([sources], params, tmp_path / "index")
+        positional.chunk_positions(index)
+        return index, capsys.readouterr().err
+
+    first, err = load()
+    assert f"위치 색인 생성: {len(set(first['hashes']))}개 청크 (캐시 0개)" in err
+    again, err = load()
+    assert "위치 색인 생성" not in err
+    assert again["positional"] == first["positional"]
+
+    name = sorted(p.name for p in sources.glob("*.md"))[0]
+    with open(sources / name, "a", encoding="utf-8") as f:
+        f.write("\n\nappended paragraph about nvlink partition 메모리 대역폭\n")
+    index, err = load()
+    new = len(set(index["hashes"]) - set(first["hashes"]))
+    assert f"위치 색인 생성: {new}개 청크" in err
+    texts = chunk_texts(index, list(range(len(index["chunks"]))))
+    fresh = index_from_chunks([(src, texts[i], idx) for i, (src, idx) in enumerate(index["chunks"])])
+    assert positional.chunk_positions(fresh) == index["positional"]
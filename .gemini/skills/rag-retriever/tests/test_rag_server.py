@@ -0,0 +1,136 @@
+"""
+test_rag_server.py — 상주 서버 (rag_server.py) / 클라이언트 (retrieve_via_server)
+
+- 서버 응답이 같은 옵션의 로컬 retrieve()와 같은지 (검색 설정 조합을 동시에 보내도)
+- 한 토픽을 처음 로드하는 동안 다른 토픽 요청이 기다리지 않는지 (전역 락은 LRU 관리만)
+- Host / Content-Type / index_dir 거부, 거부(4xx) 시 클라이언트가 로컬 검색으로 대체하는지
+"""
+
+import json
+import shutil
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import rag_server
+import retrieve_chunks
+from retrieve_chunks import ServerRejected, retrieve, retrieve_via_server
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """port 0에 띄운 서버 → (url, IndexCache)"""
+    monkeypatch.setattr(rag_server.tempfile, "gettempdir", lambda: str(tmp_path))
+    cache = rag_server.IndexCache(4)
+    httpd = ThreadingHTTPServer((rag_server.HOST, 0), rag_server.make_handler(cache, "token"))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://{rag_server.HOST}:{httpd.server_address[1]}", cache
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def sources(corpus, tmp_path):
+    """쓰기 가능한 코퍼스 사본 두 개 (토픽 A, B)"""
+    dirs = []
+    for name in ("a", "b"):
+        d = tmp_path / name / "sources"
+        shutil.copytree(corpus[0], d)
+        dirs.append(d)
+    return dirs
+
+
+def post(url: str, body: bytes, headers: dict) -> int:
+    req = urllib.request.Request(url + "/retrieve", data=body, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+SETTINGS = [
+    {},
+    {"output_format": "json"},
+    {"use_positions": True},
+    {"field_weights": {"title": 3.0}},
+    {"engine": "python", "max_tokens": 600},
+    {"snippet_chars": 200},
+]
+
+
+def test_server_matches_local_under_concurrency(server, sources, corpus):
+    url, _ = server
+    queries = corpus[1][:3]
+    jobs = [(q, setting) for q in queries for setting in SETTINGS]
+
+    def remote(job):
+        query, setting = job
+        return retrieve_via_server(url, dict(setting, query=query, top_k=4, sources_dirs=[str(sources[0])]))
+
+    with ThreadPoolExecutor(8) as pool:
+        got = list(pool.map(remote, jobs))
+    for (query, setting), output in zip(jobs, got):
+        kwargs = dict(setting)
+        if "field_weights" in kwargs:
+            kwargs["field_weights"] = {**rag_server.bm25f.DEFAULT_WEIGHTS, **kwargs["field_weights"]}
+        assert output == retrieve(query, str(sources[0]), top_k=4, use_cache=False, **kwargs), (query, setting)
+
+
+def test_cold_load_does_not_block_other_indexes(server, sources, corpus, monkeypatch):
+    url, cache = server
+    query = corpus[1][0]
+    retrieve_via_server(url, {"query": query, "sources_dirs": [str(sources[1])]})     # B는 웜 상태
+
+    release = threading.Event()
+    loading = threading.Event()
+    open_index = rag_server.open_index
+
+    def slow_open(src_paths, *args, **kwargs):
+        if src_paths[0] == sources[0]:
+            loading.set()
+            assert release.wait(30)
+        return open_index(src_paths, *args, **kwargs)
+
+    monkeypatch.setattr(rag_server, "open_index", slow_open)
+    with ThreadPoolExecutor(2) as pool:
+        cold = pool.submit(retrieve_via_server, url, {"query": query, "sources_dirs": [str(sources[0])]})
+        assert loading.wait(30)
+        # A 로드가 멈춰 있는 동안 B 요청은 끝나야 함
+        warm = pool.submit(retrieve_via_server, url, {"query": query, "sources_dirs": [str(sources[1])]})
+        assert warm.result(timeout=10)
+        assert not cold.done()
+        release.set()
+        assert cold.result(timeout=30)
+    assert len(cache.stats()) == 2
+
+
+def test_rejected_requests(server, sources, corpus, tmp_path):
+    url, _ = server
+    body = json.dumps({"query": corpus[1][0], "sources_dirs": [str(sources[0])]}).encode("utf-8")
+    assert post(url, body, {"Content-Type": "application/json"}) == 200
+    assert post(url, body, {"Content-Type": "application/json", "Host": "evil.example"}) == 403
+    assert post(url, body, {"Content-Type": "text/plain"}) == 415
+
+    # --index-root 없이 실행한 서버는 index_dir 요청을 거부 → 클라이언트는 ServerRejected
+    payload = {"query": corpus[1][0], "sources_dirs": [str(sources[0])], "index_dir": str(tmp_path / "idx")}
+    with pytest.raises(ServerRejected):
+        retrieve_via_server(url, payload)
+    # 기본 위치(None)는 보내지 않으므로 그대로 성공
+    assert retrieve_via_server(url, dict(payload, index_dir=None))
+
+
+def test_client_falls_back_to_local(server, sources, corpus, tmp_path, monkeypatch, capsys):
+    url, _ = server
+    argv = ["retrieve_chunks.py", "--server", url, "--query", corpus[1][0], "--sources-dir", str(sources[0]),
+            "--index-dir", str(tmp_path / "idx"), "--no-cache"]
+    monkeypatch.setattr("sys.argv", argv)
+    assert retrieve_chunks.main() == 0
+    out, err = capsys.readouterr()
+    assert "로컬 검색으로 진행" in err
+    assert out.strip() == retrieve(corpus[1][0], str(sources[0]), index_dir=str(tmp_path / "idx"), use_cache=False)
@@ -0,0 +1,108 @@
+"""
+test_reranker.py — cross-encoder 재순위 (reranker.py, --rerank)
+
+cross-encoder 대신 질문 단어 포함 비율을 점수로 주는 모델을 모델 캐시에 등록해 실행 (모델 다운로드 없음).
+- 재순위 점수 내림차순 (동점은 1단계 순위), top_k 자르기, 통계
+- 점수 캐시: 정규화한 같은 질문은 모델을 부르지 않고, 프로세스를 다시 시작해도 디스크 캐시에서 읽으며,
+  모델이 다르면 쓰지 않고, 최근 MAX_QUERIES개 질문만 유지
+- retrieve(rerank=True) JSON 출력의 점수 종류·재순위 통계
+"""
+
+import json
+
+import pytest
+
+import reranker
+from chunking import tokenize
+from rag_index import chunk_hash, get_combined_index, index_params, search_index
+from retrieve_chunks import retrieve
+
+
+MODEL = "test/overlap-cross-encoder"
+
+
+class OverlapCrossEncoder:
+    """(질문, 본문) → 본문에 든 질문 토큰 비율 (CrossEncoder.predict와 같은 호출 형태, 채점한 쌍 수 기록)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(len(pairs))
+        out = []
+        for query, text in pairs:
+            q, t = set(tokenize(query)), set(tokenize(text))
+            out.append(len(q & t) / max(len(q), 1))
+        return out
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = OverlapCrossEncoder()
+    monkeypatch.setitem(reranker._models, MODEL, model)
+    monkeypatch.setattr(reranker, "_caches", {})
+    return model
+
+
+@pytest.fixture
+def index(corpus, tmp_path):
+    return get_combined_index([corpus[0]], index_params(800, 100, 0.03, "*.md", True), tmp_path)
+
+
+def test_rerank_order_and_top_k(model):
+    results = [
+        (9.0, "a.md", "alpha", 0),
+        (8.0, "b.md", "alpha beta", 0),
+        (7.0, "c.md", "beta", 0),
+        (6.0, "d.md", "alpha beta gamma", 0),
+    ]
+    memory = {"parts": []}
+    stats: dict = {}
+    out = reranker.rerank(memory, "alpha beta", results, MODEL, 3, stats)
+    # b와 d는 1.0 (1단계 순위 b가 앞), a와 c는 0.5 (a가 앞)
+    assert [(r[1], r[0]) for r in out] == [("b.md", 1.0), ("d.md", 1.0), ("a.md", 0.5)]
+    assert stats == {"candidates": 4, "cached": 0, "scored": 4}
+    assert len(reranker.rerank(memory, "alpha beta", results, MODEL)) == 4
+    assert model.calls == [4]
+
+
+def test_score_cache(index, model, monkeypatch):
+    query = "tensor core fp8"
+    results = search_index(index, query, 10)
+    stats: dict = {}
+    first = reranker.rerank(index, query, results, MODEL, 5, stats)
+    assert stats["scored"] == len({chunk_hash(r[2]) for r in results})
+
+    # 같은 질문 (대소문자·공백만 다름) → 모델 호출 없음
+    assert reranker.rerank(index, "  Tensor CORE  fp8", results, MODEL, 5, stats) == first
+    assert stats["scored"] == 0 and stats["cached"] == stats["candidates"]
+
+    # 새 프로세스: 디스크 캐시에서 읽음
+    monkeypatch.setattr(reranker, "_caches", {})
+    reranker.rerank(index, query, results, MODEL, 5, stats)
+    assert stats["scored"] == 0
+    assert len(model.calls) == 1
+
+    # 다른 모델 이름의 캐시는 쓰지 않음
+    path = reranker.cache_path(index, MODEL)
+    assert reranker.load_cache(path, MODEL)
+    assert not reranker.load_cache(path, "other/model")
+
+    # 최근 MAX_QUERIES개 질문만 유지
+    monkeypatch.setattr(reranker, "MAX_QUERIES", 2)
+    for q in ("nvlink", "hopper", "memory"):
+        reranker.rerank(index, q, results[:2], MODEL)
+    assert list(reranker.load_cache(path, MODEL)) == ["hopper", "memory"]
+
+
+@pytest.mark.skipif(not reranker.available(), reason="retrieve(rerank=True)는 sentence-transformers 설치를 확인함")
+def test_retrieve_rerank_json(corpus, tmp_path, model):
+    out = json.loads(retrieve(corpus[1][0], str(corpus[0]), top_k=3, index_dir=str(tmp_path), use_cache=False,
+                              rerank=True, rerank_model=MODEL, rerank_depth=10, output_format="json"))
+    assert out["search"]["score_type"] == "rerank"
+    rerank = out["search"]["rerank"]
+    assert rerank["model"] == MODEL and rerank["depth"] == 10 and rerank["candidates"] == 10
+    assert len(out["results"]) == 3
+    scores = [r["score"] for r in out["results"]]
+    assert scores == sorted(scores, reverse=True) and all(0.0 <= s <= 1.0 for s in scores)
+    assert out["confidence"]["percent"] is None
@@ -0,0 +1,94 @@
+"""
+test_result_cache.py — retrieve() 출력 디스크 LRU 캐시 (result_cache.py)
+
+- 띄어쓰기·대소문자만 다른 질문은 인덱스를 로드하지 않고 캐시 출력을 돌려주며, 헤더 질문은 이번 원문으로 바뀌는지
+  (마크다운 / JSON 출력)
+- 설정(top_k 등)이 다르거나 소스 파일이 바뀌면 key가 달라져 다시 검색하는지, CACHE_VERSION이 key에 들어가는지
+- 크기 상한을 넘으면 최근 접근(조회 포함)이 가장 오래된 항목부터 지우는지
+"""
+
+import json
+import os
+
+import pytest
+
+import result_cache
+import retrieve_chunks
+from rag_index import index_params
+from retrieve_chunks import retrieve
+
+
+@pytest.fixture
+def sources(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for n in range(4):
+        body = " ".join(f"Document {n} paragraph {m} about fp8 tensor core scheduling." for m in range(20))
+        (sources / f"doc{n}.md").write_text(f"# doc {n}\n\n{body}\n", encoding="utf-8")
+    return sources
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """retrieve()가 인덱스를 연 횟수"""
+    calls = []
+    open_index = retrieve_chunks.open_index
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return open_index(*args, **kwargs)
+
+    monkeypatch.setattr(retrieve_chunks, "open_index", counting)
+    return calls
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "json"])
+def test_hit_skips_index_and_keeps_query(sources, tmp_path, loads, output_format):
+    def run(query: str, **kwargs) -> str:
+        return retrieve(query, str(sources), top_k=2, index_dir=str(tmp_path / "index"),
+                        output_format=output_format, **kwargs)
+
+    first = run("FP8 tensor core")
+    assert len(loads) == 1
+    second = run("  fp8   TENSOR core ")
+    assert len(loads) == 1
+    if output_format == "json":
+        assert json.loads(second)["query"] == "  fp8   TENSOR core "
+        assert json.loads(second)["results"] == json.loads(first)["results"]
+    else:
+        assert 'Query: "  fp8   TENSOR core "' in second
+        assert second.replace('"  fp8   TENSOR core "', '"FP8 tensor core"') == first
+
+    # 설정이 다르면 다시 검색, 소스가 바뀌면 이전 결과 무효화
+    run("fp8 tensor core", near_dup_bits=-1)
+    assert len(loads) == 2
+    with open(sources / "doc0.md", "a", encoding="utf-8") as f:
+        f.write("\n\nappended paragraph about fp8 tensor core.\n")
+    run("fp8 tensor core")
+    assert len(loads) == 3
+    # --no-cache는 캐시를 읽지 않음
+    run("fp8 tensor core", use_cache=False)
+    assert len(loads) == 4
+
+
+def test_key_includes_cache_version(sources, monkeypatch):
+    params = index_params(800, 100, 0.03, "*.md", True)
+    key = result_cache.cache_key("q", 5, params, [sources], "auto", None)
+    assert result_cache.cache_key(" Q ", 5, params, [sources], "auto", None) == key
+    assert result_cache.cache_key("q", 6, params, [sources], "auto", None) != key
+    monkeypatch.setattr(result_cache, "CACHE_VERSION", result_cache.CACHE_VERSION + 1)
+    assert result_cache.cache_key("q", 5, params, [sources], "auto", None) != key
+
+
+def test_evict_least_recently_used(tmp_path):
+    directory = tmp_path / "results"
+    for n, key in enumerate("abc"):
+        result_cache.store(directory, key, f"query {key}", "x" * 1000)
+        os.utime(directory / f"{key}.json", ns=(n * 10**9, n * 10**9))   # a가 가장 오래됨
+    size = (directory / "a.json").stat().st_size
+
+    # a를 조회하면 최근 접근으로 갱신 → 상한을 넘기면 b부터 삭제
+    assert result_cache.lookup(directory, "a", "query a") == "x" * 1000
+    result_cache.store(directory, "d", "query d", "x" * 1000, max_bytes=3 * size)
+    assert sorted(p.stem for p in directory.glob("*.json")) == ["a", "c", "d"]
+    assert result_cache.lookup(directory, "b", "query b") is None
@@ -0,0 +1,68 @@
+"""
+test_snippets.py — 질문 중심 발췌 (snippets.py, --snippets)
+
+- 질문 토큰 점수가 가장 높은 문장 창을 고르고, 잘린 쪽에 "…"를 붙이는지
+- 제목 경로 줄은 청크별 제목 경로로 판별해 발췌 앞에 남기고, 본문이 "§ "로 시작하는 문단 청크는
+  제목 경로로 오인하지 않는지
+- 발췌의 청크 안 문자 구간이 원래 청크 본문과 맞는지
+"""
+
+import json
+
+import pytest
+
+import snippets
+from retrieve_chunks import retrieve
+
+
+FILLER = " ".join(f"Filler sentence number {n} talks about unrelated scheduling topics." for n in range(12))
+
+
+@pytest.fixture
+def sources(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    # 문단 청커: 청크 첫 문단이 "§ "로 시작 (제목 경로 아님, 다음 문단과 한 청크)
+    (sources / "section_sign.md").write_text(
+        f"§ 12 warpgroup matmul overview.\n\n{FILLER[:len(FILLER) // 2]}\n", encoding="utf-8")
+    # 제목 청커: 제목 경로 "구조 > 메모리" + 가운데 문장에만 질문 단어
+    (sources / "headed.md").write_text(
+        f"# 구조\n\n## 메모리\n\n{FILLER} The hbm3 stack bandwidth doubles per hbm3 generation. {FILLER}\n",
+        encoding="utf-8")
+    for n in range(6):
+        (sources / f"other{n}.md").write_text(f"# 기타 {n}\n\n{FILLER}\n", encoding="utf-8")
+    return sources
+
+
+def run(sources, tmp_path, query: str, chunker: str) -> dict:
+    out = retrieve(query, str(sources), top_k=1, index_dir=str(tmp_path / chunker), use_cache=False,
+                   chunker=chunker, snippet_chars=120, output_format="json")
+    return json.loads(out)["results"][0]
+
+
+def test_window_with_ellipsis_and_breadcrumb(sources, tmp_path):
+    result = run(sources, tmp_path, "hbm3 bandwidth", "heading")
+    prefix = "§ 구조 > 메모리\n\n"
+    assert result["source"] == "headed.md"
+    assert result["text"].startswith(prefix + snippets.ELLIPSIS + " ")
+    assert result["text"].endswith(" " + snippets.ELLIPSIS)
+    assert "The hbm3 stack bandwidth doubles per hbm3 generation." in result["text"]
+    span = result["snippet"]
+    assert len(prefix) < span["start"] < span["end"] < span["chunk_chars"]
+    assert span["end"] - span["start"] <= 120
+
+
+def test_paragraph_chunk_starting_with_section_sign(sources, tmp_path):
+    result = run(sources, tmp_path, "warpgroup matmul", "paragraph")
+    assert result["source"] == "section_sign.md"
+    # 제목 경로가 없는 청크이므로 첫 문장부터 창 후보 (이전에는 "§ " 줄을 제목 경로로 보고 건너뜀)
+    assert result["snippet"]["start"] == 0
+    assert result["text"].startswith("§ 12 warpgroup matmul overview.")
+    assert result["text"].endswith(" " + snippets.ELLIPSIS)
+
+
+def test_body_start_uses_chunk_breadcrumb():
+    text = "§ 개요\n\n본문 문장."
+    assert snippets._body_start(text, "개요") == len("§ 개요\n\n")
+    assert snippets._body_start(text, "") == 0
+    assert snippets._body_start(text, "다른 경로") == 0
@@ -0,0 +1,42 @@
+"""
+test_startup_budget.py — 웜 경로 시작 예산 (startup_budget.py)
+
+- 웜 경로(저장 인덱스 최신)에서 출력 방식마다 소스 .md를 열지 않고 무거운 모듈을 import하지 않는지
+  (startup_budget.watch audit)
+- -X importtime 출력 파싱 (모듈, 누적 μs, 깊이)
+
+합성 코퍼스는 conftest.py의 corpus (bench_retrieval.generate_corpus()).
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+import startup_budget
+
+
+# ────────────────────────── 웜 경로 ──────────────────────────
+
+@pytest.mark.parametrize("mode", list(startup_budget.MODES))
+def test_warm_path_reads_no_sources(corpus, mode):
+    sources_dir, queries = corpus
+    base = ["--sources-dir", str(sources_dir), "--query", queries[0], "--engine", "auto", "--no-cache"]
+    # 인덱스·본문 저장소를 최신으로 (첫 실행)
+    subprocess.run([sys.executable, str(startup_budget.RETRIEVE)] + base, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, check=True)
+    watched = startup_budget.watch(base + startup_budget.MODES[mode], sources_dir)
+    assert watched["code"] == 0
+    assert watched["opened"] == []
+    assert not set(startup_budget.HEAVY_MODULES) & {m.split(".")[0] for m in watched["modules"]}
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:        80 |        300 | rag_index\n"
+        "import time:        40 |         40 |     chunking\n"
+        "unrelated warning line\n"
+    )
+    assert startup_budget.parse_importtime(stderr) == [("_io", 120, 1), ("rag_index", 300, 0), ("chunking", 40, 2)]
@@ -0,0 +1,115 @@
+"""
+test_vault_search.py — vault 전체 의미 검색 (vault_search.py) / IVF 근사 최근접 이웃 (ann.py)
+
+- IVF: 모든 군집을 탐색하면 전수 검색과 같고, 군집 순 정렬·offsets가 배정 결과와 맞는지
+- 샤드: 소스가 바뀐 토픽만 다시 만들고, 전체 군집 탐색 결과가 모든 토픽 청크의 전수 코사인 순위와 같은지
+- 결과 본문이 토픽 인덱스의 청크 본문과 같고, 출력에 적중 토픽이 표시되는지
+"""
+
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import ann  # noqa: E402
+import dense  # noqa: E402
+import vault_search  # noqa: E402
+from conftest import EMBED_MODEL  # noqa: E402
+from rag_index import chunk_texts, get_combined_index  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not dense.available(), reason="vault_search는 sentence-transformers 설치를 확인함")
+
+
+@pytest.fixture
+def vault(corpus, tmp_path, monkeypatch):
+    """코퍼스 파일을 두 토픽(AI/alpha, HW/beta)에 나눠 담은 vault (토픽당 여러 군집이 되도록 IVF 임계값을 낮춤)"""
+    monkeypatch.setattr(ann, "IVF_MIN_POINTS", 32)
+    root = tmp_path / "vault"
+    names = sorted(p.name for p in corpus[0].glob("*.md"))
+    for n, (category, topic) in enumerate([("AI", "alpha"), ("HW", "beta")]):
+        topic_dir = root / "Agent" / category / topic
+        (topic_dir / "sources").mkdir(parents=True)
+        (topic_dir / "rag").mkdir()
+        for name in names[n::2]:
+            (topic_dir / "sources" / name).write_bytes((corpus[0] / name).read_bytes())
+        manifest = {"topic": topic, "vault_path": str(root),
+                    "source_dirs": [f"Agent/{category}/{topic}/sources"]}
+        (topic_dir / "rag" / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return root
+
+
+def test_ivf_full_probe_is_exact(monkeypatch):
+    monkeypatch.setattr(ann, "IVF_MIN_POINTS", 16)
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((400, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ivf = ann.build_ivf(vectors)
+    n_lists = len(ivf["centroids"])
+    assert n_lists == 20
+    assert sorted(ivf["order"].tolist()) == list(range(400))
+    assert ivf["offsets"][0] == 0 and ivf["offsets"][-1] == 400
+
+    ordered = vectors[ivf["order"]]
+    labels = ann.assign(ordered, ivf["centroids"])
+    for l in range(n_lists):
+        assert (labels[ivf["offsets"][l]:ivf["offsets"][l + 1]] == l).all()
+
+    query = vectors[7]
+    rows, scores = ann.search_lists(ordered, ivf["offsets"], ann.probe(ivf["centroids"], query, n_lists), query)
+    got = ivf["order"][rows[np.argsort(-scores, kind="stable")[:10]]]
+    assert got.tolist() == np.argsort(-(vectors @ query), kind="stable")[:10].tolist()
+    # 일부 군집만 탐색해도 자기 자신은 찾음
+    rows, scores = ann.search_lists(ordered, ivf["offsets"], ann.probe(ivf["centroids"], query, 2), query)
+    assert ivf["order"][rows[np.argmax(scores)]] == 7
+
+
+def test_shards_exact_search_and_rebuild(vault, embedder, capsys):
+    manifests = vault_search.find_manifests(vault)
+    assert [m.parent.parent.name for m in manifests] == ["alpha", "beta"]
+    shards = vault_search.open_shards(manifests, vault, EMBED_MODEL)
+    assert capsys.readouterr().err.count("샤드 생성") == 2
+    assert all(len(s["centroids"]) > 1 for s in shards)
+
+    # 전수 기준: 토픽별 인덱스의 모든 청크를 (출처, chunk_idx)로 모아 코사인 순위
+    labels, texts, vectors = [], [], []
+    for mp, shard in zip(manifests, shards):
+        index = get_combined_index([mp.parent.parent / "sources"], vault_search.manifest_params({}))
+        ids = list(range(len(index["chunks"])))
+        by_id = chunk_texts(index, ids)
+        for i in ids:
+            labels.append(f"{shard['category']}/{shard['safe_topic']}/{index['chunks'][i][0]}")
+            texts.append((index["chunks"][i][1], by_id[i]))
+        vectors.append(dense.chunk_embeddings(index, EMBED_MODEL))
+    matrix = np.vstack(vectors).astype(np.float16).astype(np.float32)
+    assert sum(len(s["vectors"]) for s in shards) == len(matrix)
+
+    n_lists = sum(len(s["centroids"]) for s in shards)
+    for query in ["tensor core scheduling", "메모리 대역폭 측정", "nvlink partition"]:
+        query_vec = dense.encode(EMBED_MODEL, [query])[0]
+        hits = vault_search.search_shards(shards, query_vec, 8, n_lists)
+        scores = matrix @ query_vec
+        assert [s for s, _, _ in hits] == pytest.approx(sorted(scores, reverse=True)[:8], abs=1e-5)
+        for (score, text_src, text, idx) in vault_search.materialize(shards, vault, hits):
+            row = next(r for r in range(len(labels)) if labels[r] == text_src and texts[r][0] == idx)
+            assert text == texts[row][1]
+            assert score == pytest.approx(float(scores[row]), abs=1e-5)
+
+    # 바뀐 것 없음 → 재생성 없음, 한 토픽만 수정 → 그 토픽만 재생성
+    vault_search.open_shards(manifests, vault, EMBED_MODEL)
+    assert "샤드 생성" not in capsys.readouterr().err
+    src = next((vault / "Agent" / "HW" / "beta" / "sources").glob("*.md"))
+    with open(src, "a", encoding="utf-8") as f:
+        f.write("\n\n## 추가 절\n\nappended paragraph about nvlink partition 메모리 대역폭 측정\n")
+    vault_search.open_shards(manifests, vault, EMBED_MODEL)
+    err = capsys.readouterr().err
+    assert "샤드 생성: HW/beta" in err and "AI/alpha" not in err
+
+
+def test_vault_search_output(vault, embedder):
+    out = vault_search.vault_search("nvlink partition bandwidth", str(vault), top_k=4, embed_model=EMBED_MODEL)
+    assert "vault 의미 검색: 토픽 2개" in out
+    assert "# 적중 토픽:" in out
+    out = vault_search.vault_search("nvlink partition bandwidth", str(vault), categories=["HW"], top_k=4,
+                                    embed_model=EMBED_MODEL, exact=True)
+    assert "토픽 1개" in out and "AI/alpha" not in out